@@ -0,0 +1,347 @@
+"""
+Framework to compute several analyses in one shared pass over the data.
+
+Every analysis registers accumulators that receive the issues and/or
+events they are interested in. The driver feeds all accumulators of all
+requested analyses from a single scan of the dataset. Each analysis then
+derives its tables from the accumulated results (`compute`) and outputs
+them (`render`).
+
+Accumulators can restrict the issues and events they receive through
+filters. If the issues are already held in memory, filtered accumulators
+are fed from queries of the DataLoader instead of the scan, whose planner
+looks the matching issues or events up in the indexes.
+Analyses whose results are incrementally maintained (see
+analysis/incremental.py) or cached from an earlier run on the same data
+(see analysis/result_cache.py) skip the scan altogether. For datasets
+that do not fit in memory, the scan can run over chunks of the data file
+whose accumulators are merged (see analysis/chunked.py), as can the data
+files of several repositories.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import Dict, Iterable, List, Tuple
+
+import analysis.rendering as rendering
+from analysis.result_cache import ResultCache
+import profiling
+from data.data_loader import DataLoader
+from models.model import Event, Issue
+
+
+class Accumulator:
+    """
+    Collects a partial result while the dataset is scanned.
+    """
+
+    # Whether add_issue should be called for every (matching) issue
+    needs_issues:bool = True
+    # Whether add_event should be called for the (matching) events
+    needs_events:bool = False
+    # Only feed issues whose field has the value: ('creator', name) or ('label', name)
+    issue_filter:Tuple[str, str] = None
+    # Only feed events whose field has the value: ('author', name) or ('event_type', type)
+    event_filter:Tuple[str, str] = None
+
+    def add_issue(self, issue:Issue):
+        pass
+
+    def add_event(self, issue:Issue, event:Event):
+        pass
+
+    def finish_issue(self, issue:Issue):
+        """
+        Called after the (matching) events of an issue have been added,
+        for accumulators that need issues.
+        """
+        pass
+
+    def merge(self, other:'Accumulator'):
+        """
+        Adds the partial result of another accumulator of the same kind
+        that was fed the issues following those this one was fed, so that
+        the result is the same as if this one had been fed all of them.
+        """
+        raise NotImplementedError
+
+    def result(self) -> any:
+        raise NotImplementedError
+
+
+class Analysis:
+    """
+    Base class of analyses that take part in the shared scan.
+    """
+
+    def accumulators(self) -> Dict[str, Accumulator]:
+        """
+        The accumulators this analysis needs, by name.
+        """
+        return {}
+
+    def maintained(self, aggregates) -> Dict[str, any]:
+        """
+        The results of the accumulators of this analysis, taken from the
+        incrementally maintained aggregates, or None if the analysis has
+        to take part in the scan.
+        """
+        return None
+
+    def from_frames(self, frames) -> Dict[str, any]:
+        """
+        The results of the accumulators of this analysis, computed with
+        vectorized operations on the frames of the DataLoader (see
+        data/frames.py), or None if the analysis has to take part in
+        the scan.
+        """
+        return None
+
+    def compute(self, partials:Dict[str, any]) -> Dict[str, any]:
+        """
+        Derives the computed tables of the analysis from the results of
+        its accumulators.
+        """
+        return partials
+
+    def render(self, results:Dict[str, any]):
+        """
+        Outputs the computed tables to standard out and as charts.
+        """
+        pass
+
+    def run(self):
+        run_analyses([self])
+
+
+def run_analyses(analyses:List[Analysis], aggregates=None):
+    """
+    Computes the analyses in one shared pass over the data and renders them.
+    """
+    with profiling.stage('compute'):
+        computed = compute_analyses(analyses, aggregates=aggregates)
+    with profiling.stage('render'):
+        for analysis, results in zip(analyses, computed):
+            name = type(analysis).__name__
+            rendering.begin(name)
+            with profiling.stage(name):
+                analysis.render(results)
+        with profiling.stage('write_files'):
+            rendering.finish()
+
+
+def compute_analyses(analyses:List[Analysis], issues:Iterable[Issue]=None,
+                     aggregates=None) -> List[Dict[str, any]]:
+    """
+    Computes the results of the analyses in one shared pass over the
+    issues (by default those of the DataLoader). Analyses that support
+    it are served from the maintained aggregates, if given and built from
+    the data file of the DataLoader, and results
+    of earlier runs are reused if the result cache is enabled. If the
+    data is held in columnar form, analyses that support it work on the
+    frames of the DataLoader instead of taking part in the scan. If
+    chunked execution is configured, the data file is scanned in chunks
+    instead of being loaded, and the data files of several repositories
+    are scanned as partitions.
+    """
+    # Imported here, as the chunked execution builds on this module
+    from analysis import chunked
+    loader = DataLoader() if issues is None else None
+    cache = ResultCache.configured() if issues is None else None
+    chunk_size = chunked.configured_chunk_size() if issues is None else None
+    # Several repositories that are not held in memory are scanned per data file
+    partitioned = loader is not None and len(loader.data_paths) > 1 \
+        and not loader.is_loaded() and not loader.prefers_frames()
+    # The maintained aggregates are only used while they hold the issues of the data file
+    if aggregates is not None and (loader is None or not aggregates.matches(loader.data_paths)):
+        logger.warning(f'Ignoring the maintained aggregates in {aggregates.db_path}, '
+                       'as they do not match the data file')
+        aggregates = None
+    # Per analysis: cached results, or partials that do not come from the scan
+    cached = [None] * len(analyses)
+    prepared = [None] * len(analyses)
+    from_aggregates = [False] * len(analyses)
+    for pos, analysis in enumerate(analyses):
+        if aggregates is not None:
+            prepared[pos] = analysis.maintained(aggregates)
+            from_aggregates[pos] = prepared[pos] is not None
+        if prepared[pos] is None and cache is not None:
+            with profiling.stage('result_cache'):
+                cached[pos] = cache.get(analysis)
+        if prepared[pos] is None and cached[pos] is None and loader is not None \
+                and chunk_size is None and loader.prefers_frames():
+            with profiling.stage('frames'):
+                prepared[pos] = analysis.from_frames(loader.get_frames())
+
+    registered = [analysis.accumulators() if partials is None and hit is None else {}
+                  for analysis, partials, hit in zip(analyses, prepared, cached)]
+    accumulators = [acc for accs in registered for acc in accs.values()]
+    if accumulators:
+        with profiling.stage('scan'):
+            if issues is not None:
+                scan(issues, accumulators)
+            elif chunk_size is not None or partitioned:
+                scanned = [pos for pos, accs in enumerate(registered) if accs]
+                if chunk_size is not None:
+                    chunked.scan_chunked(loader, [analyses[pos] for pos in scanned],
+                                         [registered[pos] for pos in scanned], chunk_size)
+                else:
+                    chunked.scan_partitions(loader, [analyses[pos] for pos in scanned],
+                                            [registered[pos] for pos in scanned])
+            else:
+                feed(loader, accumulators)
+
+    results = []
+    for pos, analysis in enumerate(analyses):
+        if cached[pos] is not None:
+            results.append(cached[pos])
+            continue
+        partials = prepared[pos]
+        if partials is None:
+            partials = {name: acc.result() for name, acc in registered[pos].items()}
+        with profiling.stage(type(analysis).__name__):
+            results.append(analysis.compute(partials))
+        if cache is not None and not from_aggregates[pos]:
+            cache.put(analysis, results[-1])
+    return results
+
+
+def feed(loader:DataLoader, accumulators:List[Accumulator]):
+    """
+    Feeds the accumulators from the DataLoader. If the issues are in
+    memory, filtered accumulators are served by queries and only the
+    others take part in the scan. Otherwise the issues are streamed.
+    """
+    if loader.is_loaded():
+        accumulators = [acc for acc in accumulators if not _feed_from_query(loader, acc)]
+    if accumulators:
+        scan(loader.iter_issues(), accumulators)
+
+
+def scan(issues:Iterable[Issue], accumulators:List[Accumulator]):
+    """
+    Feeds all accumulators from a single pass over the issues and their events.
+    """
+    unfiltered = [acc for acc in accumulators if acc.issue_filter is None]
+    filtered = [acc for acc in accumulators if acc.issue_filter is not None]
+    issue_receivers = [acc for acc in unfiltered if acc.needs_issues]
+    # Routing of events to the accumulators that see every issue
+    shared_dispatch = _EventDispatch()
+    for acc in unfiltered:
+        if acc.needs_events:
+            shared_dispatch.register(acc, 1)
+
+    for issue in issues:
+        for acc in issue_receivers:
+            acc.add_issue(issue)
+
+        # Accumulators with an issue filter and how often this issue matched
+        matched = []
+        dispatch = shared_dispatch
+        if filtered:
+            matched = [(acc, count) for acc in filtered for count in [_issue_matches(acc, issue)] if count]
+            if matched:
+                dispatch = shared_dispatch.copy()
+            for acc, count in matched:
+                for _ in range(count):
+                    if acc.needs_issues:
+                        acc.add_issue(issue)
+                if acc.needs_events:
+                    dispatch.register(acc, count)
+
+        if dispatch:
+            for event in issue.events:
+                for acc, count in dispatch.receivers(event):
+                    for _ in range(count):
+                        acc.add_event(issue, event)
+
+        for acc in issue_receivers:
+            acc.finish_issue(issue)
+        for acc, count in matched:
+            if acc.needs_issues:
+                for _ in range(count):
+                    acc.finish_issue(issue)
+
+
+class _EventDispatch:
+    """
+    Routes each event of an issue to the accumulators whose event filter
+    it passes.
+    """
+
+    def __init__(self):
+        self.unfiltered:List[Tuple[Accumulator, int]] = []
+        self.by_field:Dict[str, Dict[str, List[Tuple[Accumulator, int]]]] = {}
+
+    def register(self, acc:Accumulator, count:int):
+        if acc.event_filter is None:
+            self.unfiltered.append((acc, count))
+        else:
+            field, value = acc.event_filter
+            self.by_field.setdefault(field, {}).setdefault(value, []).append((acc, count))
+
+    def copy(self) -> '_EventDispatch':
+        dispatch = _EventDispatch()
+        dispatch.unfiltered = list(self.unfiltered)
+        dispatch.by_field = {field: {value: list(receivers) for value, receivers in by_value.items()}
+                             for field, by_value in self.by_field.items()}
+        return dispatch
+
+    def receivers(self, event:Event) -> List[Tuple[Accumulator, int]]:
+        if not self.by_field:
+            return self.unfiltered
+        receivers = list(self.unfiltered)
+        for field, by_value in self.by_field.items():
+            receivers.extend(by_value.get(getattr(event, field), ()))
+        return receivers
+
+    def __bool__(self):
+        return bool(self.unfiltered or self.by_field)
+
+
+def _issue_matches(acc:Accumulator, issue:Issue) -> int:
+    if acc.issue_filter is None:
+        return 1
+    field, value = acc.issue_filter
+    if field == 'label':
+        return sum(1 for label in issue.labels if label == value)
+    return 1 if getattr(issue, field) == value else 0
+
+
+def _event_matches(acc:Accumulator, event:Event) -> bool:
+    if acc.event_filter is None:
+        return True
+    field, value = acc.event_filter
+    return getattr(event, field) == value
+
+
+def _feed_from_query(loader:DataLoader, acc:Accumulator) -> bool:
+    """
+    Feeds a filtered accumulator from a query of the DataLoader, whose
+    planner finds the matching issues or events through the indexes (see
+    data/query.py). Returns False if the accumulator has to take part in
+    the scan instead.
+    """
+    if acc.issue_filter is not None and acc.issue_filter[1] is not None:
+        field, value = acc.issue_filter
+        for issue in loader.query_issues(**{field: value}):
+            # As in the scan, an issue is fed once for every time it carries the label
+            for _ in range(_issue_matches(acc, issue)):
+                if acc.needs_issues:
+                    acc.add_issue(issue)
+                if acc.needs_events:
+                    for event in issue.events:
+                        if _event_matches(acc, event):
+                            acc.add_event(issue, event)
+                if acc.needs_issues:
+                    acc.finish_issue(issue)
+        return True
+
+    if acc.event_filter is not None and acc.event_filter[1] is not None and not acc.needs_issues:
+        field, value = acc.event_filter
+        for issue, event in loader.query_events(**{field: value}):
+            acc.add_event(issue, event)
+        return True
+
+    return False
@@ -0,0 +1,126 @@
+"""
+Map-reduce execution of the shared scan over chunks or partitions.
+
+If ENPM611_PROJECT_CHUNK_SIZE is set, the data file is never held in
+memory as a whole. It is decoded incrementally in chunks of that many
+issues, and every chunk is scanned with fresh accumulators of the
+analyses (map). The accumulators of a chunk are then merged into those
+of the chunks before it (combine, see Accumulator.merge). As the chunks
+are combined in the order of the data file, the results are the same as
+those of a scan over all issues.
+
+With ENPM611_PROJECT_WORKERS greater than one, the chunks are mapped in a
+pool of worker processes. At most two chunks per worker are in flight at
+a time, so memory use is bounded by the chunk size and the number of
+workers, not by the size of the dataset.
+
+If the dataset consists of the data files of several repositories (see
+data/repositories.py) and is not loaded into memory, every repository is
+a partition that is mapped on its own, in parallel with
+ENPM611_PROJECT_WORKERS, and the partitions are combined in the order of
+the data files.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import config as config
+import profiling
+from analysis.aggregator import Accumulator, Analysis, scan
+from data.data_loader import DataLoader
+from data.stream import iter_records
+from models.model import Issue
+
+# Chunks in flight per worker process
+_CHUNKS_PER_WORKER:int = 2
+
+
+def configured_chunk_size() -> Optional[int]:
+    """
+    The number of issues per chunk configured through
+    ENPM611_PROJECT_CHUNK_SIZE, or None if chunked execution is disabled.
+    """
+    chunk_size = config.get_parameter('ENPM611_PROJECT_CHUNK_SIZE')
+    return int(chunk_size) if chunk_size else None
+
+
+def map_chunk(analyses:List[Analysis], records:List[dict]) -> List[Dict[str, Accumulator]]:
+    """
+    Scans one chunk of issue records with fresh accumulators of the analyses.
+    """
+    registered = [analysis.accumulators() for analysis in analyses]
+    scan((Issue(record) for record in records), [acc for accs in registered for acc in accs.values()])
+    return registered
+
+
+def combine(registered:List[Dict[str, Accumulator]], partial:List[Dict[str, Accumulator]]):
+    """
+    Merges the accumulators of a chunk into those of the preceding chunks.
+    """
+    for accs, chunk_accs in zip(registered, partial):
+        for name, acc in accs.items():
+            acc.merge(chunk_accs[name])
+
+
+def scan_chunked(loader:DataLoader, analyses:List[Analysis], registered:List[Dict[str, Accumulator]],
+                 chunk_size:int):
+    """
+    Feeds the registered accumulators of the analyses from a chunked pass
+    over the data file of the loader.
+    """
+    count, num_chunks = 0, 0
+    chunks = loader.iter_record_batches(chunk_size)
+    if loader.workers <= 1:
+        for records in chunks:
+            count, num_chunks = count + len(records), num_chunks + 1
+            with profiling.accumulate('map'):
+                partial = map_chunk(analyses, records)
+            with profiling.accumulate('combine'):
+                combine(registered, partial)
+    else:
+        with ProcessPoolExecutor(max_workers=loader.workers) as executor:
+            # Futures of the chunks in flight, in the order of the data file
+            pending = deque()
+            for records in chunks:
+                count, num_chunks = count + len(records), num_chunks + 1
+                pending.append(executor.submit(map_chunk, analyses, records))
+                if len(pending) >= loader.workers * _CHUNKS_PER_WORKER:
+                    with profiling.accumulate('combine'):
+                        combine(registered, pending.popleft().result())
+            while pending:
+                with profiling.accumulate('combine'):
+                    combine(registered, pending.popleft().result())
+    print(f'Scanned {count} issues from {loader.source} in {num_chunks} chunks.')
+
+
+def map_partition(analyses:List[Analysis], path:str) -> List[Dict[str, Accumulator]]:
+    """
+    Scans the data file of one repository with fresh accumulators of the analyses.
+    """
+    registered = [analysis.accumulators() for analysis in analyses]
+    with open(path, 'r') as fin:
+        scan((Issue(record) for record in iter_records(fin)),
+             [acc for accs in registered for acc in accs.values()])
+    return registered
+
+
+def scan_partitions(loader:DataLoader, analyses:List[Analysis], registered:List[Dict[str, Accumulator]]):
+    """
+    Feeds the registered accumulators of the analyses from a pass over the
+    data files of the loader, with one partition per data file.
+    """
+    paths = loader.data_paths
+    if loader.workers <= 1:
+        for path in paths:
+            with profiling.accumulate('map'):
+                partial = map_partition(analyses, path)
+            with profiling.accumulate('combine'):
+                combine(registered, partial)
+    else:
+        with ProcessPoolExecutor(max_workers=min(loader.workers, len(paths))) as executor:
+            # map() returns the partials in the order of the data files
+            for partial in executor.map(map_partition, [analyses] * len(paths), paths):
+                with profiling.accumulate('combine'):
+                    combine(registered, partial)
+    print(f'Scanned {len(paths)} repositories in {len(paths)} partitions.')
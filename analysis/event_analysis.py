@@ -1,6 +1,7 @@
 import config as config
+from analysis.aggregator import Analysis
 
-class EventAnalysis:
+class EventAnalysis(Analysis):
     """
     Implements event analysis of GitHub
     issues and outputs the result of that analysis.
@@ -13,9 +14,6 @@ class EventAnalysis:
         # Parameter is passed in via command line (--user)
         self.user:str = config.get_parameter('user')
         self.label:str = config.get_parameter('label')
-    
-    def run(self):
-        pass
 
 if __name__ == '__main__':
     # Invoke run method when running this module directly
@@ -2,11 +2,40 @@ from typing import List, Dict
 import matplotlib.pyplot as plt
 import pandas as pd
 
-from data.data_loader import DataLoader
-from models.model import Issue
+from analysis.aggregator import Accumulator, Analysis
+import analysis.rendering as rendering
+from models.model import Issue, Event
 import config
 
-class EventLabelCategoriesAnalysis:
+class LabelEventCounts(Accumulator):
+    """
+    Counts the 'labeled' events per label for labels with a given prefix.
+    """
+    needs_issues = False
+    needs_events = True
+    event_filter = ('event_type', 'labeled')
+
+    def __init__(self, label_prefix:str):
+        self.label_prefix = label_prefix
+        # Dictionary to hold label event counts
+        self.label_event_counts: Dict[str, int] = {}
+
+    def add_event(self, issue:Issue, event:Event):
+        if event.label:
+            label = event.label.lower()
+            # Check if the label starts with the specified prefix
+            if label.startswith(self.label_prefix):
+                label_clean = label.replace(self.label_prefix, '')
+                self.label_event_counts[label_clean] = self.label_event_counts.get(label_clean, 0) + 1
+
+    def merge(self, other:'LabelEventCounts'):
+        for label, count in other.label_event_counts.items():
+            self.label_event_counts[label] = self.label_event_counts.get(label, 0) + count
+
+    def result(self):
+        return self.label_event_counts
+
+class EventLabelCategoriesAnalysis(Analysis):
     """
     Analyzes the number of label events for a specified label prefix in GitHub issues.
     Outputs the findings to standard out and generates a bar chart with annotations.
@@ -16,42 +45,51 @@ class EventLabelCategoriesAnalysis:
         --label status        -> Analyzes labels starting with 'status/'
         --label area          -> Analyzes labels starting with 'area/'
     """
-    
-    def run(self):
+
+    def __init__(self):
+        """
+        Constructor
+        """
         # Retrieve the label prefix from the config (set via --label)
-        label_prefix = config.get_parameter('label') 
-        
-        if not label_prefix:
-            print("Error: No label prefix provided. Please specify a label with the --label flag.")
-            return
+        self.label_prefix:str = config.get_parameter('label')
         
         # Ensure the label_prefix ends with '/' for accurate matching
-        if not label_prefix.endswith('/'):
-            label_prefix += '/'
-        
-        # Load all issues using the DataLoader
-        issues: List[Issue] = DataLoader().get_issues()
+        if self.label_prefix and not self.label_prefix.endswith('/'):
+            self.label_prefix += '/'
+    
+    def accumulators(self):
+        if not self.label_prefix:
+            return {}
+        # Only counts are kept, so the issues can be streamed one at a time
+        return {'label_event_counts': LabelEventCounts(self.label_prefix)}
+
+    def maintained(self, aggregates):
+        if not self.label_prefix:
+            return None
+        return {'label_event_counts': aggregates.label_event_counts(self.label_prefix)}
+
+    def compute(self, partials):
+        if not partials.get('label_event_counts'):
+            return partials
         
-        # Dictionary to hold label event counts
-        label_event_counts: Dict[str, int] = {}
+        # Convert the label_event_counts dictionary to a DataFrame for easier manipulation
+        df = pd.DataFrame(list(partials['label_event_counts'].items()), columns=['Label', 'Event Count'])
+        # Ties broken by label, as the order of the counts depends on where they come from
+        df_sorted = df.sort_values(by=['Event Count', 'Label'], ascending=[False, True], ignore_index=True)
+        return {'label_event_counts': partials['label_event_counts'], 'label_event_table': df_sorted}
+
+    def render(self, results):
+        label_prefix = self.label_prefix
         
-        # Iterate through each event in each issue
-        for issue in issues:
-            for event in issue.events:
-                if event.event_type == 'labeled' and event.label:
-                    label = event.label.lower()
-                    # Check if the label starts with the specified prefix
-                    if label.startswith(label_prefix):
-                        label_clean = label.replace(label_prefix, '')
-                        label_event_counts[label_clean] = label_event_counts.get(label_clean, 0) + 1
+        if not label_prefix:
+            print("Error: No label prefix provided. Please specify a label with the --label flag.")
+            return
         
-        if not label_event_counts:
+        if not results.get('label_event_counts'):
             print(f"No label events found with prefix '{label_prefix}' in the issues data.")
             return
         
-        # Convert the label_event_counts dictionary to a DataFrame for easier manipulation
-        df = pd.DataFrame(list(label_event_counts.items()), columns=['Label', 'Event Count'])
-        df_sorted = df.sort_values(by='Event Count', ascending=False)
+        df_sorted = results['label_event_table']
         
         # Output the results to standard out
         print(f"Status Event Analysis for label prefix '{label_prefix}':")
@@ -75,7 +113,7 @@ class EventLabelCategoriesAnalysis:
                          textcoords="offset points",
                          ha='center', va='bottom', fontsize=9, fontweight='bold')
         
-        plt.show()
+        rendering.show()
 
 if __name__ == '__main__':
     # Invoke run method when running this module directly
@@ -1,14 +1,103 @@
 
-from typing import List
+from typing import Dict
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
-from data.data_loader import DataLoader
+from analysis.aggregator import Accumulator, Analysis
+import analysis.rendering as rendering
+import analysis.sketches as sketches
 from models.model import Issue,Event
 import config as config
 
-class ExampleAnalysis:
+class EventCount(Accumulator):
+    """
+    Counts the events, optionally only those of one author.
+    """
+    needs_issues = False
+    needs_events = True
+
+    def __init__(self, author:str=None):
+        self.event_filter = ('author', author) if author is not None else None
+        self.count:int = 0
+
+    def add_event(self, issue:Issue, event:Event):
+        self.count += 1
+
+    def merge(self, other:'EventCount'):
+        self.count += other.count
+
+    def result(self) -> int:
+        return self.count
+
+
+class IssueCount(Accumulator):
+    """
+    Counts the issues.
+    """
+
+    def __init__(self):
+        self.count:int = 0
+
+    def add_issue(self, issue:Issue):
+        self.count += 1
+
+    def merge(self, other:'IssueCount'):
+        self.count += other.count
+
+    def result(self) -> int:
+        return self.count
+
+
+class IssueCreators(Accumulator):
+    """
+    Counts the issues of every creator (approximately in the approximate
+    mode, see analysis/sketches.py). Issues without a creator are left out.
+    """
+
+    def __init__(self):
+        self.creators = sketches.counter()
+
+    def add_issue(self, issue:Issue):
+        if issue.creator is not None:
+            self.creators.add(issue.creator)
+
+    def merge(self, other:'IssueCreators'):
+        self.creators.merge(other.creators)
+
+    def result(self) -> Dict[str, int]:
+        return self.creators.estimates()
+
+
+class DistinctUsers(Accumulator):
+    """
+    Counts the distinct creators of issues and authors of events
+    (approximately in the approximate mode, see analysis/sketches.py).
+    """
+    needs_events = True
+
+    def __init__(self):
+        self.creators = sketches.distinct()
+        self.authors = sketches.distinct()
+
+    def add_issue(self, issue:Issue):
+        if issue.creator is not None:
+            self.creators.add(issue.creator)
+
+    def add_event(self, issue:Issue, event:Event):
+        if event.author is not None:
+            self.authors.add(event.author)
+
+    def merge(self, other:'DistinctUsers'):
+        self.creators.merge(other.creators)
+        self.authors.merge(other.authors)
+
+    def result(self) -> Dict[str, any]:
+        return {'creators': self.creators.estimate(), 'authors': self.authors.estimate(),
+                'note': self.creators.error_note()}
+
+
+class ExampleAnalysis(Analysis):
     """
     Implements an example analysis of GitHub
     issues and outputs the result of that analysis.
@@ -21,41 +110,71 @@ class ExampleAnalysis:
         # Parameter is passed in via command line (--user)
         self.USER:str = config.get_parameter('user')
     
-    def run(self):
+    def accumulators(self):
         """
-        Starting point for this analysis.
-        
         Note: this is just an example analysis. You should replace the code here
         with your own implementation and then implement two more such analyses.
         """
-        issues:List[Issue] = DataLoader().get_issues()
-        
-        ### BASIC STATISTICS
         # Calculate the total number of events for a specific user (if specified in command line args)
-        total_events:int = 0
-        for issue in issues:
-            total_events += len([e for e in issue.events if self.USER is None or e.author == self.USER])
+        # and count the issues of every creator as well as the distinct users
+        return {
+            'total_events': EventCount(self.USER),
+            'total_issues': IssueCount(),
+            'creators': IssueCreators(),
+            'distinct_users': DistinctUsers(),
+        }
+
+    def from_frames(self, frames):
+        events = frames['events']
+        total_events = int((events['author'] == self.USER).sum()) if self.USER is not None else len(events)
+        return {
+            'total_events': total_events,
+            'total_issues': len(frames['issues']),
+            'creators': {creator: int(count) for creator, count in frames['issues']['creator'].value_counts().items()
+                         if count},
+            'distinct_users': {'creators': int(frames['issues']['creator'].nunique()),
+                               'authors': int(events['author'].nunique()), 'note': None},
+        }
+
+    def compute(self, partials):
+        results = dict(partials)
+        results['creators_note'] = sketches.error_note(partials['creators'])
+        return results
+    
+    def render(self, results):
+        """
+        Outputs the results of this analysis.
+        """
+        creators:Dict[str, int] = results['creators']
         
-        output:str = f'Found {total_events} events across {len(issues)} issues'
+        ### BASIC STATISTICS
+        output:str = f'Found {results["total_events"]} events across {results["total_issues"]} issues'
         if self.USER is not None:
             output += f' for {self.USER}.'
         else:
             output += '.'
         print('\n\n'+output+'\n\n')
+        distinct_users = results['distinct_users']
+        print(f"{distinct_users['creators']} users created issues and "
+              f"{distinct_users['authors']} users authored events.")
+        if distinct_users['note']:
+            print(f"Distinct user counts are {distinct_users['note']}")
+        if results['creators_note']:
+            print(f"Issue counts per creator are {results['creators_note']}")
         
 
         ### BAR CHART
         # Display a graph of the top 50 creators of issues
         top_n:int = 50
-        # Create a dataframe (with only the creator's name) to make statistics a lot easier
-        df = pd.DataFrame.from_records([{'creator':issue.creator} for issue in issues])
-        # Determine the number of issues for each creator and generate a bar chart of the top N
-        df_hist = df.groupby(df["creator"]).value_counts().nlargest(top_n).plot(kind="bar", figsize=(14,8), title=f"Top {top_n} issue creators")
+        # Number of issues for each creator (in the order of their names)
+        counts = pd.Series(creators, dtype='int64', name='count').sort_index().rename_axis('creator')
+        # Generate a bar chart of the top N
+        df_hist = counts.nlargest(top_n).plot(kind="bar", figsize=(14,8), title=f"Top {top_n} issue creators")
         # Set axes labels
         df_hist.set_xlabel("Creator Names")
         df_hist.set_ylabel("# of issues created")
         # Plot the chart
-        plt.show() 
+        rendering.show() 
                         
     
 
@@ -0,0 +1,310 @@
+"""
+Incrementally maintained aggregates.
+
+The issues and the aggregates that several analyses are based on are
+kept in an SQLite database, with the issues keyed by their number:
+
+- the monthly label counts of the LabelTrendAnalysis
+- the number of 'labeled' events per label (EventLabelCategoriesAnalysis)
+- the issue count and the reopened issues (ReopenedIssueAnalysis)
+- the count, sum and sum of squares of the days it took to close issues
+  (as computed by the TimeBasedIssueAnalysis)
+
+A delta file with new or changed issues is ingested by subtracting the
+contribution of the stored version of each issue from the aggregates and
+adding that of the new version, so the cost of a refresh is proportional
+to the size of the delta. The contribution of an issue is computed with
+the same accumulators the analyses use in a full scan.
+
+    python -m analysis.incremental init    # from ENPM611_PROJECT_DATA_PATH
+    python -m analysis.incremental apply delta.json
+    python -m analysis.incremental export merged.json
+    python -m analysis.incremental stats
+
+If ENPM611_PROJECT_AGGREGATES points to the database, run.py serves the
+analyses that support it from the maintained aggregates. The database
+records the fingerprint of the data file that holds the same issues (the
+one it was initialized from, or the one the merged issues were last
+exported to), and is only used while that is the configured data file.
+"""
+
+import argparse
+import json
+import math
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import config as config
+from analysis.aggregator import scan
+from data.cache import file_fingerprint, file_hash
+from data.repositories import configured_data_paths
+from analysis.event_label_categories_analysis import LabelEventCounts
+from analysis.label_trend_analysis import LabelTrend
+from analysis.reopened_issue_analysis import ReopenedIssues
+from analysis.time_based_issue_analysis import ClosedIssues
+from data.stream import iter_records
+from models.model import Issue
+
+# (aggregate, key) of a maintained count
+AggregateKey = Tuple[str, str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    number INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    reopened INTEGER NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS issues_position ON issues (position);
+CREATE INDEX IF NOT EXISTS issues_reopened ON issues (reopened, position);
+CREATE TABLE IF NOT EXISTS aggregates (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, key)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def contributions(issue:Issue) -> Tuple[Dict[AggregateKey, float], bool]:
+    """
+    The contribution of a single issue to the maintained aggregates, and
+    whether it counts as reopened.
+    """
+    label_trend = LabelTrend()
+    label_events = LabelEventCounts('')
+    reopened = ReopenedIssues()
+    closed = ClosedIssues()
+    scan([issue], [label_trend, label_events, reopened, closed])
+
+    counts = defaultdict(float)
+    for label, months in label_trend.result().items():
+        for month, count in months.items():
+            counts[('label_trend', json.dumps([label, month]))] += count
+    for label, count in label_events.result().items():
+        counts[('label_events', label)] += count
+    counts[('reopened', 'issues')] += 1
+    is_reopened = bool(reopened.result()['reopened_issues_details'])
+    for _, _, _, created, closed_time in closed.result():
+        if created is not None and closed_time is not None:
+            days = (closed_time - created).days
+            counts[('close_time', 'count')] += 1
+            counts[('close_time', 'sum_days')] += days
+            counts[('close_time', 'sum_squared_days')] += days * days
+    return counts, is_reopened
+
+
+class MaintainedAggregates:
+    """
+    Issues and aggregates in an SQLite database that are updated in place
+    as new or changed issues are ingested. The analyses may read them from
+    several threads, as in the analysis server; their queries take turns
+    on the connection.
+    """
+
+    def __init__(self, db_path:str):
+        """
+        Constructor
+        """
+        self.db_path:str = db_path
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.executescript(_SCHEMA)
+        self._lock:threading.Lock = threading.Lock()
+
+    def close(self):
+        self.connection.close()
+
+    def ingest(self, records:Iterable[dict]) -> Tuple[int, int]:
+        """
+        Adds new issues and replaces changed ones (by number), updating
+        the aggregates. Returns the number of new and updated issues.
+        """
+        changes = defaultdict(float)
+        new, updated = 0, 0
+        cursor = self.connection.cursor()
+        next_position = cursor.execute('SELECT COALESCE(MAX(position) + 1, 0) FROM issues').fetchone()[0]
+        with self._lock, self.connection:
+            # The issues no longer match the data file they came from
+            cursor.execute("DELETE FROM meta WHERE name = 'source'")
+            for record in records:
+                issue = Issue(record)
+                row = cursor.execute('SELECT position, record FROM issues WHERE number = ?',
+                                     (issue.number,)).fetchone()
+                if row is None:
+                    position = next_position
+                    next_position += 1
+                    new += 1
+                else:
+                    # A changed issue keeps its place in the dataset
+                    position = row[0]
+                    for key, value in contributions(Issue(json.loads(row[1])))[0].items():
+                        changes[key] -= value
+                    updated += 1
+                counts, is_reopened = contributions(issue)
+                for key, value in counts.items():
+                    changes[key] += value
+                cursor.execute('INSERT OR REPLACE INTO issues (number, position, reopened, record) VALUES (?, ?, ?, ?)',
+                               (issue.number, position, int(is_reopened), json.dumps(record)))
+            self._apply(cursor, changes)
+        return new, updated
+
+    def _apply(self, cursor:sqlite3.Cursor, changes:Dict[AggregateKey, float]):
+        for (name, key), value in changes.items():
+            if value == 0:
+                continue
+            cursor.execute('INSERT INTO aggregates (name, key, value) VALUES (?, ?, ?) '
+                           'ON CONFLICT (name, key) DO UPDATE SET value = value + excluded.value',
+                           (name, key, value))
+            # Drop keys that no issue contributes to anymore, as a full scan would not produce them
+            cursor.execute('DELETE FROM aggregates WHERE name = ? AND key = ? AND value = 0', (name, key))
+
+    def _fetch(self, sql:str, parameters:tuple=()) -> List[tuple]:
+        with self._lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def _values(self, name:str) -> List[Tuple[str, float]]:
+        # Ordered by key, so the results do not depend on the order in which the issues were ingested
+        return self._fetch('SELECT key, value FROM aggregates WHERE name = ? ORDER BY key', (name,))
+
+    def num_issues(self) -> int:
+        return self._fetch('SELECT COUNT(*) FROM issues')[0][0]
+
+    def set_source(self, path:str):
+        """
+        Records that the data file holds the same issues as the database.
+        """
+        with self._lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('source', ?)",
+                                    (json.dumps(file_fingerprint(path)),))
+
+    def matches(self, data_paths:List[str]) -> bool:
+        """
+        Whether the data file in use holds the same issues as the database.
+        Like the dataset cache, the content hash is only compared when the
+        size matches but the modification time differs.
+        """
+        rows = self._fetch("SELECT value FROM meta WHERE name = 'source'")
+        if not rows or len(data_paths) != 1:
+            return False
+        source = json.loads(rows[0][0])
+        try:
+            current = file_fingerprint(data_paths[0], with_hash=False)
+        except OSError:
+            return False
+        if current['size'] != source['size']:
+            return False
+        return current['mtime_ns'] == source['mtime_ns'] or file_hash(data_paths[0]) == source['sha256']
+
+    def label_trend(self) -> Dict[str, Dict[str, int]]:
+        """
+        The usage of each label per month of issue creation.
+        """
+        label_trend = {}
+        for key, value in self._values('label_trend'):
+            label, month = json.loads(key)
+            label_trend.setdefault(label, {})[month] = int(value)
+        return label_trend
+
+    def label_event_counts(self, label_prefix:str) -> Dict[str, int]:
+        """
+        The number of 'labeled' events per label with the given prefix
+        (with the prefix removed).
+        """
+        counts = {}
+        for label, value in self._values('label_events'):
+            if label.startswith(label_prefix):
+                label_clean = label.replace(label_prefix, '')
+                counts[label_clean] = counts.get(label_clean, 0) + int(value)
+        return counts
+
+    def reopened(self) -> Dict[str, any]:
+        """
+        The number of issues and the details of the reopened ones.
+        """
+        issue_count = dict(self._values('reopened')).get('issues', 0)
+        details = []
+        for (record,) in self._fetch('SELECT record FROM issues WHERE reopened = 1 ORDER BY position'):
+            issue = Issue(json.loads(record))
+            details.append({'issue_id': issue.number, 'title': issue.title, 'labels': issue.labels})
+        return {'issue_count': int(issue_count), 'reopened_issues_details': details}
+
+    def close_time_stats(self) -> Dict[str, float]:
+        """
+        Count, mean and standard deviation of the days it took to close issues.
+        """
+        values = dict(self._values('close_time'))
+        count = values.get('count', 0)
+        if not count:
+            return {'count': 0, 'mean_days': None, 'std_days': None}
+        mean = values['sum_days'] / count
+        variance = max(values['sum_squared_days'] / count - mean * mean, 0)
+        return {'count': int(count), 'mean_days': mean, 'std_days': math.sqrt(variance)}
+
+    def records(self) -> Iterator[dict]:
+        """
+        The stored issue records in the order of the dataset.
+        """
+        for (record,) in self.connection.execute('SELECT record FROM issues ORDER BY position'):
+            yield json.loads(record)
+
+    def export(self, path:str):
+        """
+        Writes the stored issues as a data file, e.g. to replace the data
+        file with the merged dataset, which the database then serves.
+        """
+        with open(path, 'w') as fout:
+            fout.write('[')
+            for count, record in enumerate(self.records()):
+                if count:
+                    fout.write(',\n')
+                fout.write(json.dumps(record))
+            fout.write(']\n')
+        self.set_source(path)
+
+
+def ingest_file(aggregates:MaintainedAggregates, path:str) -> Tuple[int, int]:
+    with open(path, 'r') as fin:
+        return aggregates.ingest(iter_records(fin))
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser('incremental.py')
+    ap.add_argument('command', choices=['init', 'apply', 'export', 'stats'],
+                    help='init: ingest the data file, apply: ingest a delta file, '
+                         'export: write the stored issues as a data file, stats: print close-time statistics')
+    ap.add_argument('path', type=str, nargs='?',
+                    help='Delta file (apply) or output file (export)')
+    ap.add_argument('--db', type=str, required=False,
+                    help='Path of the database (default: ENPM611_PROJECT_AGGREGATES)')
+    ap.add_argument('--repo', '-r', type=str, required=False,
+                    help='Repository whose data file to ingest, if there are several')
+    args = ap.parse_args()
+    if args.command in ('apply', 'export') and args.path is None:
+        ap.error(f'{args.command} requires a path')
+    if args.repo is not None:
+        config.set_parameter('repo', args.repo)
+
+    data_paths = configured_data_paths()
+    if len(data_paths) > 1:
+        ap.error('The maintained aggregates are kept for a single repository, select one with --repo')
+    data_path = data_paths[0] if data_paths else None
+    db_path = args.db or config.get_parameter('ENPM611_PROJECT_AGGREGATES') or f'{data_path}.aggregates.db'
+    aggregates = MaintainedAggregates(db_path)
+    if args.command in ('init', 'apply'):
+        source = data_path if args.command == 'init' else args.path
+        new, updated = ingest_file(aggregates, source)
+        if args.command == 'init' and new + updated == aggregates.num_issues():
+            aggregates.set_source(source)
+        print(f'Ingested {new} new and {updated} updated issues from {source} into {db_path}.')
+    elif args.command == 'export':
+        aggregates.export(args.path)
+        print(f'Wrote the stored issues to {args.path}.')
+    else:
+        print(aggregates.close_time_stats())
+    aggregates.close()
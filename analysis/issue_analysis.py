@@ -1,17 +1,109 @@
 import config as config
 from typing import List
-from collections import defaultdict
-from data.data_loader import DataLoader
+from analysis.aggregator import Accumulator, Analysis
+import analysis.rendering as rendering
+import analysis.sketches as sketches
 import matplotlib.pyplot as plt
 
-from models.model import Issue
+from models.model import Issue, Event
 
-class IssueAnalysis:
+class StateCounts(Accumulator):
+    """
+    Counts the open and closed issues.
+    """
+
+    def __init__(self):
+        self.open_issue_count = 0
+        self.closed_issue_count = 0
+        self.notknown_count = 0
+
+    def add_issue(self, issue:Issue):
+        if issue.state == "open":
+            self.open_issue_count += 1
+        elif issue.state == "closed":
+            self.closed_issue_count += 1
+        else:
+            self.notknown_count += 1
+
+    def merge(self, other:'StateCounts'):
+        self.open_issue_count += other.open_issue_count
+        self.closed_issue_count += other.closed_issue_count
+        self.notknown_count += other.notknown_count
+
+    def result(self):
+        return {'open': self.open_issue_count, 'closed': self.closed_issue_count,
+                'notknown': self.notknown_count}
+
+class LabelCounts(Accumulator):
+    """
+    Counts how many issues carry each label (approximately in the
+    approximate mode, see analysis/sketches.py).
+    """
+
+    def __init__(self):
+        self.label_counts = sketches.counter()
+
+    def add_issue(self, issue:Issue):
+        for label in issue.labels:
+            self.label_counts.add(label)
+
+    def merge(self, other:'LabelCounts'):
+        self.label_counts.merge(other.label_counts)
+
+    def result(self):
+        return self.label_counts.estimates()
+
+class AssigneeCounts(Accumulator):
+    """
+    Counts the issues with and without assignee.
+    """
+
+    def __init__(self):
+        self.no_assignee_in_issue = 0
+        self.assignee_in_issue = 0
+
+    def add_issue(self, issue:Issue):
+        if not issue.assignees:
+            self.no_assignee_in_issue += 1
+        else:
+            self.assignee_in_issue += 1
+
+    def merge(self, other:'AssigneeCounts'):
+        self.no_assignee_in_issue += other.no_assignee_in_issue
+        self.assignee_in_issue += other.assignee_in_issue
+
+    def result(self):
+        return {'no_assignee': self.no_assignee_in_issue, 'assignee': self.assignee_in_issue}
+
+class AssignTimes(Accumulator):
+    """
+    Collects the time (in months) from the creation of an assigned issue
+    to each of its 'assigned' events, optionally only for issues with a label.
+    """
+    needs_events = True
+    event_filter = ('event_type', 'assigned')
+
+    def __init__(self, label:str=None):
+        self.needs_issues = False
+        self.issue_filter = ('label', label) if label is not None else None
+        self.assignedtime = []
+
+    def add_event(self, issue:Issue, event:Event):
+        if issue.assignees:
+            self.assignedtime.append((event.event_date - issue.created_date).total_seconds()/(86400*30))
+
+    def merge(self, other:'AssignTimes'):
+        self.assignedtime.extend(other.assignedtime)
+
+    def result(self):
+        return self.assignedtime
+
+class IssueAnalysis(Analysis):
     """
     Implements issue analysis of GitHub
     issues and outputs the result of that analysis.
     """
-    
+
     def __init__(self):
         """
         Constructor
@@ -19,47 +111,49 @@ class IssueAnalysis:
         # Parameter is passed in via command line (--user)
         self.user:str = config.get_parameter('user')
         self.label:str = config.get_parameter('label')
-    
-    def run(self):
-        issues:List[Issue] = DataLoader().get_issues()
-        
+
+    def accumulators(self):
+        return {
+            'states': StateCounts(),
+            'labels': LabelCounts(),
+            'assignees': AssigneeCounts(),
+            'assign_times': AssignTimes(self.label),
+        }
+
+    def compute(self, partials):
+        results = dict(partials)
+        results['labels'] = find_labels(self, partials['labels'])
+        results['labels_note'] = sketches.error_note(partials['labels'])
+        results['labels_total'] = sketches.total(partials['labels'])
+        return results
+
+    def render(self, results):
         #==========Find the ratio of open and closed issues============
-        analysis_open_closed_ratio(self,issues)
+        analysis_open_closed_ratio(self, results['states'])
 
         #==========Find top 5 labels in issues============
-        top_labels(self,issues)
+        top_labels(self, results['labels'], results['labels_total'])
+        if results['labels_note']:
+            print(f"Label counts are {results['labels_note']}")
 
         #==========Find the ratio of assignee and no assignee for issues============
-        assignee_ratio(self,issues)
+        assignee_ratio(self, results['assignees'])
 
         if self.label is None:
-            time_to_assign_user(self,issues)
+            time_to_assign_user(self, results['assign_times'])
         else:
-            time_to_assign_user_label(self,issues)
+            time_to_assign_user_label(self, results['assign_times'])
 
 
-def time_to_assign_user_label(self, issues):
-    assignedtime = []
-    for issue in issues:
-        for label in issue.labels:
-            if label == self.label and issue.assignees:
-                for event in issue.events:
-                    if event.event_type== "assigned":
-                        assignedtime.append((event.event_date - issue.created_date).total_seconds()/(86400*30))
+def time_to_assign_user_label(self, assignedtime):
     plt.figure(figsize=(10, 6))  # Set figure size for better visibility
     plt.hist(assignedtime, bins=40, color='skyblue', edgecolor='black')
     plt.xlabel('Time to Assign (Months)')
     plt.ylabel('Number of Issues')
     plt.title('Distribution of Time to Assign Issues (Label = '+self.label+')')
-    plt.show()
+    rendering.show()
 
-def time_to_assign_user(self,issues):
-    assignedtime = []
-    for issue in issues:
-        if issue.assignees:
-            for event in issue.events:
-                if event.event_type== "assigned":
-                    assignedtime.append((event.event_date - issue.created_date).total_seconds()/(86400*30))
+def time_to_assign_user(self, assignedtime):
     print(len(assignedtime))
 
     plt.figure(figsize=(10, 6))
@@ -69,38 +163,26 @@ def time_to_assign_user(self,issues):
     plt.xlabel('Time to Assign a User (Months)')
     plt.ylabel('Number of Issues')
     plt.title('Distribution of Time to Assign Issues')
-    plt.show()      
+    rendering.show()
 
-def analysis_open_closed_ratio(self,issues):
-    open_issue_count = 0
-    closed_issue_count = 0
-    notknown_count = 0
-    for issue in issues:
-        if issue.state == "open":
-            open_issue_count += 1
-        elif issue.state == "closed":
-            closed_issue_count += 1
-        else:
-            notknown_count += 1
+def analysis_open_closed_ratio(self, state_counts):
     # Plotting the pie chart for open/closed issue i.e. status
     plt.figure(figsize=(8, 8))
-    plt.pie([open_issue_count, closed_issue_count], labels=["open issue","closed issue"], autopct='%1.1f%%', startangle=140)
+    plt.pie([state_counts['open'], state_counts['closed']], labels=["open issue","closed issue"], autopct='%1.1f%%', startangle=140)
     plt.title('Status of Issues')
     plt.axis('equal')
-    plt.show()
+    rendering.show()
 
-def top_labels(self,issues):
-    all_labels = find_labels(self,issues)
+def top_labels(self, all_labels, total_count):
     label_title:List[str] = []
     label_count:List[int]= []
     for label,count in all_labels[0:5]:
         label_title.append(label)
         label_count.append(count)
     #Combining all other issues in one category i.e. others
-    others_count = 0
-    for label,count in all_labels[5:]:
-        others_count += count
-    
+    #(approximate counts only cover the monitored labels, so the others are taken from the total)
+    others_count = max(total_count - sum(label_count), 0)
+
     label_title.append("all other labels")
     label_count.append(others_count)
 
@@ -112,32 +194,20 @@ def top_labels(self,issues):
     plt.ylabel("Counts")
     plt.xticks(rotation=45, ha="right")
     plt.tight_layout()
-    plt.show() 
+    rendering.show()
 
-def assignee_ratio(self,issues):
-    no_assignee_in_issue = 0
-    assignee_in_issue = 0
-    for issue in issues:
-        if not issue.assignees:
-            no_assignee_in_issue += 1
-        else:
-            assignee_in_issue += 1
+def assignee_ratio(self, assignee_counts):
     # Plotting the pie chart for ratio of assignee and no assignee
     plt.figure(figsize=(8, 8))
-    plt.pie([no_assignee_in_issue, assignee_in_issue], labels=["No Assignee", "Have assignee"], autopct='%1.1f%%', startangle=140)
+    plt.pie([assignee_counts['no_assignee'], assignee_counts['assignee']], labels=["No Assignee", "Have assignee"], autopct='%1.1f%%', startangle=140)
     plt.title('Ratio of assignee and no assignee')
     plt.axis('equal')
-    plt.show()
-        
-def find_labels(self, issues):
-    label_counts = defaultdict(int)
-    # Iterate over each Issue object in the list
-    for issue in issues:
-        for label in issue.labels:
-            label_counts[label] += 1
+    rendering.show()
+
+def find_labels(self, label_counts):
     sorted_labels = sorted(label_counts.items(), key=lambda x: x[1], reverse=True)
     return sorted_labels
 
 if __name__ == '__main__':
     # Invoke run method when running this module directly
-    IssueAnalysis().run()
\ No newline at end of file
+    IssueAnalysis().run()
@@ -3,36 +3,86 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import math
 
-from data.data_loader import DataLoader
+from analysis.aggregator import Accumulator, Analysis
+import analysis.rendering as rendering
+from data import rollups
 from models.model import Issue
+import config
 
-class LabelTrendAnalysis:
+class LabelTrend(Accumulator):
+    """
+    Counts the usage of each label per month (or day or week) of issue
+    creation, optionally only within a time window (see data/rollups.py).
+    """
+
+    def __init__(self, granularity:str='month', since:any=None, until:any=None):
+        self.granularity:str = granularity
+        self.first_bucket, self.end_bucket = rollups.bucket_window(since, until, granularity)
+        # Dictionary to hold label usage per bucket
+        self.label_trend: Dict[str, Dict[str, int]] = {}
+
+    def add_issue(self, issue:Issue):
+        if not issue.created_date:
+            return  # Skip if creation date is missing
+        bucket = rollups.bucket_of(issue.created_date, self.granularity)
+        if (self.first_bucket is not None and bucket < self.first_bucket) \
+                or (self.end_bucket is not None and bucket >= self.end_bucket):
+            return
+        created_bucket = rollups.bucket_label(bucket, self.granularity)
+
+        for label in issue.labels:
+            if label not in self.label_trend:
+                self.label_trend[label] = {}
+            if created_bucket not in self.label_trend[label]:
+                self.label_trend[label][created_bucket] = 0
+            self.label_trend[label][created_bucket] += 1
+
+    def merge(self, other:'LabelTrend'):
+        for label, months in other.label_trend.items():
+            counts = self.label_trend.setdefault(label, {})
+            for month, count in months.items():
+                counts[month] = counts.get(month, 0) + count
+
+    def result(self):
+        return self.label_trend
+
+class LabelTrendAnalysis(Analysis):
     """
     Analyzes the trend of label usage over time.
     Outputs the findings to standard out and generates a line chart for top labels.
     """
 
-    def run(self):
-        issues: List[Issue] = DataLoader().get_issues()
-
-        # Dictionary to hold label usage per month
-        label_trend: Dict[str, Dict[str, int]] = {}
-
-        for issue in issues:
-            created_month = issue.created_date.strftime('%Y-%m') if issue.created_date else None
-            if not created_month:
-                continue  # Skip if creation date is missing
-
-            for label in issue.labels:
-                if label not in label_trend:
-                    label_trend[label] = {}
-                if created_month not in label_trend[label]:
-                    label_trend[label][created_month] = 0
-                label_trend[label][created_month] += 1
+    def __init__(self):
+        """
+        Constructor
+        """
+        # Parameters are passed in via command line (--granularity, --since, --until)
+        self.granularity:str = config.get_parameter('granularity', 'month')
+        self.since:str = config.get_parameter('since')
+        self.until:str = config.get_parameter('until')
+
+    def accumulators(self):
+        # Only counts are kept, so the issues can be streamed one at a time
+        return {'label_trend': LabelTrend(self.granularity, self.since, self.until)}
+
+    def maintained(self, aggregates):
+        # The maintained aggregates only count whole months
+        if self.granularity != 'month' or self.since is not None or self.until is not None:
+            return None
+        return {'label_trend': aggregates.label_trend()}
+
+    def from_frames(self, frames):
+        # Read off the prefix sums, in time proportional to the number of buckets
+        rollup = frames.rollups.get('label', self.granularity)
+        return {'label_trend': rollup.table(self.since, self.until)}
+
+    def compute(self, partials):
+        label_trend: Dict[str, Dict[str, int]] = partials['label_trend']
 
         # Calculate total label usage to identify top labels
         total_label_usage = {label: sum(months.values()) for label, months in label_trend.items()}
-        top_labels = sorted(total_label_usage, key=total_label_usage.get, reverse=True)[:5]  # Top 5 labels
+        # Top 5 labels, ties broken by label so that every mode selects the same ones
+        top_labels = sorted(total_label_usage, key=lambda label: (-total_label_usage[label], label))[:5]
 
         # Filtering label_trend to include only top labels
         top_label_trend = {label: label_trend[label] for label in top_labels}
@@ -44,6 +94,11 @@ class LabelTrendAnalysis:
         df = pd.DataFrame(df_dict).fillna(0)
         df_sorted = df.sort_index()
 
+        return {'label_trend': label_trend, 'top_label_trend': df_sorted}
+
+    def render(self, results):
+        df_sorted = results['top_label_trend']
+
         # Output to standard out
         print("Label Trend Over Time (Top 5 Labels):")
         print(df_sorted.to_string())
@@ -60,7 +115,7 @@ class LabelTrendAnalysis:
         for label in df_sorted.columns:
             plt.plot(df_sorted.index, df_sorted[label], label=label)
 
-        plt.xlabel('Month')
+        plt.xlabel(self.granularity.capitalize())
         plt.ylabel('Number of Labels Added')
         plt.title('Trend of Top 5 Label Usage Over Time')
 
@@ -69,7 +124,7 @@ class LabelTrendAnalysis:
         plt.legend(title='Labels', bbox_to_anchor=(1.05, 1), loc='upper left')
         plt.grid(True, linestyle='--', alpha=0.5)
         plt.tight_layout()
-        plt.show()
+        rendering.show()
 
 
 
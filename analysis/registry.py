@@ -0,0 +1,76 @@
+"""
+Registry of the features that can be run from the command line.
+
+Features are registered by number and name with the location of their
+analysis class as a 'module:Class' string. The module is only imported
+when the feature is run, so that an invocation only pays for the
+libraries (pandas, matplotlib, plotly) its features actually use.
+
+    python -m analysis.registry    # prints the cold import time of every feature
+"""
+
+import importlib
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import profiling
+
+# Feature number -> (name, 'module:Class')
+FEATURES:Dict[int, Tuple[str, str]] = {
+    0: ('example', 'analysis.example_analysis:ExampleAnalysis'),
+    1: ('issues', 'analysis.issue_analysis:IssueAnalysis'),
+    2: ('time-based', 'analysis.time_based_issue_analysis:TimeBasedIssueAnalysis'),
+    3: ('reopened', 'analysis.reopened_issue_analysis:ReopenedIssueAnalysis'),
+    4: ('user', 'analysis.user_specific_issue_analysis:UserSpecificIssueAnalysis'),
+    5: ('label-trend', 'analysis.label_trend_analysis:LabelTrendAnalysis'),
+    6: ('label-events', 'analysis.event_label_categories_analysis:EventLabelCategoriesAnalysis'),
+}
+
+
+def resolve(value:str) -> Optional[int]:
+    """
+    The number of a feature given by number or name, or None if there is
+    no such feature.
+    """
+    for feature, (name, _) in FEATURES.items():
+        if value == str(feature) or value == name:
+            return feature
+    return None
+
+
+def parse_features(values:List[str]) -> Optional[List[int]]:
+    """
+    Converts feature numbers and names, or 'all', into feature numbers.
+    Returns None if a value does not name a feature.
+    """
+    if 'all' in values:
+        return list(FEATURES)
+    features = [resolve(value) for value in values]
+    return None if None in features else features
+
+
+def load(feature:int) -> type:
+    """
+    Imports and returns the analysis class of a feature.
+    """
+    module_name, class_name = FEATURES[feature][1].split(':')
+    with profiling.stage(f'import {module_name}'):
+        module = importlib.import_module(module_name)
+    return getattr(module, class_name)
+
+
+def measure_import_time(feature:int) -> float:
+    """
+    Seconds it takes a fresh interpreter to import the analysis of a feature.
+    """
+    module_name = FEATURES[feature][1].split(':')[0]
+    code = ('import time, importlib; start = time.perf_counter(); '
+            f'importlib.import_module({module_name!r}); print(time.perf_counter() - start)')
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return float(output)
+
+
+if __name__ == '__main__':
+    for feature, (name, location) in FEATURES.items():
+        print(f'{feature} {name:<14} {location:<75} {measure_import_time(feature):.3f}s')
@@ -0,0 +1,144 @@
+"""
+Outputs the charts of the analyses.
+
+By default, charts are shown in interactive windows (matplotlib) or in
+the browser (plotly). If an output directory is configured (--output-dir),
+the analyses run headless instead: every chart is written to a file in
+that directory (PNG or SVG for matplotlib, HTML for plotly). The files are
+written by a pool of worker processes, so that rendering overlaps with
+the computation and chart preparation of the next analysis. With
+ENPM611_PROJECT_RENDER_WORKERS=0, they are written in the calling thread
+instead, as in the analysis server, which must not fork its threads.
+"""
+
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List
+
+import config as config
+
+# Writer of the headless mode, created on first use
+_WRITER:'FigureWriter' = None
+
+
+class FigureWriter:
+    """
+    Writes figures to an output directory using a process pool.
+    """
+
+    def __init__(self, output_dir:str, figure_format:str, workers:int):
+        """
+        Constructor
+        """
+        import matplotlib.pyplot as plt
+        # No windows are opened in headless mode
+        plt.switch_backend('agg')
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir:str = output_dir
+        self.figure_format:str = figure_format
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 0 else None
+        self.pending:List[Future] = []
+        self.prefix:str = 'figure'
+        self.counter:int = 0
+
+    def begin(self, name:str):
+        """
+        Names the files of the following figures after an analysis.
+        """
+        self.prefix = name
+        self.counter = 0
+
+    def submit(self, figure:any):
+        self.counter += 1
+        # plotly figures are written as interactive HTML
+        extension = 'html' if hasattr(figure, 'write_html') else self.figure_format
+        path = os.path.join(self.output_dir, f'{self.prefix}-{self.counter:02d}.{extension}')
+        if self.executor is None:
+            future = Future()
+            future.set_result(_write_figure(figure, path))
+            self.pending.append(future)
+        else:
+            self.pending.append(self.executor.submit(_write_figure, figure, path))
+
+    def finish(self):
+        """
+        Waits until all figures are written.
+        """
+        for future in self.pending:
+            print(f'Saved {future.result()}')
+        self.pending = []
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+def _get_writer() -> FigureWriter:
+    global _WRITER
+    if _WRITER is None:
+        output_dir = config.get_parameter('output_dir')
+        if output_dir:
+            _WRITER = FigureWriter(output_dir,
+                                   config.get_parameter('format', 'png'),
+                                   int(config.get_parameter('ENPM611_PROJECT_RENDER_WORKERS', 2)))
+    return _WRITER
+
+
+def is_headless() -> bool:
+    return _get_writer() is not None
+
+
+def show(figure:any=None, **kwargs):
+    """
+    Outputs a chart. Without a figure, all open matplotlib figures are
+    output (like plt.show()). A plotly figure is passed explicitly.
+    """
+    writer = _get_writer()
+    if writer is None:
+        if figure is not None:
+            figure.show()
+        else:
+            import matplotlib.pyplot as plt
+            plt.show(**kwargs)
+        return
+
+    if figure is not None:
+        writer.submit(figure)
+        return
+    import matplotlib.pyplot as plt
+    for number in plt.get_fignums():
+        figure = plt.figure(number)
+        # Detach the figure from pyplot before handing it to the writer
+        plt.close(figure)
+        writer.submit(figure)
+
+
+def begin(name:str):
+    """
+    Called before an analysis renders its charts.
+    """
+    writer = _get_writer()
+    if writer is not None:
+        writer.begin(name)
+
+
+def finish():
+    """
+    Called once all analyses have rendered their charts.
+    """
+    global _WRITER
+    if _WRITER is not None:
+        _WRITER.finish()
+        _WRITER = None
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('agg')
+
+
+def _write_figure(figure:any, path:str) -> str:
+    if hasattr(figure, 'write_html'):
+        figure.write_html(path)
+    else:
+        figure.savefig(path)
+    return path
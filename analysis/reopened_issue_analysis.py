@@ -1,44 +1,90 @@
 import sys
 import os
-from data.data_loader import DataLoader
 
 from typing import List
 import matplotlib.pyplot as plt
-from data.data_loader import DataLoader
-from models.model import Issue
+import numpy as np
+from analysis.aggregator import Accumulator, Analysis
+import analysis.rendering as rendering
+from models.model import Issue, Event
 
-class ReopenedIssueAnalysis:
+class ReopenedIssues(Accumulator):
+    """
+    Collects the issues that have both a 'closed' and a 'reopened' event.
+    """
+    needs_events = True
+
+    def __init__(self):
+        self.issue_count = 0
+        self.reopened_issues_details = []
+        self.closed = False
+        self.reopened = False
+
+    def add_issue(self, issue:Issue):
+        self.issue_count += 1
+        self.closed = False
+        self.reopened = False
+
+    def add_event(self, issue:Issue, event:Event):
+        if event.event_type == 'closed':
+            self.closed = True
+        elif event.event_type == 'reopened':
+            self.reopened = True
+
+    def finish_issue(self, issue:Issue):
+        #if issue was both closed and then has event type reopened as well, then we store the details of the issue
+
+        if self.closed and self.reopened:
+            self.reopened_issues_details.append({
+                'issue_id' : issue.number,
+                'title': issue.title,
+                'labels': issue.labels
+            })
+
+    def merge(self, other:'ReopenedIssues'):
+        self.issue_count += other.issue_count
+        self.reopened_issues_details.extend(other.reopened_issues_details)
+
+    def result(self):
+        return {'issue_count': self.issue_count, 'reopened_issues_details': self.reopened_issues_details}
+
+class ReopenedIssueAnalysis(Analysis):
 
 #to analyze all the issues that were closed and then reopened
 
     def __init__(self):
 
-        self.issues: List[Issue] = DataLoader().get_issues()
+        self.issue_count = 0
         self.reopened_issues_count = 0
         self.reopened_issues_details = []
 
-    def analyze_issues_reopened(self):
+    def accumulators(self):
 
     #to analyze reopened issues
 
-        for issue in self.issues:
-            closed = False
-            reopened = False
-            for event in issue.events:
-                if event.event_type == 'closed':
-                    closed = True
-                elif event.event_type == 'reopened':
-                    reopened = True
-            
-            #if issue was both closed and then has event type reopened as well, then we store the details of the issue
-
-            if closed and reopened:
-                self.reopened_issues_count += 1
-                self.reopened_issues_details.append({
-                    'issue_id' : issue.number,
-                    'title': issue.title,
-                    'labels': issue.labels
-                })
+        return {'reopened': ReopenedIssues()}
+
+    def maintained(self, aggregates):
+        return {'reopened': aggregates.reopened()}
+
+    def from_frames(self, frames):
+        # Issues with both a 'closed' and a 'reopened' event, from the lifecycle table
+        lifecycle = frames.lifecycle
+        positions = np.flatnonzero((lifecycle.count('closed') > 0) & (lifecycle.reopen_count > 0))
+        issues = frames['issues'].iloc[positions]
+        issue_labels = frames['issue_labels']
+        labels = issue_labels[issue_labels['issue'].isin(positions)].groupby('issue')['label'].agg(tuple)
+        details = [{'issue_id': int(number), 'title': title, 'labels': list(labels.get(position, ()))}
+                   for position, number, title in zip(positions, issues['number'], issues['title'])]
+        return {'reopened': {'issue_count': len(frames['issues']), 'reopened_issues_details': details}}
+
+    def compute(self, partials):
+        reopened = partials['reopened']
+        return {
+            'issue_count': reopened['issue_count'],
+            'reopened_issues_count': len(reopened['reopened_issues_details']),
+            'reopened_issues_details': reopened['reopened_issues_details'],
+        }
 
     def display_summary(self):
         #to display analysis summary
@@ -100,11 +146,11 @@ class ReopenedIssueAnalysis:
                 label.set_fontweight('bold')
 
         plt.tight_layout()
-        plt.show(block=False) #non-blocking show so that second plot can show too
+        rendering.show(block=False) #non-blocking show so that second plot can show too
 
     def plot_reopened_pichart(self):
 
-        total_no_of_issues = len(self.issues)
+        total_no_of_issues = self.issue_count
         reopened_issues = self.reopened_issues_count
         non_reopened_issues = total_no_of_issues - reopened_issues
 
@@ -123,15 +169,17 @@ class ReopenedIssueAnalysis:
             pad=30  # Move the title higher by adding padding
         )
         plt.axis('equal')  # Equal aspect ratio to ensure that the pie chart is drawn as a circle.
-        plt.show()
+        rendering.show()
 
 
 
-    def run(self):
+    def render(self, results):
             """
-            Run the full analysis and display results.
+            Display the results of the analysis.
             """
-            self.analyze_issues_reopened()
+            self.issue_count = results['issue_count']
+            self.reopened_issues_count = results['reopened_issues_count']
+            self.reopened_issues_details = results['reopened_issues_details']
             self.display_summary()
             self.plot_reopened_issues()
             self.plot_reopened_pichart()
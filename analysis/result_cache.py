@@ -0,0 +1,194 @@
+"""
+Caches the computed results of analyses on disk.
+
+The results of an analysis (the output of its compute step) are stored
+under a key made of the name of the analysis, the --user, --label,
+--granularity, --since and --until parameters, the sketch settings of
+the approximate mode, the content hash of the analysis's module, the
+content hash of the source the analyses build on (the analysis, data
+and models packages and the config module) and the content hash of the
+data files. A repeated run with the same inputs then skips the scan and
+goes straight to rendering, while a change to the code or the data
+computes the results anew.
+
+The content hash of every data file is remembered along with its size and
+modification time, so it is only recomputed when the file changed. The
+cache is bounded in size; when it grows too large, the entries that
+were used least recently are removed.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+from typing import Dict, List, Optional
+
+import config as config
+import analysis.sketches as sketches
+from data.cache import file_fingerprint, file_hash
+from data.repositories import configured_data_paths
+
+# Incremented whenever the layout of the cache changes
+RESULT_CACHE_VERSION:int = 1
+
+# Source the results of every analysis depend on, relative to the project directory
+_SOURCE_PACKAGES = ('analysis', 'data', 'models')
+_SOURCE_MODULES = ('config.py',)
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Content hash of that source, computed once per process
+_SOURCE_HASH:str = None
+
+_FINGERPRINTS_FILE = 'fingerprints.json'
+_ENTRY_SUFFIX = '.pkl'
+
+
+class ResultCache:
+    """
+    Size-bounded, least-recently-used cache of analysis results.
+    """
+
+    def __init__(self, cache_dir:str, data_paths:List[str], max_bytes:int):
+        """
+        Constructor
+        """
+        self.cache_dir:str = cache_dir
+        self.data_paths:List[str] = data_paths
+        self.max_bytes:int = max_bytes
+        self._data_hash:str = None
+
+    @staticmethod
+    def configured() -> Optional['ResultCache']:
+        """
+        The result cache configured through ENPM611_PROJECT_RESULT_CACHE
+        (a directory, or any other true value such as true or 1 for a
+        directory next to the (first) data file), or None if it is not
+        enabled.
+        """
+        setting = config.get_parameter('ENPM611_PROJECT_RESULT_CACHE')
+        if not setting:
+            return None
+        data_paths = configured_data_paths()
+        if not data_paths:
+            return None
+        cache_dir = setting if isinstance(setting, str) else f'{data_paths[0]}.results'
+        max_megabytes = config.get_parameter('ENPM611_PROJECT_RESULT_CACHE_SIZE', 256)
+        return ResultCache(cache_dir, data_paths, int(max_megabytes * 1024 * 1024))
+
+    def key(self, analysis:any) -> str:
+        module_path = inspect.getsourcefile(type(analysis))
+        parts = {
+            'version': RESULT_CACHE_VERSION,
+            'analysis': f'{type(analysis).__module__}.{type(analysis).__name__}',
+            'code': file_hash(module_path) if module_path else None,
+            'source': source_hash(),
+            'user': config.get_parameter('user'),
+            'label': config.get_parameter('label'),
+            'granularity': config.get_parameter('granularity', 'month'),
+            'since': config.get_parameter('since'),
+            'until': config.get_parameter('until'),
+            'approximate': sketches.settings(),
+            'data': self.data_hash(),
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    def get(self, analysis:any) -> Optional[Dict[str, any]]:
+        """
+        The cached results of the analysis, or None if there are none.
+        """
+        path = self._entry_path(analysis)
+        try:
+            with open(path, 'rb') as fin:
+                results = pickle.load(fin)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.warning(f'Ignoring unreadable result cache entry {path}')
+            return None
+        # Mark the entry as recently used
+        os.utime(path)
+        return results
+
+    def put(self, analysis:any, results:Dict[str, any]):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._entry_path(analysis)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as fout:
+            pickle.dump(results, fout, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits its size.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(_ENTRY_SUFFIX):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    def data_hash(self) -> str:
+        """
+        The content hash of the data files, where the hash of each file is
+        only recomputed if its size or modification time changed.
+        """
+        if self._data_hash is None:
+            fingerprints_path = os.path.join(self.cache_dir, _FINGERPRINTS_FILE)
+            try:
+                with open(fingerprints_path, 'r') as fin:
+                    fingerprints = json.load(fin)
+            except (FileNotFoundError, ValueError):
+                fingerprints = {}
+            hashes, changed = [], False
+            for data_path in self.data_paths:
+                key = os.path.abspath(data_path)
+                current = file_fingerprint(data_path, with_hash=False)
+                known = fingerprints.get(key, {})
+                if known.get('size') == current['size'] and known.get('mtime_ns') == current['mtime_ns']:
+                    hashes.append(known['sha256'])
+                else:
+                    hashes.append(file_hash(data_path))
+                    fingerprints[key] = {**current, 'sha256': hashes[-1]}
+                    changed = True
+            if changed:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(fingerprints_path, 'w') as fout:
+                    json.dump(fingerprints, fout)
+            # A single data file keeps its own hash as the key
+            self._data_hash = hashes[0] if len(hashes) == 1 \
+                else hashlib.sha256(' '.join(hashes).encode()).hexdigest()
+        return self._data_hash
+
+    def _entry_path(self, analysis:any) -> str:
+        return os.path.join(self.cache_dir, self.key(analysis) + _ENTRY_SUFFIX)
+
+
+def source_hash() -> str:
+    """
+    The content hash of the source of the analysis, data and models
+    packages and the config module, so that cached results are not
+    served after the code that computed them changed.
+    """
+    global _SOURCE_HASH
+    if _SOURCE_HASH is None:
+        paths = [os.path.join(_PROJECT_DIR, module) for module in _SOURCE_MODULES]
+        for package in _SOURCE_PACKAGES:
+            package_dir = os.path.join(_PROJECT_DIR, package)
+            paths.extend(os.path.join(package_dir, name) for name in os.listdir(package_dir) if name.endswith('.py'))
+        digest = hashlib.sha256()
+        for path in sorted(paths):
+            digest.update(os.path.relpath(path, _PROJECT_DIR).encode('utf-8'))
+            digest.update(file_hash(path).encode('ascii'))
+        _SOURCE_HASH = digest.hexdigest()
+    return _SOURCE_HASH
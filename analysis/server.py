@@ -0,0 +1,398 @@
+"""
+Long-running analysis server that keeps the dataset resident.
+
+    python -m analysis.server --port 8611
+
+The data files are loaded once, together with the indexes (and, with
+columnar storage, the frames and the lifecycle table), and kept in memory
+while the server answers analysis requests over HTTP:
+
+    GET  /analyses?feature=1&feature=label-trend&user=abn&label=kind/bug
+    GET  /analyses?feature=issues&charts=png
+    GET  /analyses?feature=label-trend&granularity=week&since=2024-01&until=2024-07
+    GET  /status
+    POST /reload
+
+/analyses computes the given features (numbers or names, as for run.py)
+with the optional user, label, granularity, since and until, and returns their computed tables as
+JSON. With charts=png or charts=svg, the analyses are also rendered: the
+response then holds their text output and their charts as base64 encoded
+files. /status describes the loaded data and whether the data files
+changed since, and /reload loads them again.
+
+Requests are handled concurrently in a thread each. The parameters of a
+request only apply within its thread (see config.parameters), and the
+computations share the resident data, which they only read. A reload
+waits for the running requests and holds back new ones until the data is
+loaded again. Rendering uses the global state of matplotlib and is done
+one request at a time, in the thread of the request rather than in
+worker processes, as forking a process with running threads can
+deadlock. Its text output is captured per thread, so that the output of
+other threads does not end up in the response.
+
+If ENPM611_PROJECT_AGGREGATES is set, the maintained aggregates (see
+analysis/incremental.py) are opened once per load and serve the analyses
+that support them while they match the loaded data files.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import argparse
+import base64
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from analysis import registry
+from analysis.aggregator import compute_analyses
+import analysis.rendering as rendering
+import config as config
+from data import data_loader
+from data.cache import file_fingerprint
+from data.data_loader import DataLoader
+from data.rollups import GRANULARITIES
+
+DEFAULT_PORT:int = 8611
+
+_CHART_FORMATS = ('png', 'svg')
+
+# Parameters of the analyses that requests can set, as with the options of run.py
+_PARAMETERS = ('user', 'label', 'granularity', 'since', 'until')
+
+
+class ReadWriteLock:
+    """
+    Lock that is shared by any number of readers or held by one writer.
+    Waiting writers take precedence over new readers.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self._condition = threading.Condition()
+        self._readers:int = 0
+        self._writing:bool = False
+        self._waiting_writers:int = 0
+
+    @contextlib.contextmanager
+    def reading(self):
+        with self._condition:
+            while self._writing or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def writing(self):
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class ThreadOutput(io.TextIOBase):
+    """
+    Standard output that is captured separately in the threads that ask
+    for it and passed on to the original stream in all others.
+    """
+
+    def __init__(self, stream:io.TextIOBase):
+        """
+        Constructor
+        """
+        self.stream:io.TextIOBase = stream
+        self._local:threading.local = threading.local()
+
+    @contextlib.contextmanager
+    def capture(self):
+        buffer = io.StringIO()
+        self._local.buffer = buffer
+        try:
+            yield buffer
+        finally:
+            self._local.buffer = None
+
+    def write(self, text:str) -> int:
+        buffer = getattr(self._local, 'buffer', None)
+        return (self.stream if buffer is None else buffer).write(text)
+
+    def flush(self):
+        if getattr(self._local, 'buffer', None) is None:
+            self.stream.flush()
+
+
+class AnalysisServer(ThreadingHTTPServer):
+    """
+    HTTP server that answers analysis requests from the resident data.
+    """
+    daemon_threads = True
+
+    def __init__(self, address:tuple):
+        """
+        Constructor
+        """
+        super().__init__(address, RequestHandler)
+        self.data_lock:ReadWriteLock = ReadWriteLock()
+        self.render_lock:threading.Lock = threading.Lock()
+        self.loaded_at:float = None
+        self.load_seconds:float = None
+        self.num_issues:int = 0
+        # Fingerprints of the data files at the time they were loaded
+        self.fingerprints:Dict[str, dict] = {}
+        # Maintained aggregates that match the loaded data files, if configured
+        self.aggregates:'MaintainedAggregates' = None
+        # The output of the analyses is captured per request while they render
+        self.output:ThreadOutput = ThreadOutput(sys.stdout)
+        sys.stdout = self.output
+
+    def load(self):
+        """
+        Loads the data files and builds everything the analyses use, so
+        that requests only read the resident data.
+        """
+        with self.data_lock.writing():
+            started = time.perf_counter()
+            data_loader.reset()
+            loader = DataLoader()
+            self.fingerprints = {path: file_fingerprint(path, with_hash=False) for path in loader.data_paths}
+            if loader.prefers_frames():
+                frames = loader.get_frames()
+                # The frames are otherwise built on first access
+                for name in frames:
+                    frames[name]
+                loader.get_lifecycle()
+                # The rollup of the default granularity; others are built on first use
+                frames.rollups.get('label', 'month')
+            index = loader.get_index()
+            index.build()
+            self.num_issues = len(index.issues)
+            self._open_aggregates(loader.data_paths)
+            self.loaded_at = time.time()
+            self.load_seconds = time.perf_counter() - started
+
+    def _open_aggregates(self, data_paths:List[str]):
+        if self.aggregates is not None:
+            self.aggregates.close()
+            self.aggregates = None
+        aggregates_path = config.get_parameter('ENPM611_PROJECT_AGGREGATES')
+        if not aggregates_path:
+            return
+        from analysis.incremental import MaintainedAggregates
+        aggregates = MaintainedAggregates(aggregates_path)
+        if aggregates.matches(data_paths):
+            self.aggregates = aggregates
+        else:
+            logger.warning(f'Ignoring the maintained aggregates in {aggregates_path}, '
+                           'as they do not match the data file')
+            aggregates.close()
+
+    def changed(self) -> List[str]:
+        """
+        The data files that changed since they were loaded.
+        """
+        return [path for path, fingerprint in self.fingerprints.items()
+                if not os.path.exists(path) or file_fingerprint(path, with_hash=False) != fingerprint]
+
+    def status(self) -> Dict[str, any]:
+        with self.data_lock.reading():
+            return {
+                'data_paths': list(self.fingerprints),
+                'issues': self.num_issues,
+                'loaded_at': datetime.fromtimestamp(self.loaded_at).isoformat(),
+                'load_seconds': self.load_seconds,
+                'changed': self.changed(),
+            }
+
+    def analyze(self, features:List[int], parameters:Dict[str, str], charts:str) -> List[Dict[str, any]]:
+        """
+        Computes (and, with a chart format, renders) the features with the
+        given parameters (user, label, ...).
+        """
+        # Chunked execution would scan the data files instead of the resident data
+        with config.parameters(**parameters, ENPM611_PROJECT_CHUNK_SIZE=None), self.data_lock.reading():
+            analyses = [registry.load(feature)() for feature in features]
+            # Once the data files change, the aggregates may no longer hold the loaded issues
+            aggregates = self.aggregates if self.aggregates is not None and not self.changed() else None
+            computed = compute_analyses(analyses, aggregates=aggregates)
+            responses = []
+            for feature, analysis, results in zip(features, analyses, computed):
+                response = {'feature': feature, 'name': registry.FEATURES[feature][0], 'results': to_json(results)}
+                if charts:
+                    response.update(self.render(analysis, results, charts))
+                responses.append(response)
+            return responses
+
+    def render(self, analysis:any, results:Dict[str, any], charts:str) -> Dict[str, any]:
+        """
+        The text output and the chart files of an analysis.
+        """
+        with self.render_lock, tempfile.TemporaryDirectory() as output_dir, \
+                config.parameters(output_dir=output_dir, format=charts, ENPM611_PROJECT_RENDER_WORKERS=0):
+            with self.output.capture() as output:
+                rendering.begin(type(analysis).__name__)
+                analysis.render(results)
+                rendering.finish()
+            files = []
+            for name in sorted(os.listdir(output_dir)):
+                with open(os.path.join(output_dir, name), 'rb') as fin:
+                    files.append({'name': name, 'data': base64.b64encode(fin.read()).decode('ascii')})
+        # The paths of the written files are meaningless to the client
+        lines = [line for line in output.getvalue().splitlines() if not line.startswith('Saved ')]
+        return {'output': '\n'.join(lines), 'charts': files}
+
+    def server_close(self):
+        super().server_close()
+        if self.aggregates is not None:
+            self.aggregates.close()
+            self.aggregates = None
+        sys.stdout = self.output.stream
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles the requests of the analysis server.
+    """
+    server:AnalysisServer
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/analyses':
+            self._analyses(parse_qs(url.query))
+        elif url.path == '/status':
+            self._send_json(200, self.server.status())
+        else:
+            self._send_json(404, {'error': f'Unknown path {url.path}'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == '/reload':
+            self.server.load()
+            self._send_json(200, self.server.status())
+        else:
+            self._send_json(404, {'error': f'Unknown path {url.path}'})
+
+    def _analyses(self, query:Dict[str, List[str]]):
+        values = [value for values in query.get('feature', []) for value in values.split(',')]
+        features = registry.parse_features(values) if values else None
+        if not features:
+            self._send_json(400, {'error': f'Expected features (numbers or names) in the feature parameter, '
+                                           f'got {values}'})
+            return
+        charts = query.get('charts', [None])[0]
+        if charts is not None and charts not in _CHART_FORMATS:
+            self._send_json(400, {'error': f'Expected one of {", ".join(_CHART_FORMATS)} as chart format, '
+                                           f'got {charts}'})
+            return
+        parameters = {name: query.get(name, [None])[0] for name in _PARAMETERS}
+        if parameters['granularity'] is not None and parameters['granularity'] not in GRANULARITIES:
+            self._send_json(400, {'error': f'Expected one of {", ".join(GRANULARITIES)} as granularity, '
+                                           f'got {parameters["granularity"]}'})
+            return
+        try:
+            responses = self.server.analyze(features, parameters, charts)
+        except ValueError as e:
+            # Invalid parameters, such as a date that cannot be parsed
+            self._send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            logger.exception(f'Failed to compute features {features}')
+            self._send_json(500, {'error': f'{type(e).__name__}: {e}'})
+            return
+        self._send_json(200, {'analyses': responses})
+
+    def _send_json(self, status:int, body:any):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format:str, *args):
+        logger.info(f'{self.address_string()} {format % args}')
+
+
+def to_json(value:any) -> any:
+    """
+    Converts computed tables (pandas frames and series, numpy values,
+    dates, tuples, ...) into values that can be encoded as JSON.
+    """
+    if value is None or isinstance(value, (bool, str, int)):
+        return value
+    if isinstance(value, float):
+        return None if math.isnan(value) or math.isinf(value) else value
+    if isinstance(value, dict):
+        return {str(key): to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [to_json(item) for item in value]
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, np.generic):
+        return to_json(value.item())
+    if isinstance(value, np.ndarray):
+        return to_json(value.tolist())
+    # pandas is only imported by the analyses that use it
+    if hasattr(value, 'to_dict') and hasattr(value, 'index'):
+        if hasattr(value, 'columns'):
+            return {'columns': to_json(list(value.columns)), 'index': to_json(list(value.index)),
+                    'data': to_json(value.values.tolist())}
+        return {'index': to_json(list(value.index)), 'data': to_json(value.tolist())}
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s %(message)s')
+    # Log the requests, but not the info messages of the other modules
+    logger.setLevel(logging.INFO)
+    ap = argparse.ArgumentParser('server.py')
+    ap.add_argument('--host', type=str, required=False, default='127.0.0.1',
+                    help='Address to listen on (default: 127.0.0.1)')
+    ap.add_argument('--port', '-p', type=int, required=False,
+                    default=config.get_parameter('ENPM611_PROJECT_SERVER_PORT', DEFAULT_PORT),
+                    help=f'Port to listen on (default: {DEFAULT_PORT})')
+    ap.add_argument('--repo', '-r', type=str, required=False,
+                    help='Optional repository id (data file name) to restrict the analyses to')
+    args = ap.parse_args()
+    if args.repo is not None:
+        config.set_parameter('repo', args.repo)
+
+    server = AnalysisServer((args.host, args.port))
+    server.load()
+    print(f'Serving {server.num_issues} issues on http://{args.host}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,293 @@
+"""
+Fixed-size sketches for approximate counting.
+
+If ENPM611_PROJECT_APPROXIMATE is true, the accumulators that count
+labels and users use sketches instead of exact counting dictionaries
+and sets, so their memory no longer grows with the number of distinct
+labels or users:
+
+- Space-Saving keeps the counts of the (approximately) most frequent
+  items in a fixed number of counters (ENPM611_PROJECT_SKETCH_CAPACITY,
+  default 200). Every count it reports is an upper bound that is at
+  most the item's recorded error too high, and every item that occurs
+  more than total/capacity times is reported.
+- HyperLogLog estimates the number of distinct items from 2^precision
+  registers with a relative standard error of 1.04 / sqrt(2^precision).
+
+All sketches can be merged, so they work with the chunked and
+partitioned execution (see analysis/chunked.py). Items are hashed with
+blake2b rather than hash(), which differs between processes. The exact
+counterparts have the same interface, and `counter` and `distinct`
+return whichever the configuration asks for.
+"""
+
+import hashlib
+import heapq
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import config as config
+
+# Space-Saving counters used unless ENPM611_PROJECT_SKETCH_CAPACITY is set
+DEFAULT_CAPACITY:int = 200
+
+# HyperLogLog uses 2^12 registers, with a standard error of 1.6%
+HYPERLOGLOG_PRECISION:int = 12
+
+_MASK64 = (1 << 64) - 1
+
+
+def _hash64(item:str) -> int:
+    return int.from_bytes(hashlib.blake2b(item.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def is_approximate() -> bool:
+    return bool(config.get_parameter('ENPM611_PROJECT_APPROXIMATE', False))
+
+
+def settings() -> Optional[Dict[str, any]]:
+    """
+    The sizes of the sketches, or None if the counts are exact.
+    """
+    if not is_approximate():
+        return None
+    return {
+        'capacity': int(config.get_parameter('ENPM611_PROJECT_SKETCH_CAPACITY', DEFAULT_CAPACITY)),
+        'precision': HYPERLOGLOG_PRECISION,
+    }
+
+
+def counter() -> 'ExactCounter':
+    """
+    A counter of items that can report the most frequent ones.
+    """
+    if is_approximate():
+        return SpaceSaving(settings()['capacity'])
+    return ExactCounter()
+
+
+def distinct() -> 'ExactDistinct':
+    """
+    A counter of distinct items.
+    """
+    if is_approximate():
+        return HyperLogLog(HYPERLOGLOG_PRECISION)
+    return ExactDistinct()
+
+
+class Estimates(dict):
+    """
+    Approximate counts by item, along with a description of their error
+    and the number of all items counted, which the counts of the
+    monitored items need not add up to.
+    """
+
+    def __init__(self, counts:Dict[str, int], note:str, total:int):
+        """
+        Constructor
+        """
+        super().__init__(counts)
+        self.note:str = note
+        self.total:int = total
+
+
+def error_note(value:any) -> Optional[str]:
+    """
+    The description of the error of an approximate result, or None if
+    the result is exact.
+    """
+    return getattr(value, 'note', None)
+
+
+def total(counts:Dict[str, int]) -> int:
+    """
+    The number of items counted into counts by item: the total of the
+    sketch for approximate counts, otherwise the sum of the counts.
+    """
+    if isinstance(counts, Estimates):
+        return counts.total
+    return sum(counts.values())
+
+
+class ExactCounter:
+    """
+    Exact counts by item.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.counts:Dict[str, int] = {}
+
+    def add(self, item:str, count:int=1):
+        self.counts[item] = self.counts.get(item, 0) + count
+
+    def merge(self, other:'ExactCounter'):
+        for item, count in other.counts.items():
+            self.add(item, count)
+
+    def estimate(self, item:str) -> int:
+        return self.counts.get(item, 0)
+
+    def estimates(self) -> Dict[str, int]:
+        return self.counts
+
+    def top(self, n:int) -> List[Tuple[str, int, int]]:
+        """
+        The n most frequent items with their counts and the maximum error
+        of the counts.
+        """
+        ranked = sorted(self.counts.items(), key=lambda entry: entry[1], reverse=True)
+        return [(item, count, 0) for item, count in ranked[:n]]
+
+    def error_note(self) -> Optional[str]:
+        return None
+
+
+class SpaceSaving:
+    """
+    Space-Saving summary of the most frequent items in a fixed number of
+    counters (Metwally et al.), mergeable as described by Agarwal et al.
+    """
+
+    def __init__(self, capacity:int):
+        """
+        Constructor
+        """
+        self.capacity:int = capacity
+        # Item -> [count, error], where count - error <= true count <= count
+        self.counters:Dict[str, List[int]] = {}
+        self.total:int = 0
+        # (count, item) of every monitored item; counts may be outdated
+        self._heap:List[Tuple[int, str]] = []
+
+    def add(self, item:str, count:int=1):
+        self.total += count
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += count
+            return
+        if len(self.counters) < self.capacity:
+            self.counters[item] = [count, 0]
+            heapq.heappush(self._heap, (count, item))
+            return
+        # Replace the item with the smallest count, which the new item inherits as error
+        floor = self._pop_min()
+        self.counters[item] = [floor + count, floor]
+        heapq.heappush(self._heap, (floor + count, item))
+
+    def _pop_min(self) -> int:
+        while True:
+            count, item = heapq.heappop(self._heap)
+            current = self.counters[item][0]
+            if current == count:
+                del self.counters[item]
+                return count
+            # The count grew since it was pushed
+            heapq.heappush(self._heap, (current, item))
+
+    def floor(self) -> int:
+        """
+        The count of an item that is not monitored is at most this.
+        """
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    def merge(self, other:'SpaceSaving'):
+        floor, other_floor = self.floor(), other.floor()
+        combined = {}
+        for item, (count, error) in self.counters.items():
+            other_count, other_error = other.counters.get(item, (other_floor, other_floor))
+            combined[item] = [count + other_count, error + other_error]
+        for item, (count, error) in other.counters.items():
+            if item not in combined:
+                combined[item] = [count + floor, error + floor]
+        ranked = sorted(combined.items(), key=lambda entry: entry[1][0], reverse=True)
+        self.counters = dict(ranked[:self.capacity])
+        self.total += other.total
+        self._heap = [(count, item) for item, (count, _) in self.counters.items()]
+        heapq.heapify(self._heap)
+
+    def estimate(self, item:str) -> int:
+        counter = self.counters.get(item)
+        return counter[0] if counter is not None else self.floor()
+
+    def estimates(self) -> Estimates:
+        return Estimates({item: count for item, (count, _) in self.counters.items()}, self.error_note(),
+                         self.total)
+
+    def top(self, n:int) -> List[Tuple[str, int, int]]:
+        ranked = sorted(self.counters.items(), key=lambda entry: entry[1][0], reverse=True)
+        return [(item, count, error) for item, (count, error) in ranked[:n]]
+
+    def error_note(self) -> str:
+        max_error = max((error for _, error in self.counters.values()), default=0)
+        return (f'approximate (Space-Saving, {self.capacity} counters over {self.total} items): '
+                f'counts are at most {max_error} too high')
+
+
+class ExactDistinct:
+    """
+    Exact number of distinct items.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.items:set = set()
+
+    def add(self, item:str):
+        self.items.add(item)
+
+    def merge(self, other:'ExactDistinct'):
+        self.items |= other.items
+
+    def estimate(self) -> int:
+        return len(self.items)
+
+    def error_note(self) -> Optional[str]:
+        return None
+
+
+class HyperLogLog:
+    """
+    HyperLogLog estimate of the number of distinct items (Flajolet et al.).
+    """
+
+    def __init__(self, precision:int):
+        """
+        Constructor
+        """
+        self.precision:int = precision
+        self.registers:np.ndarray = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, item:str):
+        hashed = _hash64(item)
+        register = hashed >> (64 - self.precision)
+        remaining = hashed & (_MASK64 >> self.precision)
+        # Position of the leftmost 1 bit among the remaining 64 - precision bits
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[register]:
+            self.registers[register] = rank
+
+    def merge(self, other:'HyperLogLog'):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def error_note(self) -> str:
+        error = 1.04 / math.sqrt(len(self.registers))
+        return f'approximate (HyperLogLog, {len(self.registers)} registers): standard error {error:.1%}'
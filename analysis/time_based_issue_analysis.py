@@ -1,13 +1,45 @@
 from typing import List
 from numpy import average
+import numpy as np
 import pandas as pd
 import plotly.express as px
 
 import config as config
-from data.data_loader import DataLoader
-from models.model import Issue
+from analysis.aggregator import Accumulator, Analysis
+import analysis.rendering as rendering
+from models.model import Issue, Event
 
-class TimeBasedIssueAnalysis:
+class ClosedIssues(Accumulator):
+    """
+    Collects the closed issues along with the date of their last
+    'closed' event.
+    """
+    needs_events = True
+    event_filter = ('event_type', 'closed')
+
+    def __init__(self):
+        # Rows of [number, creator, labels, creation time, closed time]
+        self.rows = []
+        self.current = None
+
+    def add_issue(self, issue:Issue):
+        if issue.state == 'closed':
+            self.current = [issue.number, issue.creator, str(list(issue.labels)), issue.created_date, None]
+            self.rows.append(self.current)
+        else:
+            self.current = None
+
+    def add_event(self, issue:Issue, event:Event):
+        if self.current is not None:
+            self.current[4] = event.event_date
+
+    def merge(self, other:'ClosedIssues'):
+        self.rows.extend(other.rows)
+
+    def result(self):
+        return self.rows
+
+class TimeBasedIssueAnalysis(Analysis):
     """
     Implements time based issue analysis of closed
     GitHub issues and outputs the result of that analysis.
@@ -22,20 +54,54 @@ class TimeBasedIssueAnalysis:
         # Parameter is passed in via command line (--user)
         self.user:str = config.get_parameter('user')
     
-    def run(self):
-        issues:List[Issue] = DataLoader().get_issues()
-        open_issues = []
-        closed_issues = []
-
-        for issue in issues:
-            if issue.state == 'open':
-                open_issues.append(issue)
-            elif issue.state == 'closed':
-                closed_issues.append(issue)
-
-        print('Number of closed issues: ', len(closed_issues))
-
-        closed_issues_df = self.create_dataframe(closed_issues)
+    def accumulators(self):
+        return {'closed_issues': ClosedIssues()}
+
+    def from_frames(self, frames):
+        issues, issue_labels = frames['issues'], frames['issue_labels']
+        closed = issues[issues['state'] == 'closed']
+
+        # Date of the last 'closed' event of every issue, from the lifecycle table
+        closed_times = frames['lifecycle']['last_closed'][closed.index]
+        with_time = closed[closed_times.notna()]
+
+        # Format the labels of every issue like str(list(labels)). The labels of
+        # an issue are consecutive rows, so their texts are concatenated per run.
+        labels = issue_labels[issue_labels['issue'].isin(with_time.index)]
+        label_lists = pd.Series(dtype=object)
+        if len(labels):
+            label_issues = labels['issue'].to_numpy()
+            texts = np.array([repr(label) + ', ' for label in labels['label'].cat.categories], dtype=object)
+            starts = np.flatnonzero(np.r_[True, label_issues[1:] != label_issues[:-1]])
+            joined = np.add.reduceat(texts[labels['label'].cat.codes.to_numpy()], starts)
+            label_lists = pd.Series([f'[{text[:-2]}]' for text in joined], index=label_issues[starts])
+
+        closed_issues_df = pd.DataFrame({
+            'issue_id': with_time['number'].to_numpy(),
+            'creator': with_time['creator'].astype(object).to_numpy(),
+            'labels': label_lists.reindex(with_time.index, fill_value='[]').to_numpy(),
+            'creation_time': with_time['created_date'].to_numpy(),
+            'closed_time': closed_times[with_time.index].to_numpy(),
+        })
+        return {'closed_issue_count': len(closed), 'closed_issues_frame': closed_issues_df}
+
+    def compute(self, partials):
+        if 'closed_issues_frame' in partials:
+            return {
+                'closed_issue_count': partials['closed_issue_count'],
+                'closed_issues_df': self.add_time_columns(partials['closed_issues_frame']),
+            }
+        closed_issues = partials['closed_issues']
+        return {
+            'closed_issue_count': len(closed_issues),
+            'closed_issues_df': self.create_dataframe(closed_issues),
+        }
+
+    def render(self, results):
+        print('Number of closed issues: ', results['closed_issue_count'])
+
+        closed_issues_df = results['closed_issues_df']
+        self.print_dataframe(closed_issues_df)
 
         if self.user != None:
             self.analyse_based_on_user(self.user, closed_issues_df)
@@ -50,20 +116,13 @@ class TimeBasedIssueAnalysis:
         closed_times = []
         labels_list = []
 
-        for issue in closed_issues:
-            creation_time = issue.created_date
-            closed_time = None
-            events = issue.events
-            labels = issue.labels
-            for event in events:
-                if event.event_type == 'closed':
-                    closed_time = event.event_date
+        for number, creator, labels, creation_time, closed_time in closed_issues:
             if closed_time != None:
-                ids.append(issue.number)
-                creators.append(issue.creator)
+                ids.append(number)
+                creators.append(creator)
                 creation_times.append(creation_time)
                 closed_times.append(closed_time)
-                labels_list.append(str(labels))
+                labels_list.append(labels)
 
         closed_issues_dict['issue_id'] = ids
         closed_issues_dict['creator'] = creators
@@ -72,14 +131,20 @@ class TimeBasedIssueAnalysis:
         closed_issues_dict['closed_time'] = closed_times
 
         closed_issues_df = pd.DataFrame(closed_issues_dict)
+        return self.add_time_columns(closed_issues_df)
+
+    def add_time_columns(self, closed_issues_df):
         closed_issues_df['time_taken'] = closed_issues_df['closed_time'] - closed_issues_df['creation_time']
 
         # Calculate time difference in days
         closed_issues_df['time_diff_in_days'] = closed_issues_df['time_taken'].dt.days
 
         # Calculate the time difference in months
-        closed_issues_df['time_diff_in_months'] = closed_issues_df['time_diff_in_days'].apply(self.get_approx_months)
+        closed_issues_df['time_diff_in_months'] = (closed_issues_df['time_diff_in_days'] / 30).round(0).astype(int)
 
+        return closed_issues_df
+
+    def print_dataframe(self, closed_issues_df):
         print(closed_issues_df.head())
         print()
         
@@ -89,8 +154,6 @@ class TimeBasedIssueAnalysis:
         # Print the top 10 highest number of issues assigned to a single user
         print(closed_issues_df['creator'].value_counts().nlargest(10))
 
-        return closed_issues_df
-
     def analyse_closed_issues(self, closed_issues_df):
 
         # Print the top 10 highest number of issues assigned to a single user
@@ -103,7 +166,7 @@ class TimeBasedIssueAnalysis:
         fig = px.bar(labels_df,
                         title=f"Top 20 Labels")
 
-        fig.show()
+        rendering.show(fig)
 
         closed_issues_sorted = closed_issues_df.sort_values(by='time_diff_in_days', ascending=False)
 
@@ -126,11 +189,8 @@ class TimeBasedIssueAnalysis:
                 labels ={'creator': 'Creator',
                          'time_diff_in_months': 'Time Taken in Months'})
 
-        fig.show()
+        rendering.show(fig)
 
-    def get_approx_months(self, time_diff):
-        return int(round(time_diff / 30, 0))
-    
     def analyse_based_on_user(self, user, closed_issues_df):
         # Create a dataframe with only information about the selected users
         user_df = closed_issues_df[closed_issues_df['creator'] == user]
@@ -149,7 +209,7 @@ class TimeBasedIssueAnalysis:
                 labels={'time_diff_in_days':'Time Taken to Close Issues',
                         'labels': 'Issue Label'})
 
-            fig.show()
+            rendering.show(fig)
 
         else:
             print(f"The average time taken by user '{user}' can not be calculated as the user is not present in the dataset.")
@@ -2,51 +2,111 @@ from typing import List, Dict
 import matplotlib.pyplot as plt
 import pandas as pd
 
-from data.data_loader import DataLoader
-from models.model import Issue
+from analysis.aggregator import Accumulator, Analysis
+import analysis.rendering as rendering
+import analysis.sketches as sketches
+from models.model import Issue, Event
 import config
 
-class UserSpecificIssueAnalysis:
+class CreatedIssues(Accumulator):
+    """
+    Counts the issues created by a user.
+    """
+
+    def __init__(self, user:str):
+        self.issue_filter = ('creator', user)
+        self.created_count = 0
+
+    def add_issue(self, issue:Issue):
+        self.created_count += 1
+
+    def merge(self, other:'CreatedIssues'):
+        self.created_count += other.created_count
+
+    def result(self):
+        return self.created_count
+
+class UserEvents(Accumulator):
+    """
+    Counts a user's comments, labeling and closing events as well as the
+    labels of the events the user authored.
+    """
+    needs_issues = False
+    needs_events = True
+
+    def __init__(self, user:str):
+        self.event_filter = ('author', user)
+        self.commented_count = 0
+        self.labeled_count = 0
+        self.closed_count = 0
+        # Label-wise interaction counts (approximate in the approximate mode)
+        self.label_interactions = sketches.counter()
+
+    def add_event(self, issue:Issue, event:Event):
+        if event.event_type == 'commented':
+            self.commented_count += 1
+        elif event.event_type == 'labeled':
+            self.labeled_count += 1
+        elif event.event_type == 'closed':
+            self.closed_count += 1
+        
+        # Count label interactions
+        if event.label:
+            self.label_interactions.add(event.label)
+
+    def merge(self, other:'UserEvents'):
+        self.commented_count += other.commented_count
+        self.labeled_count += other.labeled_count
+        self.closed_count += other.closed_count
+        self.label_interactions.merge(other.label_interactions)
+
+    def result(self):
+        return {
+            'commented_count': self.commented_count,
+            'labeled_count': self.labeled_count,
+            'closed_count': self.closed_count,
+            'label_interactions': self.label_interactions.estimates(),
+        }
+
+class UserSpecificIssueAnalysis(Analysis):
     """
     Provides insights into a specific user's interactions with issues.
     Outputs the findings to standard out and generates a horizontal bar chart.
     """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.user: str = config.get_parameter('user')
     
-    def run(self):
-        user: str = config.get_parameter('user')
+    def accumulators(self):
+        if not self.user:
+            return {}
+        # Only the user's issues and events are fed to the accumulators
+        return {
+            'created_count': CreatedIssues(self.user),
+            'events': UserEvents(self.user),
+        }
+
+    def compute(self, partials):
+        if not partials:
+            return {}
+        results = {'created_count': partials['created_count']}
+        results.update(partials['events'])
+        return results
+
+    def render(self, results):
+        user = self.user
         if not user:
             print("No user specified. Please provide a user with the --user flag.")
             return
         
-        issues: List[Issue] = DataLoader().get_issues()
-        
-        # Initialize counters
-        created_count = 0
-        commented_count = 0
-        labeled_count = 0
-        closed_count = 0
-        
-        # Dictionary to hold label-wise interaction counts
-        label_interactions: Dict[str, int] = {}
-        
-        for issue in issues:
-            # Check if user created the issue
-            if issue.creator == user:
-                created_count += 1
-            
-            # Iterate through events
-            for event in issue.events:
-                if event.author == user:
-                    if event.event_type == 'commented':
-                        commented_count += 1
-                    elif event.event_type == 'labeled':
-                        labeled_count += 1
-                    elif event.event_type == 'closed':
-                        closed_count += 1
-                
-                # Count label interactions
-                if event.author == user and event.label:
-                    label_interactions[event.label] = label_interactions.get(event.label, 0) + 1
+        created_count = results['created_count']
+        commented_count = results['commented_count']
+        labeled_count = results['labeled_count']
+        closed_count = results['closed_count']
+        label_interactions: Dict[str, int] = results['label_interactions']
         
         # Output to standard out
         print(f"Insights for User: {user}")
@@ -59,6 +119,9 @@ class UserSpecificIssueAnalysis:
             print("\nLabel Interactions:")
             df_labels = pd.DataFrame(list(label_interactions.items()), columns=['Label', 'Interactions']).sort_values(by='Interactions', ascending=True)
             print(df_labels.to_string(index=False))
+            note = sketches.error_note(label_interactions)
+            if note:
+                print(f"Interactions are {note}")
             
             # Generate Horizontal Bar Chart
             plt.figure(figsize=(14, 10))
@@ -67,7 +130,7 @@ class UserSpecificIssueAnalysis:
             plt.title(f"Label Interactions by User '{user}'")
             plt.yticks(fontsize=9)
             plt.tight_layout()
-            plt.show()
+            rendering.show()
             
             
 if __name__ == '__main__':
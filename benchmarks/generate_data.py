@@ -0,0 +1,136 @@
+"""
+Generates synthetic issue data files that follow the schema of the
+poetry issues data file, for benchmarking the loader and the analyses.
+
+Creators, event authors and labels are drawn from Zipf-like distributions
+so that a few users and labels dominate, as in the real data, and the
+number of events per issue has a long tail. The records are written one
+at a time so that large datasets do not have to fit in memory.
+
+    python -m benchmarks.generate_data --issues 100k --output benchmarks/data/issues-100k.json
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+# Dataset sizes that can be passed by name
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+LABELS = ['kind/bug', 'status/triage', 'kind/feature', 'area/installer', 'status/duplicate',
+          'area/solver', 'kind/question', 'area/cli', 'area/docs', 'status/wontfix',
+          'area/venv', 'kind/enhancement', 'status/confirmed', 'area/publishing', 'area/build-system',
+          'good first issue', 'status/waiting-on-response', 'area/windows', 'kind/documentation',
+          'status/external-issue', 'area/plugin-api', 'area/deps', 'status/needs-reproduction',
+          'area/config', 'area/error-handling', 'area/testing', 'area/lock', 'area/project',
+          'area/sources', 'status/accepted']
+
+# Event types and their relative frequency
+EVENT_TYPES = {'commented': 45, 'labeled': 15, 'mentioned': 8, 'subscribed': 8,
+               'cross-referenced': 6, 'referenced': 4, 'assigned': 4, 'closed': 5,
+               'unlabeled': 2, 'renamed': 2, 'reopened': 1}
+
+WORDS = ['poetry', 'install', 'lock', 'dependency', 'resolver', 'version', 'python',
+         'package', 'error', 'when', 'using', 'fails', 'with', 'the', 'a', 'to', 'not',
+         'virtualenv', 'pyproject', 'update', 'add', 'build', 'publish', 'solver']
+
+_START = datetime(2018, 3, 1, tzinfo=timezone.utc)
+_END = datetime(2024, 10, 1, tzinfo=timezone.utc)
+
+
+class _Zipf:
+    """
+    Draws items with a probability that decreases with their rank.
+    """
+
+    def __init__(self, items:List[str], exponent:float=1.1):
+        self.items = items
+        self.cum_weights = list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, len(items) + 1)))
+
+    def draw(self, rng:random.Random) -> str:
+        pos = bisect.bisect(self.cum_weights, rng.random() * self.cum_weights[-1])
+        return self.items[min(pos, len(self.items) - 1)]
+
+
+def _text(rng:random.Random, max_words:int) -> str:
+    return ' '.join(rng.choices(WORDS, k=rng.randint(1, max_words)))
+
+
+def _date(value:datetime) -> str:
+    return value.isoformat(timespec='seconds')
+
+
+def generate_issue(rng:random.Random, number:int, users:_Zipf, labels:_Zipf) -> dict:
+    created = _START + timedelta(seconds=rng.uniform(0, (_END - _START).total_seconds()))
+    issue_labels = list(dict.fromkeys(labels.draw(rng) for _ in range(rng.choice((0, 1, 1, 2, 2, 3)))))
+    assignees = list(dict.fromkeys(users.draw(rng) for _ in range(rng.choice((0, 0, 0, 1, 1, 2)))))
+
+    events = []
+    date = created
+    # Long-tailed number of events per issue
+    for _ in range(min(int(rng.lognormvariate(1.6, 1.0)), 400)):
+        date += timedelta(seconds=rng.expovariate(1 / (5 * 86400)))
+        event_type = rng.choices(list(EVENT_TYPES), weights=list(EVENT_TYPES.values()))[0]
+        event = {'event_type': event_type, 'author': users.draw(rng), 'event_date': _date(date)}
+        if event_type in ('labeled', 'unlabeled'):
+            event['label'] = labels.draw(rng)
+        elif event_type == 'commented':
+            event['comment'] = _text(rng, 120)
+        events.append(event)
+
+    state = 'closed' if rng.random() < 0.8 else 'open'
+    if state == 'closed' and (not events or events[-1]['event_type'] != 'closed'):
+        date += timedelta(seconds=rng.expovariate(1 / (20 * 86400)))
+        events.append({'event_type': 'closed', 'author': users.draw(rng), 'event_date': _date(date)})
+
+    return {
+        'url': f'https://github.com/python-poetry/poetry/issues/{number}',
+        'creator': users.draw(rng),
+        'labels': issue_labels,
+        'state': state,
+        'assignees': assignees,
+        'title': _text(rng, 12),
+        'text': _text(rng, 200),
+        'number': number,
+        'created_date': _date(created),
+        'updated_date': _date(date),
+        'timeline_url': f'https://api.github.com/repos/python-poetry/poetry/issues/{number}/timeline',
+        'events': events,
+    }
+
+
+def generate(path:str, num_issues:int, seed:int=0):
+    """
+    Writes a data file with num_issues synthetic issues.
+    """
+    rng = random.Random(seed)
+    # The number of users grows with the dataset, but slower than the issues
+    users = _Zipf([f'user{i}' for i in range(max(50, int(num_issues ** 0.75)))])
+    labels = _Zipf(LABELS)
+    with open(path, 'w') as fout:
+        fout.write('[')
+        for number in range(1, num_issues + 1):
+            if number > 1:
+                fout.write(',\n')
+            fout.write(json.dumps(generate_issue(rng, number, users, labels)))
+        fout.write(']\n')
+
+
+def parse_size(value:str) -> int:
+    return SIZES.get(value.lower()) or int(value)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser('generate_data.py')
+    ap.add_argument('--issues', '-n', type=parse_size, required=True,
+                    help='Number of issues (a number or one of 10k, 100k, 1m)')
+    ap.add_argument('--output', '-o', type=str, required=True,
+                    help='Path of the data file to write')
+    ap.add_argument('--seed', type=int, default=0,
+                    help='Seed of the random generator')
+    args = ap.parse_args()
+    generate(args.output, args.issues, args.seed)
@@ -0,0 +1,180 @@
+"""
+Benchmarks the loader and the compute phase of every analysis.
+
+For each data file, DataLoader.get_issues is timed from a cold start,
+then the compute phase of each feature (the shared scan and the derived
+tables, without rendering) is timed against the loaded issues, after
+one untimed run that builds the indexes the feature uses. Every
+measurement is repeated; a separate run under tracemalloc records the
+peak memory. The results are written as JSON, and can be compared with
+the results of an earlier version:
+
+    python -m benchmarks.run_benchmarks benchmarks/data/issues-10k.json --output results.json
+    python -m benchmarks.run_benchmarks benchmarks/data/issues-10k.json --baseline results.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from collections import Counter
+from typing import Callable, Dict, List
+
+import config as config
+from analysis import registry
+from analysis.aggregator import compute_analyses
+from data import data_loader
+from data.data_loader import DataLoader
+
+
+def measure(func:Callable[[], any], repeat:int, memory:bool=True) -> Dict[str, any]:
+    """
+    Times func over several runs and records its peak memory in one more run.
+    Output to standard out is suppressed.
+    """
+    times = []
+    cpu_times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start, start_cpu = time.perf_counter(), time.process_time()
+            func()
+            times.append(time.perf_counter() - start)
+            cpu_times.append(time.process_time() - start_cpu)
+        peak = None
+        if memory:
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return {
+        'times': times,
+        'min': min(times),
+        'median': statistics.median(times),
+        'cpu_median': statistics.median(cpu_times),
+        'peak_memory': peak,
+    }
+
+
+def reset_loader():
+    """
+    Drops the loaded data so that the next load starts cold.
+    """
+    data_loader.reset()
+
+
+def load_issues():
+    reset_loader()
+    DataLoader().get_issues()
+
+
+def feature_parameters(feature:int, user:str, label:str) -> Dict[str, str]:
+    # The event label categories analysis interprets --label as a prefix
+    if feature == 6:
+        label = label.split('/')[0]
+    return {'user': user, 'label': label}
+
+
+def benchmark_dataset(path:str, features:List[int], repeat:int, memory:bool,
+                      user:str=None, label:str=None) -> Dict[str, any]:
+    config.set_parameter('ENPM611_PROJECT_DATA_PATH', path)
+    result = {'path': path, 'size_bytes': os.path.getsize(path)}
+    result['load'] = measure(load_issues, repeat, memory)
+
+    # Keep the issues loaded for the compute phase
+    reset_loader()
+    with contextlib.redirect_stdout(io.StringIO()):
+        issues = DataLoader().get_issues()
+    result['issues'] = len(issues)
+    result['events'] = sum(len(issue.events) for issue in issues)
+    # By default, focus on the most active creator and the most frequent label
+    user = user or Counter(issue.creator for issue in issues).most_common(1)[0][0]
+    label = label or Counter(label for issue in issues for label in issue.labels).most_common(1)[0][0]
+    result['user'] = user
+    result['label'] = label
+
+    result['features'] = {}
+    for feature in features:
+        for name, value in feature_parameters(feature, user, label).items():
+            config.set_parameter(name, value)
+        analysis_class = registry.load(feature)
+        # Untimed run that builds the indexes the feature uses
+        with contextlib.redirect_stdout(io.StringIO()):
+            compute_analyses([analysis_class()])
+        result['features'][str(feature)] = measure(lambda: compute_analyses([analysis_class()]), repeat, memory)
+        print(f'{path}: feature {feature} took {result["features"][str(feature)]["median"]:.3f}s')
+    print(f'{path}: loading took {result["load"]["median"]:.3f}s')
+    return result
+
+
+def environment() -> Dict[str, any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'storage': config.get_parameter('ENPM611_PROJECT_STORAGE', 'objects'),
+        'cache': bool(config.get_parameter('ENPM611_PROJECT_CACHE', False)),
+        'workers': config.get_parameter('ENPM611_PROJECT_WORKERS', 1),
+    }
+
+
+def compare(results:Dict[str, any], baseline:Dict[str, any]):
+    """
+    Prints the best times next to those of a baseline run.
+    """
+    previous = {dataset['path']: dataset for dataset in baseline['datasets']}
+    for dataset in results['datasets']:
+        before = previous.get(dataset['path'])
+        if before is None:
+            continue
+        stages = [('load', dataset['load'], before['load'])]
+        stages += [(f'feature {feature}', measurement, before['features'][feature])
+                   for feature, measurement in dataset['features'].items() if feature in before['features']]
+        print(f'{dataset["path"]}:')
+        for stage, now, then in stages:
+            print(f'  {stage:<10} {then["min"]:8.3f}s -> {now["min"]:8.3f}s ({now["min"] / then["min"]:.2f}x)')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser('run_benchmarks.py')
+    ap.add_argument('data', type=str, nargs='+',
+                    help='Data files to benchmark (see benchmarks/generate_data.py)')
+    ap.add_argument('--feature', '-f', type=int, nargs='+', default=list(registry.FEATURES),
+                    help='Features to benchmark (default: all)')
+    ap.add_argument('--repeat', '-r', type=int, default=3,
+                    help='Number of timed runs per measurement')
+    ap.add_argument('--no-memory', action='store_true',
+                    help='Skip the runs that record the peak memory')
+    ap.add_argument('--user', '-u', type=str, required=False,
+                    help='User for the user-specific analyses (default: most active creator)')
+    ap.add_argument('--label', '-l', type=str, required=False,
+                    help='Label for the label-specific analyses (default: most frequent label)')
+    ap.add_argument('--output', '-o', type=str, default='benchmark_results.json',
+                    help='Path of the JSON file to write the results to')
+    ap.add_argument('--baseline', '-b', type=str, required=False,
+                    help='Results of an earlier run to compare with')
+    args = ap.parse_args()
+
+    # Every run has to compute its results
+    config.set_parameter('ENPM611_PROJECT_RESULT_CACHE', '')
+    results = {'environment': environment(), 'datasets': []}
+    for path in args.data:
+        results['datasets'].append(benchmark_dataset(path, args.feature, args.repeat,
+                                                     not args.no_memory, args.user, args.label))
+    with open(args.output, 'w') as fout:
+        json.dump(results, fout, indent=2)
+    print(f'Wrote results to {args.output}.')
+
+    if args.baseline:
+        with open(args.baseline, 'r') as fin:
+            compare(results, json.load(fin))
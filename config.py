@@ -3,6 +3,8 @@ logger = logging.getLogger(__name__)
 
 import json
 import os
+import threading
+from contextlib import contextmanager
 
 '''
 Handles the loading of the config file as well as the access of specific
@@ -11,6 +13,9 @@ config parameters.
 
 _config = None
 
+# Parameters overridden within the current thread, see parameters()
+_local = threading.local()
+
 
 def _init_config(path=None):
     global _config
@@ -52,9 +57,15 @@ def _get_default_path():
 def get_parameter(parameter_name, default=None):
     """
     Main function to access config parameters.
-    Preference is given to environment variables, and then to the config file.
+    Preference is given to parameters overridden in the current thread,
+    then to environment variables, and then to the config file.
     """
     _init_config()
+    overrides = getattr(_local, 'overrides', None)
+    if overrides and parameter_name in overrides:
+        value = overrides[parameter_name]
+        # An unset parameter falls back to the default
+        return default if value is None else value
     if parameter_name in os.environ:
         value = os.environ.get(parameter_name)
         if value.startswith("json:"):
@@ -102,6 +113,21 @@ def set_parameter(name, value):
         os.environ[name] = "json:{0}".format(json.dumps(value))
 
 
+@contextmanager
+def parameters(**values):
+    """
+    Overrides config parameters within the current thread only, so that
+    concurrent requests (e.g. of the analysis server) can use different
+    parameters. A value of None unsets a parameter.
+    """
+    previous = getattr(_local, 'overrides', {})
+    _local.overrides = {**previous, **values}
+    try:
+        yield
+    finally:
+        _local.overrides = previous
+
+
 def overwrite_from_args(args):
     """
     Writes command line paramters into the config so any parameter
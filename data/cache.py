@@ -0,0 +1,149 @@
+"""
+Persists the parsed issues data on disk so that later runs do not have
+to decode the JSON file again.
+
+The cache is a directory next to the data file that holds every column
+of the `ColumnarStore` as an `.npy` file plus a `meta.json` file with the
+string dictionaries and the fingerprint of the source file. Columns are
+memory-mapped when the cache is opened, so opening it costs little more
+than reading the dictionaries.
+
+The cache is invalid when the size of the data file differs, and valid
+when both size and modification time match. The content hash is only
+computed when the size matches but the modification time differs (e.g.
+after the file was copied or touched); the cache stays valid if the
+hash still matches.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, Optional
+
+import numpy as np
+
+from data.columnar import ColumnarStore, StringDictionary, StringHeap
+
+# Incremented whenever the layout of the cache changes
+CACHE_VERSION:int = 1
+
+_META_FILE = 'meta.json'
+
+# Parts of a text column stored as separate arrays
+_HEAP_PARTS = ('blob', 'offsets', 'nulls')
+
+
+def file_fingerprint(path:str, with_hash:bool=True) -> Dict[str, any]:
+    """
+    Describes the current content of a file by its size, modification
+    time and (optionally) sha256 hash.
+    """
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        fingerprint['sha256'] = file_hash(path)
+    return fingerprint
+
+
+def file_hash(path:str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fin:
+        for block in iter(lambda: fin.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DatasetCache:
+    """
+    Reads and writes the binary cache of a data file.
+    """
+
+    def __init__(self, data_path:str, cache_dir:str=None):
+        """
+        Constructor
+        """
+        self.data_path:str = data_path
+        self.cache_dir:str = cache_dir or f'{data_path}.cache'
+
+    def load(self) -> Optional[ColumnarStore]:
+        """
+        Opens the cache with memory-mapped columns. Returns None if there is
+        no cache or it does not match the data file anymore.
+        """
+        meta = self._read_meta()
+        if meta is None or not self._is_current(meta):
+            return None
+        dictionaries = {name: StringDictionary(meta['dictionaries'][name])
+                        for name in ColumnarStore.DICTIONARIES}
+        columns = {name: self._load_array(name) for name in ColumnarStore.ARRAY_COLUMNS}
+        for name in ColumnarStore.HEAP_COLUMNS:
+            columns[name] = StringHeap(*[self._load_array(f'{name}.{part}') for part in _HEAP_PARTS])
+        logger.info(f'Opened dataset cache {self.cache_dir}')
+        return ColumnarStore(**dictionaries, **columns)
+
+    def save(self, store:ColumnarStore):
+        """
+        Writes the store to the cache, replacing any previous content.
+        """
+        tmp_dir = f'{self.cache_dir}.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        for name in ColumnarStore.ARRAY_COLUMNS:
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), getattr(store, name))
+        for name in ColumnarStore.HEAP_COLUMNS:
+            heap = getattr(store, name)
+            for part in _HEAP_PARTS:
+                np.save(os.path.join(tmp_dir, f'{name}.{part}.npy'), getattr(heap, part))
+
+        meta = {
+            'version': CACHE_VERSION,
+            'source': file_fingerprint(self.data_path),
+            'dictionaries': {name: getattr(store, name).values
+                             for name in ColumnarStore.DICTIONARIES},
+        }
+        with open(os.path.join(tmp_dir, _META_FILE), 'w') as fout:
+            json.dump(meta, fout)
+
+        # Swap in the new cache only once it is complete
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.replace(tmp_dir, self.cache_dir)
+        logger.info(f'Wrote dataset cache {self.cache_dir}')
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _read_meta(self) -> Optional[Dict[str, any]]:
+        try:
+            with open(os.path.join(self.cache_dir, _META_FILE), 'r') as fin:
+                meta = json.load(fin)
+        except (OSError, ValueError):
+            return None
+        if meta.get('version') != CACHE_VERSION:
+            return None
+        return meta
+
+    def _is_current(self, meta:Dict[str, any]) -> bool:
+        cached = meta['source']
+        current = file_fingerprint(self.data_path, with_hash=False)
+        if current['size'] != cached['size']:
+            return False
+        if current['mtime_ns'] == cached['mtime_ns']:
+            return True
+        # Same size but touched: only the content hash can tell
+        if file_hash(self.data_path) != cached['sha256']:
+            return False
+        meta['source']['mtime_ns'] = current['mtime_ns']
+        try:
+            with open(os.path.join(self.cache_dir, _META_FILE), 'w') as fout:
+                json.dump(meta, fout)
+        except OSError:
+            pass
+        return True
+
+    def _load_array(self, name:str) -> np.ndarray:
+        return np.load(os.path.join(self.cache_dir, f'{name}.npy'), mmap_mode='r')
@@ -0,0 +1,483 @@
+"""
+Implements a columnar, array-backed representation of the issues data.
+
+Instead of one Python object per issue and per event, the data is held
+in a handful of numpy arrays: integer-coded issue and event tables,
+int64 epoch timestamps, dictionary-encoded author/label/event type
+columns and offset arrays that map every issue to its slice of events.
+Free text (titles, bodies, comments, urls) is stored as one utf-8 blob
+per column with an offsets array.
+
+The `IssueView` and `EventView` classes expose the same fields as
+`Issue` and `Event` so the existing analyses can work on the store
+without modification.
+"""
+
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from data.dates import DECODER, from_epoch
+from models.model import State
+
+# Timestamps are stored as microseconds since the epoch (UTC), see data.dates
+
+# Sentinel for a missing dictionary-encoded value
+NULL:int = -1
+
+
+class StringDictionary:
+    """
+    Maps low-cardinality strings (authors, labels, event types) to
+    dense integer codes.
+    """
+
+    def __init__(self, values:List[str]=None):
+        """
+        Constructor
+        """
+        self.values:List[str] = []
+        self._codes:Dict[str, int] = {}
+        for value in values or []:
+            self.encode(value)
+
+    def encode(self, value:Optional[str]) -> int:
+        if value is None:
+            return NULL
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+    def decode(self, code:int) -> Optional[str]:
+        if code == NULL:
+            return None
+        return self.values[code]
+
+    def code_of(self, value:str) -> int:
+        """
+        Returns the code of a value without adding it, or NULL if the
+        value is not part of the dictionary.
+        """
+        return self._codes.get(value, NULL)
+
+    def __len__(self):
+        return len(self.values)
+
+
+class StringHeap:
+    """
+    Stores a column of free-text values as a single utf-8 blob plus an
+    offsets array. Missing values are tracked in a separate mask.
+    """
+
+    def __init__(self, blob:np.ndarray, offsets:np.ndarray, nulls:np.ndarray):
+        """
+        Constructor
+        """
+        self.blob:np.ndarray = blob
+        self.offsets:np.ndarray = offsets
+        self.nulls:np.ndarray = nulls
+
+    @staticmethod
+    def from_values(values:Iterable[Optional[str]]) -> 'StringHeap':
+        chunks:List[bytes] = []
+        offsets = array('q', [0])
+        nulls = array('b')
+        end = 0
+        for value in values:
+            if value is None:
+                nulls.append(1)
+            else:
+                encoded = value.encode('utf-8')
+                chunks.append(encoded)
+                end += len(encoded)
+                nulls.append(0)
+            offsets.append(end)
+        return StringHeap(np.frombuffer(b''.join(chunks), dtype=np.uint8),
+                          np.array(offsets, dtype=np.int64),
+                          np.array(nulls, dtype=np.bool_))
+
+    @staticmethod
+    def concat(heaps:List['StringHeap']) -> 'StringHeap':
+        offsets = [np.zeros(1, dtype=np.int64)]
+        base = 0
+        for heap in heaps:
+            offsets.append(heap.offsets[1:] + base)
+            base += len(heap.blob)
+        return StringHeap(np.concatenate([heap.blob for heap in heaps] or [np.zeros(0, dtype=np.uint8)]),
+                          np.concatenate(offsets),
+                          np.concatenate([heap.nulls for heap in heaps] or [np.zeros(0, dtype=np.bool_)]))
+
+    def get(self, pos:int) -> Optional[str]:
+        if self.nulls[pos]:
+            return None
+        return self.blob[self.offsets[pos]:self.offsets[pos + 1]].tobytes().decode('utf-8')
+
+    def values(self) -> List[Optional[str]]:
+        """
+        Decodes the whole column.
+        """
+        data = self.blob.tobytes()
+        offsets = self.offsets.tolist()
+        return [None if null else data[offsets[pos]:offsets[pos + 1]].decode('utf-8')
+                for pos, null in enumerate(self.nulls.tolist())]
+
+    def __len__(self):
+        return len(self.nulls)
+
+
+class ColumnarBuilder:
+    """
+    Accumulates issues record by record and produces a `ColumnarStore`.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.states = StringDictionary([state.value for state in State])
+        self.users = StringDictionary()
+        self.labels = StringDictionary()
+        self.event_types = StringDictionary()
+
+        self.issue_number = array('q')
+        self.issue_state = array('b')
+        self.issue_creator = array('i')
+        # Timestamps are kept as strings and decoded in one batch on build()
+        self.issue_created:List[Optional[str]] = []
+        self.issue_updated:List[Optional[str]] = []
+        self.issue_label_offsets = array('q', [0])
+        self.issue_label_codes = array('i')
+        self.issue_assignee_offsets = array('q', [0])
+        self.issue_assignee_codes = array('i')
+        self.issue_event_offsets = array('q', [0])
+        self.issue_url:List[Optional[str]] = []
+        self.issue_title:List[Optional[str]] = []
+        self.issue_text:List[Optional[str]] = []
+        self.issue_timeline_url:List[Optional[str]] = []
+
+        self.event_issue = array('i')
+        self.event_type = array('i')
+        self.event_author = array('i')
+        self.event_date:List[Optional[str]] = []
+        self.event_label = array('i')
+        self.event_comment:List[Optional[str]] = []
+
+    def add_record(self, jobj:dict):
+        """
+        Adds one issue as it appears in the data file.
+        """
+        try:
+            number = int(jobj.get('number', '-1'))
+        except:
+            number = -1
+        self._add_issue(number, jobj.get('state'), jobj.get('creator'),
+                        jobj.get('created_date'), jobj.get('updated_date'),
+                        jobj.get('labels', []), jobj.get('assignees', []),
+                        jobj.get('url'), jobj.get('title'), jobj.get('text'),
+                        jobj.get('timeline_url'))
+        for jevent in jobj.get('events', []):
+            self._add_event(jevent.get('event_type'), jevent.get('author'),
+                            jevent.get('event_date'),
+                            jevent.get('label'), jevent.get('comment'))
+        self.issue_event_offsets.append(len(self.event_type))
+
+    def _add_issue(self, number, state, creator, created, updated, labels,
+                   assignees, url, title, text, timeline_url):
+        self.issue_number.append(number)
+        self.issue_state.append(self.states.encode(state))
+        self.issue_creator.append(self.users.encode(creator))
+        self.issue_created.append(created)
+        self.issue_updated.append(updated)
+        self.issue_label_codes.extend(self.labels.encode(label) for label in labels)
+        self.issue_label_offsets.append(len(self.issue_label_codes))
+        self.issue_assignee_codes.extend(self.users.encode(user) for user in assignees)
+        self.issue_assignee_offsets.append(len(self.issue_assignee_codes))
+        self.issue_url.append(url)
+        self.issue_title.append(title)
+        self.issue_text.append(text)
+        self.issue_timeline_url.append(timeline_url)
+
+    def _add_event(self, event_type, author, event_date, label, comment):
+        self.event_issue.append(len(self.issue_number) - 1)
+        self.event_type.append(self.event_types.encode(event_type))
+        self.event_author.append(self.users.encode(author))
+        self.event_date.append(event_date)
+        self.event_label.append(self.labels.encode(label))
+        self.event_comment.append(comment)
+
+    def build(self) -> 'ColumnarStore':
+        return ColumnarStore(
+            states=self.states,
+            users=self.users,
+            labels=self.labels,
+            event_types=self.event_types,
+            issue_number=np.array(self.issue_number, dtype=np.int64),
+            issue_state=np.array(self.issue_state, dtype=np.int8),
+            issue_creator=np.array(self.issue_creator, dtype=np.int32),
+            issue_created=DECODER.parse_epochs(self.issue_created),
+            issue_updated=DECODER.parse_epochs(self.issue_updated),
+            issue_label_offsets=np.array(self.issue_label_offsets, dtype=np.int64),
+            issue_label_codes=np.array(self.issue_label_codes, dtype=np.int32),
+            issue_assignee_offsets=np.array(self.issue_assignee_offsets, dtype=np.int64),
+            issue_assignee_codes=np.array(self.issue_assignee_codes, dtype=np.int32),
+            issue_event_offsets=np.array(self.issue_event_offsets, dtype=np.int64),
+            issue_url=StringHeap.from_values(self.issue_url),
+            issue_title=StringHeap.from_values(self.issue_title),
+            issue_text=StringHeap.from_values(self.issue_text),
+            issue_timeline_url=StringHeap.from_values(self.issue_timeline_url),
+            event_issue=np.array(self.event_issue, dtype=np.int32),
+            event_type=np.array(self.event_type, dtype=np.int32),
+            event_author=np.array(self.event_author, dtype=np.int32),
+            event_date=DECODER.parse_epochs(self.event_date),
+            event_label=np.array(self.event_label, dtype=np.int32),
+            event_comment=StringHeap.from_values(self.event_comment),
+        )
+
+
+class ColumnarStore:
+    """
+    Array-backed issues and events tables. Issue `i` owns the events in
+    the range `issue_event_offsets[i]:issue_event_offsets[i+1]`.
+    """
+
+    # Names of the dictionaries, numpy columns and text columns of the store
+    DICTIONARIES = ('states', 'users', 'labels', 'event_types')
+    ARRAY_COLUMNS = ('issue_number', 'issue_state', 'issue_creator', 'issue_created',
+                     'issue_updated', 'issue_label_offsets', 'issue_label_codes',
+                     'issue_assignee_offsets', 'issue_assignee_codes', 'issue_event_offsets',
+                     'event_issue', 'event_type', 'event_author', 'event_date', 'event_label')
+    HEAP_COLUMNS = ('issue_url', 'issue_title', 'issue_text', 'issue_timeline_url',
+                    'event_comment')
+
+    def __init__(self, states:StringDictionary, users:StringDictionary,
+                 labels:StringDictionary, event_types:StringDictionary,
+                 **columns:any):
+        """
+        Constructor
+        """
+        self.states:StringDictionary = states
+        self.users:StringDictionary = users
+        self.labels:StringDictionary = labels
+        self.event_types:StringDictionary = event_types
+
+        # Issues table
+        self.issue_number:np.ndarray = columns['issue_number']
+        self.issue_state:np.ndarray = columns['issue_state']
+        self.issue_creator:np.ndarray = columns['issue_creator']
+        self.issue_created:np.ndarray = columns['issue_created']
+        self.issue_updated:np.ndarray = columns['issue_updated']
+        self.issue_label_offsets:np.ndarray = columns['issue_label_offsets']
+        self.issue_label_codes:np.ndarray = columns['issue_label_codes']
+        self.issue_assignee_offsets:np.ndarray = columns['issue_assignee_offsets']
+        self.issue_assignee_codes:np.ndarray = columns['issue_assignee_codes']
+        self.issue_event_offsets:np.ndarray = columns['issue_event_offsets']
+        self.issue_url:StringHeap = columns['issue_url']
+        self.issue_title:StringHeap = columns['issue_title']
+        self.issue_text:StringHeap = columns['issue_text']
+        self.issue_timeline_url:StringHeap = columns['issue_timeline_url']
+
+        # Events table
+        self.event_issue:np.ndarray = columns['event_issue']
+        self.event_type:np.ndarray = columns['event_type']
+        self.event_author:np.ndarray = columns['event_author']
+        self.event_date:np.ndarray = columns['event_date']
+        self.event_label:np.ndarray = columns['event_label']
+        self.event_comment:StringHeap = columns['event_comment']
+
+    @staticmethod
+    def from_records(records:Iterable[dict]) -> 'ColumnarStore':
+        """
+        Builds the store from the issue records of the data file.
+        """
+        builder = ColumnarBuilder()
+        for jobj in records:
+            builder.add_record(jobj)
+        return builder.build()
+
+    @staticmethod
+    def concat(stores:List['ColumnarStore']) -> 'ColumnarStore':
+        """
+        Combines several stores into one, preserving the order of the issues.
+        The dictionaries are merged and all codes are remapped accordingly.
+        """
+        dictionaries = {name: StringDictionary() for name in ColumnarStore.DICTIONARIES}
+        dictionaries['states'] = StringDictionary([state.value for state in State])
+        parts:Dict[str, List[np.ndarray]] = {name: [] for name in ColumnarStore.ARRAY_COLUMNS}
+        # Offset columns start with a leading 0 that is only kept once
+        for name in ('issue_label_offsets', 'issue_assignee_offsets', 'issue_event_offsets'):
+            parts[name].append(np.zeros(1, dtype=np.int64))
+
+        issue_base = event_base = label_base = assignee_base = 0
+        for store in stores:
+            # Map each code of this store to its code in the merged dictionary;
+            # the trailing NULL keeps NULL codes (index -1) unchanged
+            mapping = {name: np.array([dictionaries[name].encode(value)
+                                       for value in getattr(store, name).values] + [NULL], dtype=np.int32)
+                       for name in ColumnarStore.DICTIONARIES}
+            parts['issue_number'].append(store.issue_number)
+            parts['issue_state'].append(mapping['states'][store.issue_state].astype(np.int8))
+            parts['issue_creator'].append(mapping['users'][store.issue_creator])
+            parts['issue_created'].append(store.issue_created)
+            parts['issue_updated'].append(store.issue_updated)
+            parts['issue_label_offsets'].append(store.issue_label_offsets[1:] + label_base)
+            parts['issue_label_codes'].append(mapping['labels'][store.issue_label_codes])
+            parts['issue_assignee_offsets'].append(store.issue_assignee_offsets[1:] + assignee_base)
+            parts['issue_assignee_codes'].append(mapping['users'][store.issue_assignee_codes])
+            parts['issue_event_offsets'].append(store.issue_event_offsets[1:] + event_base)
+            parts['event_issue'].append(store.event_issue + issue_base)
+            parts['event_type'].append(mapping['event_types'][store.event_type])
+            parts['event_author'].append(mapping['users'][store.event_author])
+            parts['event_date'].append(store.event_date)
+            parts['event_label'].append(mapping['labels'][store.event_label])
+            issue_base += store.num_issues
+            event_base += store.num_events
+            label_base += len(store.issue_label_codes)
+            assignee_base += len(store.issue_assignee_codes)
+
+        empty = ColumnarBuilder().build()
+        columns = {name: np.concatenate(parts[name]) if parts[name] else getattr(empty, name)
+                   for name in ColumnarStore.ARRAY_COLUMNS}
+        for name in ColumnarStore.HEAP_COLUMNS:
+            columns[name] = StringHeap.concat([getattr(store, name) for store in stores])
+        return ColumnarStore(**dictionaries, **columns)
+
+    @property
+    def num_issues(self) -> int:
+        return len(self.issue_number)
+
+    @property
+    def num_events(self) -> int:
+        return len(self.event_type)
+
+    def event_range(self, pos:int) -> range:
+        """
+        Returns the positions in the events table that belong to an issue.
+        """
+        return range(int(self.issue_event_offsets[pos]), int(self.issue_event_offsets[pos + 1]))
+
+    def issue(self, pos:int) -> 'IssueView':
+        return IssueView(self, pos)
+
+    def issues(self) -> List['IssueView']:
+        return [IssueView(self, pos) for pos in range(self.num_issues)]
+
+    def __len__(self):
+        return self.num_issues
+
+    def __iter__(self) -> Iterator['IssueView']:
+        for pos in range(self.num_issues):
+            yield IssueView(self, pos)
+
+
+class EventView:
+    """
+    Exposes one row of the events table with the fields of `Event`.
+    """
+
+    __slots__ = ('_store', '_pos')
+
+    def __init__(self, store:ColumnarStore, pos:int):
+        """
+        Constructor
+        """
+        self._store:ColumnarStore = store
+        self._pos:int = pos
+
+    @property
+    def event_type(self) -> str:
+        return self._store.event_types.decode(self._store.event_type[self._pos])
+
+    @property
+    def author(self) -> str:
+        return self._store.users.decode(self._store.event_author[self._pos])
+
+    @property
+    def event_date(self) -> datetime:
+        return from_epoch(self._store.event_date[self._pos])
+
+    @property
+    def label(self) -> str:
+        return self._store.labels.decode(self._store.event_label[self._pos])
+
+    @property
+    def comment(self) -> str:
+        return self._store.event_comment.get(self._pos)
+
+
+class IssueView:
+    """
+    Exposes one row of the issues table with the fields of `Issue`.
+    """
+
+    __slots__ = ('_store', '_pos', '_events')
+
+    def __init__(self, store:ColumnarStore, pos:int):
+        """
+        Constructor
+        """
+        self._store:ColumnarStore = store
+        self._pos:int = pos
+        # Views of the events, created on first access
+        self._events:List[EventView] = None
+
+    @property
+    def url(self) -> str:
+        return self._store.issue_url.get(self._pos)
+
+    @property
+    def creator(self) -> str:
+        return self._store.users.decode(self._store.issue_creator[self._pos])
+
+    @property
+    def labels(self) -> Tuple[str, ...]:
+        store = self._store
+        start, end = store.issue_label_offsets[self._pos], store.issue_label_offsets[self._pos + 1]
+        return tuple(store.labels.values[code] for code in store.issue_label_codes[start:end])
+
+    @property
+    def state(self) -> State:
+        state = self._store.states.decode(self._store.issue_state[self._pos])
+        return State(state) if state is not None else None
+
+    @property
+    def assignees(self) -> Tuple[str, ...]:
+        store = self._store
+        start, end = store.issue_assignee_offsets[self._pos], store.issue_assignee_offsets[self._pos + 1]
+        return tuple(store.users.values[code] for code in store.issue_assignee_codes[start:end])
+
+    @property
+    def title(self) -> str:
+        return self._store.issue_title.get(self._pos)
+
+    @property
+    def text(self) -> str:
+        return self._store.issue_text.get(self._pos)
+
+    @property
+    def number(self) -> int:
+        return int(self._store.issue_number[self._pos])
+
+    @property
+    def created_date(self) -> datetime:
+        return from_epoch(self._store.issue_created[self._pos])
+
+    @property
+    def updated_date(self) -> datetime:
+        return from_epoch(self._store.issue_updated[self._pos])
+
+    @property
+    def timeline_url(self) -> str:
+        return self._store.issue_timeline_url.get(self._pos)
+
+    @property
+    def events(self) -> List[EventView]:
+        # Kept, so that indexing into the events does not create the views anew
+        if self._events is None:
+            self._events = [EventView(self._store, pos) for pos in self._store.event_range(self._pos)]
+        return self._events
@@ -1,24 +1,63 @@
+import logging
+logger = logging.getLogger(__name__)
 
 import json
-from typing import List
+from typing import Dict, Iterator, List
 
 import config as config
+import profiling
+from data.cache import DatasetCache
+from data.columnar import ColumnarStore
+from data import parallel, repositories
+from data.dates import DECODER
+from data.index import IssueIndex, StoreIndex
+from data.lifecycle import Lifecycle
+from data.query import EventFilter, EventQuery, IssueFilter, IssueQuery
+from data.rollups import Rollups
+from data.stream import iter_batches, iter_records
 from models.model import Issue
 
 # Store issues as singleton to avoid reloads
 _ISSUES:List[Issue] = None
 
+# Store the columnar representation as singleton as well
+_STORE:ColumnarStore = None
+
+# Indexes over the loaded issues, built on first use
+_INDEX:IssueIndex = None
+
+# Normalized pandas frames over the columnar store, built on first use
+_FRAMES:'Frames' = None
+
+# Lifecycle table of the issues, built on first use
+_LIFECYCLE:Lifecycle = None
+
+# Time-bucketed rollups of the issues, built on first use
+_ROLLUPS:Rollups = None
+
+# Positions of the loaded issues of every repository, by repository id
+_PARTITIONS:Dict[str, range] = None
+
 class DataLoader:
     """
     Loads the issue data into a runtime object.
     """
-    
+
     def __init__(self):
         """
         Constructor
         """
-        self.data_path:str = config.get_parameter('ENPM611_PROJECT_DATA_PATH')
-        
+        # The data files, one per repository (see data/repositories.py)
+        self.data_paths:List[str] = repositories.configured_data_paths()
+        # The data file, or the first of several
+        self.data_path:str = self.data_paths[0] if self.data_paths else None
+        # Either 'objects' (one Issue per issue) or 'columnar' (array-backed store)
+        self.storage:str = config.get_parameter('ENPM611_PROJECT_STORAGE', 'objects')
+        # Whether to keep a pre-parsed binary copy of the data file on disk
+        self.use_cache:bool = bool(config.get_parameter('ENPM611_PROJECT_CACHE', False))
+        # Number of processes used to decode the data file ('auto' for one per CPU)
+        self.workers:int = parallel.resolve_workers(config.get_parameter('ENPM611_PROJECT_WORKERS', 1))
+
     def get_issues(self):
         """
         This should be invoked by other parts of the application to get access
@@ -26,18 +65,277 @@ class DataLoader:
         """
         global _ISSUES # to access it within the function
         if _ISSUES is None:
-            _ISSUES = self._load()
-            print(f'Loaded {len(_ISSUES)} issues from {self.data_path}.')
+            # The cache holds the columnar representation, which may already be loaded
+            if self.storage == 'columnar' or self.use_cache or _STORE is not None:
+                _ISSUES = self.get_store().issues()
+            else:
+                with profiling.stage('load'):
+                    _ISSUES = self._load()
+                print(f'Loaded {len(_ISSUES)} issues from {self.source}.')
         return _ISSUES
-    
+
+    def get_partitions(self) -> Dict[str, List[Issue]]:
+        """
+        Returns the loaded issues by repository id, in the order of the
+        data files.
+        """
+        issues = self.get_issues()
+        return {repository: issues[positions.start:positions.stop]
+                for repository, positions in _PARTITIONS.items()}
+
+    @property
+    def source(self) -> str:
+        """
+        Describes the data files in messages.
+        """
+        if len(self.data_paths) == 1:
+            return self.data_path
+        return f'{len(self.data_paths)} repositories'
+
+    def get_index(self) -> IssueIndex:
+        """
+        Returns the inverted indexes (author, creator, label, event type)
+        over the loaded issues. The individual indexes are built lazily,
+        from the arrays of the columnar store if that is loaded.
+        """
+        global _INDEX
+        if _INDEX is None:
+            if _STORE is not None or self.storage == 'columnar' or self.use_cache:
+                _INDEX = StoreIndex(self.get_store())
+            else:
+                _INDEX = IssueIndex(self.get_issues())
+        return _INDEX
+
+    def query_issues(self, state:str=None, label:str=None, creator:str=None,
+                     created_since:any=None, created_until:any=None) -> IssueQuery:
+        """
+        Returns a lazily evaluated query for the issues that match all given
+        filters. The creation date range includes created_since and excludes
+        created_until (datetimes or date strings). See data/query.py.
+        """
+        return IssueQuery(self, IssueFilter(state, label, creator, created_since, created_until))
+
+    def query_events(self, event_type:str=None, author:str=None, since:any=None, until:any=None,
+                     state:str=None, label:str=None, creator:str=None,
+                     created_since:any=None, created_until:any=None) -> EventQuery:
+        """
+        Returns a lazily evaluated query for the (issue, event) pairs whose
+        event matches the event filters (event_type, author, since, until)
+        and whose issue matches the issue filters of query_issues.
+        """
+        return EventQuery(self, IssueFilter(state, label, creator, created_since, created_until),
+                          EventFilter(event_type, author, since, until))
+
+    def is_loaded(self) -> bool:
+        """
+        Whether the issues are already held in memory, as objects or in
+        the columnar store.
+        """
+        return _ISSUES is not None or _STORE is not None
+
+    def get_store(self) -> ColumnarStore:
+        """
+        Returns the columnar representation of the issues in the data file.
+        Analyses that work on whole columns can use it directly instead of
+        iterating over Issue objects.
+        """
+        global _STORE
+        if _STORE is None:
+            with profiling.stage('load_store'):
+                if len(self.data_paths) > 1:
+                    stores = self._load_partition_stores()
+                    _set_partitions(self.data_paths, [store.num_issues for store in stores])
+                    with profiling.stage('concat'):
+                        _STORE = ColumnarStore.concat(stores)
+                else:
+                    _STORE = self._load_cached_store(self.data_path)
+                    _set_partitions(self.data_paths, [_STORE.num_issues])
+            print(f'Loaded {_STORE.num_issues} issues from {self.source}.')
+        return _STORE
+
+    def get_frames(self) -> 'Frames':
+        """
+        Returns the normalized pandas frames of the issues data: 'issues',
+        'events', 'issue_labels' and 'issue_assignees' (see data/frames.py).
+        They are built from the columnar store on first access.
+        """
+        global _FRAMES
+        if _FRAMES is None:
+            # pandas is only imported when frames are used
+            from data.frames import Frames
+            _FRAMES = Frames(self.get_store(), self.get_lifecycle, self.get_rollups)
+        return _FRAMES
+
+    def get_lifecycle(self) -> Lifecycle:
+        """
+        Returns the lifecycle table of the issues (first and last assigned
+        and closed dates, reopen counts, first comment by someone other
+        than the creator, event counts by type), see data/lifecycle.py.
+        It is derived from the columnar store on first use.
+        """
+        global _LIFECYCLE
+        if _LIFECYCLE is None:
+            with profiling.stage('lifecycle'):
+                _LIFECYCLE = Lifecycle.from_store(self.get_store())
+        return _LIFECYCLE
+
+    def get_rollups(self) -> Rollups:
+        """
+        Returns the counts per label, state or event type and day, week or
+        month, kept as prefix sums over the time buckets (see
+        data/rollups.py). They are derived from the columnar store.
+        """
+        global _ROLLUPS
+        if _ROLLUPS is None:
+            _ROLLUPS = Rollups(self.get_store())
+        return _ROLLUPS
+
+    def prefers_frames(self) -> bool:
+        """
+        Whether analyses should work on the frames instead of iterating
+        over the issues, i.e. whether the data is held in columnar form.
+        """
+        return self.storage == 'columnar' or self.use_cache or _STORE is not None
+
+    def iter_issues(self) -> Iterator[Issue]:
+        """
+        Yields the issues one at a time. If the issues have already been
+        loaded, they are reused. Otherwise the data file is decoded
+        incrementally so that only one issue is held in memory at a time.
+        """
+        if _ISSUES is not None:
+            yield from _ISSUES
+            return
+        if self.use_cache or self.storage == 'columnar' or _STORE is not None:
+            # The columnar store is compact, and the memory-mapped cache is
+            # paged in by the OS as needed
+            yield from self.get_store()
+            return
+        count = 0
+        # Decoding is interleaved with the consumer, so its time is accumulated
+        for jobj in profiling.timed(self._iter_records(), 'decode_json'):
+            count += 1
+            with profiling.accumulate('decode_models'):
+                issue = Issue(jobj)
+            yield issue
+        print(f'Streamed {count} issues from {self.source}.')
+
+    def iter_record_batches(self, batch_size:int) -> Iterator[List[dict]]:
+        """
+        Decodes the data files incrementally and yields their records in
+        lists of at most batch_size issues each.
+        """
+        yield from iter_batches(self._iter_records(), batch_size)
+
+    def _iter_records(self) -> Iterator[dict]:
+        for path in self.data_paths:
+            with open(path,'r') as fin:
+                yield from iter_records(fin)
+
+    def iter_stores(self, batch_size:int=10000) -> Iterator[ColumnarStore]:
+        """
+        Decodes the data file incrementally and yields it as a sequence of
+        columnar stores of at most batch_size issues each.
+        """
+        for batch in self.iter_record_batches(batch_size):
+            yield ColumnarStore.from_records(batch)
+
     def _load(self):
         """
         Loads the issues into memory.
         """
-        with open(self.data_path,'r') as fin:
-            return [Issue(i) for i in json.load(fin)]
-    
+        if len(self.data_paths) > 1:
+            # The repositories are decoded concurrently, one data file per worker
+            if self.workers > 1:
+                with profiling.stage('decode_partitions'):
+                    partitions = parallel.load_files_issues(self.data_paths, self.workers)
+            else:
+                partitions = [self._load_path(path) for path in self.data_paths]
+            _set_partitions(self.data_paths, [len(partition) for partition in partitions])
+            issues = [issue for partition in partitions for issue in partition]
+        else:
+            issues = self._load_path(self.data_path)
+            _set_partitions(self.data_paths, [len(issues)])
+        DECODER.log_summary()
+        return issues
+
+    def _load_path(self, path:str) -> List[Issue]:
+        if self.workers > 1:
+            with profiling.stage('decode_parallel'):
+                return parallel.load_issues(path, self.workers)
+        with open(path,'r') as fin:
+            with profiling.stage('decode_json'):
+                records = json.load(fin)
+        with profiling.stage('decode_models'):
+            return [Issue(i) for i in records]
+
+    def _load_partition_stores(self) -> List[ColumnarStore]:
+        """
+        Loads the columnar store of every repository.
+        """
+        if self.workers > 1 and not self.use_cache:
+            with profiling.stage('decode_partitions'):
+                stores = parallel.load_files_stores(self.data_paths, self.workers)
+            DECODER.log_summary()
+            return stores
+        return [self._load_cached_store(path) for path in self.data_paths]
+
+    def _load_cached_store(self, path:str) -> ColumnarStore:
+        """
+        Loads the columnar store of a data file, from its cache if enabled.
+        """
+        if not self.use_cache:
+            return self._load_store(path)
+        cache = DatasetCache(path)
+        with profiling.stage('read_cache'):
+            store = cache.load()
+        if store is None:
+            store = self._load_store(path)
+            with profiling.stage('write_cache'):
+                cache.save(store)
+        return store
+
+    def _load_store(self, path:str) -> ColumnarStore:
+        """
+        Loads the issues of a data file into the columnar store.
+        """
+        if self.workers > 1:
+            with profiling.stage('decode_parallel'):
+                store = parallel.load_store(path, self.workers)
+        else:
+            with open(path,'r') as fin:
+                with profiling.stage('decode_json'):
+                    records = json.load(fin)
+            with profiling.stage('build_columns'):
+                store = ColumnarStore.from_records(records)
+        DECODER.log_summary()
+        return store
+
+
+def reset():
+    """
+    Drops the loaded data and everything derived from it, so that the next
+    access loads the data files again (e.g. after they changed).
+    """
+    global _ISSUES, _STORE, _INDEX, _FRAMES, _LIFECYCLE, _ROLLUPS, _PARTITIONS
+    _ISSUES = None
+    _STORE = None
+    _INDEX = None
+    _FRAMES = None
+    _LIFECYCLE = None
+    _ROLLUPS = None
+    _PARTITIONS = None
+
+
+def _set_partitions(paths:List[str], sizes:List[int]):
+    global _PARTITIONS
+    _PARTITIONS = {}
+    start = 0
+    for path, size in zip(paths, sizes):
+        _PARTITIONS[repositories.repository_id(path)] = range(start, start + size)
+        start += size
+
 
 if __name__ == '__main__':
     # Run the loader for testing
-    DataLoader().get_issues()
\ No newline at end of file
+    DataLoader().get_issues()
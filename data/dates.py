@@ -0,0 +1,184 @@
+"""
+Decodes the timestamps contained in the issues data file.
+
+The data file uses ISO-8601 timestamps (e.g. `2024-01-31T17:02:11+00:00`).
+Values in that layout are decoded through a strict fast path: single
+values with `datetime.fromisoformat` and whole columns at once through
+numpy `datetime64`. Only values in any other layout fall back to
+`dateutil`, and the decoder keeps count of how many did.
+"""
+
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from dateutil import parser, tz
+
+import profiling
+
+logger = logging.getLogger(__name__)
+
+# Sentinel for a missing timestamp in epoch arrays
+NAT:int = np.iinfo(np.int64).min
+
+# ISO-8601 date and time with optional fraction and UTC offset
+_ISO_PATTERN = re.compile(
+    r'^(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2}(?:\.\d{1,6})?)(Z|[+-]\d{2}:?\d{2})?$')
+
+# Epoch arrays count microseconds since 1970-01-01 UTC
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+_MICROSECONDS_PER_MINUTE = 60 * 1000000
+
+
+def to_epoch(value:Optional[datetime]) -> int:
+    """
+    Converts a datetime into microseconds since the epoch. Naive
+    datetimes are interpreted as UTC.
+    """
+    if value is None:
+        return NAT
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def from_epoch(value:int) -> Optional[datetime]:
+    """
+    Converts microseconds since the epoch back into a UTC datetime.
+    """
+    if value == NAT:
+        return None
+    return _EPOCH + timedelta(microseconds=int(value))
+
+
+class DateDecoder:
+    """
+    Parses timestamps with a strict ISO-8601 fast path and a dateutil
+    fallback for everything else.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        # Number of values decoded through the fast path
+        self.fast_count:int = 0
+        # Number of values that had to be decoded by dateutil
+        self.fallback_count:int = 0
+        # Number of values that could not be decoded at all
+        self.failed_count:int = 0
+        # UTC offsets in minutes, by their textual representation
+        self._offsets:Dict[str, int] = {None: 0, 'Z': 0}
+        # Fixed-offset time zones by UTC offset. Both paths attach these so
+        # that all values carry the same tzinfo objects (dateutil on its own
+        # returns tzlocal() when the offset happens to match the host)
+        self._zones:Dict[timedelta, tz.tzoffset] = {timedelta(0): tz.UTC}
+
+    def parse(self, value:Optional[str]) -> Optional[datetime]:
+        """
+        Parses a single timestamp. Returns None if the value is
+        missing or cannot be parsed.
+        """
+        if value is None:
+            return None
+        if isinstance(value, str) and _ISO_PATTERN.match(value):
+            try:
+                parsed = datetime.fromisoformat(value)
+                self.fast_count += 1
+                return self._normalize_zone(parsed)
+            except ValueError:
+                pass
+        return self._fallback(value)
+
+    def parse_epochs(self, values:Iterable[Optional[str]]) -> np.ndarray:
+        """
+        Parses a batch of timestamps into microseconds since the epoch.
+        Missing or invalid values become NAT, naive values are taken
+        to be UTC.
+        """
+        with profiling.accumulate('parse_dates'):
+            return self._parse_epochs(values)
+
+    def _parse_epochs(self, values:Iterable[Optional[str]]) -> np.ndarray:
+        local_times = []
+        offsets = []
+        fallback = {}
+        for pos, value in enumerate(values):
+            match = _ISO_PATTERN.match(value) if isinstance(value, str) else None
+            if match is None:
+                local_times.append('NaT')
+                offsets.append(0)
+                if value is not None:
+                    fallback[pos] = value
+                continue
+            local_times.append(f'{match.group(1)}T{match.group(2)}')
+            offsets.append(self._offset_minutes(match.group(3)))
+
+        try:
+            epochs = np.array(local_times, dtype='datetime64[us]').astype(np.int64)
+        except ValueError:
+            # A value matched the layout but is not a valid date (e.g. month 13)
+            return self._parse_epochs_slowly(values)
+        valid = epochs != NAT
+        epochs[valid] -= np.array(offsets, dtype=np.int64)[valid] * _MICROSECONDS_PER_MINUTE
+        self.fast_count += int(np.count_nonzero(valid))
+
+        for pos, value in fallback.items():
+            epochs[pos] = to_epoch(self._fallback(value))
+        return epochs
+
+    def reset(self):
+        self.fast_count = 0
+        self.fallback_count = 0
+        self.failed_count = 0
+
+    def log_summary(self):
+        logger.info(f'Decoded {self.fast_count} timestamps through the fast path, '
+                    f'{self.fallback_count} through the dateutil fallback '
+                    f'and failed to decode {self.failed_count}.')
+
+    def _parse_epochs_slowly(self, values:Iterable[Optional[str]]) -> np.ndarray:
+        return np.array([to_epoch(self.parse(value)) for value in values], dtype=np.int64)
+
+    def _fallback(self, value:any) -> Optional[datetime]:
+        try:
+            parsed = parser.parse(value)
+            self.fallback_count += 1
+            return self._normalize_zone(parsed)
+        except:
+            self.failed_count += 1
+            return None
+
+    def _normalize_zone(self, value:datetime) -> datetime:
+        if value.tzinfo is None:
+            return value
+        offset = value.utcoffset()
+        zone = self._zones.get(offset)
+        if zone is None:
+            zone = tz.tzoffset(None, offset)
+            self._zones[offset] = zone
+        return value.replace(tzinfo=zone)
+
+    def _offset_minutes(self, offset:Optional[str]) -> int:
+        minutes = self._offsets.get(offset)
+        if minutes is None:
+            digits = offset[1:].replace(':', '')
+            minutes = int(digits[:2]) * 60 + int(digits[2:])
+            if offset[0] == '-':
+                minutes = -minutes
+            self._offsets[offset] = minutes
+        return minutes
+
+
+# Shared decoder used while loading the data file
+DECODER = DateDecoder()
+
+
+def parse_date(value:Optional[str]) -> Optional[datetime]:
+    """
+    Parses a single timestamp with the shared decoder.
+    """
+    return DECODER.parse(value)
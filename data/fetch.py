@@ -0,0 +1,388 @@
+"""
+Fetches the issues of a GitHub repository into a data file.
+
+The issues are listed through the issues API of the repository (pull
+requests are skipped), and the events of every issue are derived from its
+timeline. The result is written in the schema the DataLoader reads.
+
+Requests are made concurrently from a pool of threads, each of which
+keeps its own persistent connection to the API server. Paginated lists
+are followed through their Link headers; once the first page of the
+issue list tells the number of the last page, the other pages are
+requested concurrently. The rate limit headers are honored: when no
+requests remain, all threads wait until the limit resets, and responses
+that ask to retry later are retried after the given time.
+
+Responses are cached on disk along with their ETag and Last-Modified
+headers. Later runs send conditional requests (If-None-Match,
+If-Modified-Since), so unchanged pages and timelines are answered with
+304 Not Modified and not downloaded again. GitHub does not count these
+answers against the rate limit.
+
+    python -m data.fetch python-poetry/poetry --output poetry.json
+    python -m data.fetch python-poetry/poetry --since 2024-01-01T00:00:00Z --output delta.json
+
+A delta file fetched with --since can be ingested with
+`python -m analysis.incremental apply`. The API server can be changed
+with --api-url, e.g. to a local stand-in server for testing. A token in
+ENPM611_PROJECT_GITHUB_TOKEN is sent for authentication.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import config as config
+
+DEFAULT_API_URL:str = 'https://api.github.com'
+
+# Items per page of the paginated lists (the maximum of the API)
+_PER_PAGE:int = 100
+
+# Attempts per request for server errors, dropped connections and rate limits
+_MAX_ATTEMPTS:int = 5
+
+# Seconds to wait after a rate limit rejection that tells neither when to
+# retry nor when the limit resets (GitHub asks to wait at least a minute)
+_RATE_LIMIT_DELAY:float = 60.0
+
+_LINK = re.compile(r'<([^>]+)>;\s*rel="(\w+)"')
+
+
+class FetchError(Exception):
+    """
+    A request to the API failed.
+    """
+    pass
+
+
+class HttpCache:
+    """
+    On-disk cache of response bodies along with their validators.
+    """
+
+    def __init__(self, cache_dir:str):
+        """
+        Constructor
+        """
+        self.cache_dir:str = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, url:str) -> Optional[dict]:
+        try:
+            with open(self._path(url), 'r') as fin:
+                return json.load(fin)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, url:str, entry:dict):
+        path = self._path(url)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as fout:
+            json.dump(entry, fout)
+        os.replace(tmp_path, path)
+
+    def _path(self, url:str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + '.json')
+
+
+class RateLimiter:
+    """
+    Pauses the requests of all threads while the rate limit is exhausted.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self._lock = threading.Lock()
+        # Time (epoch seconds) before which no request should be made
+        self._resume_at:float = 0.0
+
+    def wait(self):
+        with self._lock:
+            delay = self._resume_at - time.time()
+        if delay > 0:
+            logger.warning(f'Rate limit reached, waiting {delay:.0f}s')
+            time.sleep(delay)
+
+    def update(self, status:int, headers:http.client.HTTPMessage) -> bool:
+        """
+        Takes note of the rate limit headers of a response. Returns True
+        if the request was rejected because of the rate limit and should
+        be retried.
+        """
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        retry_after = headers.get('Retry-After')
+        rejected = status in (403, 429) and (retry_after is not None or remaining == '0')
+        if rejected and retry_after is not None:
+            resume_at = time.time() + float(retry_after)
+        elif remaining == '0' and reset is not None:
+            resume_at = float(reset)
+        elif rejected:
+            resume_at = time.time() + _RATE_LIMIT_DELAY
+        else:
+            return rejected
+        with self._lock:
+            self._resume_at = max(self._resume_at, resume_at)
+        return rejected
+
+
+class GitHubClient:
+    """
+    Thread-safe client of the GitHub REST API with one persistent
+    connection per thread.
+    """
+
+    def __init__(self, api_url:str=DEFAULT_API_URL, token:str=None, cache:HttpCache=None):
+        """
+        Constructor
+        """
+        self.api_url:str = api_url.rstrip('/')
+        self.token:str = token
+        self.cache:HttpCache = cache
+        self.rate_limiter:RateLimiter = RateLimiter()
+        parts = urlsplit(self.api_url)
+        self._scheme:str = parts.scheme
+        self._host:str = parts.netloc
+        self._local = threading.local()
+        self._connections:List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        # Number of requests made and of those answered with 304 Not Modified
+        self.requests:int = 0
+        self.not_modified:int = 0
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+
+    def get(self, url:str) -> Tuple[any, Dict[str, str]]:
+        """
+        The decoded JSON body of a GET request and the links of its Link
+        header by relation ('next', 'last').
+        """
+        cached = self.cache.get(url) if self.cache is not None else None
+        headers = {'Accept': 'application/vnd.github+json', 'User-Agent': 'enpm611-project-fetch'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        if cached is not None:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        parts = urlsplit(url)
+        target = urlunsplit(('', '', parts.path, parts.query, ''))
+        for attempt in range(_MAX_ATTEMPTS):
+            self.rate_limiter.wait()
+            connection = self._connection()
+            try:
+                connection.request('GET', target, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError) as error:
+                # The server may have closed the persistent connection
+                connection.close()
+                logger.warning(f'GET {url} failed ({error}), retrying')
+                if attempt:
+                    # A dropped keep-alive connection is retried at once, repeated failures back off
+                    time.sleep(2 ** (attempt - 1))
+                continue
+            with self._lock:
+                self.requests += 1
+            if self.rate_limiter.update(response.status, response.headers):
+                continue
+            if response.status == 304 and cached is not None:
+                with self._lock:
+                    self.not_modified += 1
+                return json.loads(cached['body']), cached['links']
+            if response.status >= 500:
+                time.sleep(2 ** attempt)
+                continue
+            if response.status != 200:
+                raise FetchError(f'GET {url} failed with status {response.status}: {body[:200]!r}')
+
+            text = body.decode('utf-8')
+            links = {rel: link for link, rel in _LINK.findall(response.headers.get('Link', ''))}
+            etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+            if self.cache is not None and (etag or last_modified):
+                self.cache.put(url, {'etag': etag, 'last_modified': last_modified, 'links': links, 'body': text})
+            return json.loads(text), links
+        raise FetchError(f'GET {url} failed after {_MAX_ATTEMPTS} attempts')
+
+    def get_pages(self, url:str, executor:ThreadPoolExecutor=None) -> List[any]:
+        """
+        The items of all pages of a paginated list. With an executor, the
+        pages after the first are requested concurrently if the first page
+        links to the last one.
+        """
+        items, links = self.get(url)
+        items = list(items)
+        if executor is not None and 'last' in links:
+            for page in executor.map(lambda page_url: self.get(page_url)[0], _page_urls(links['last'])):
+                items.extend(page)
+            return items
+        while 'next' in links:
+            page, links = self.get(links['next'])
+            items.extend(page)
+        return items
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            if self._scheme == 'https':
+                connection = http.client.HTTPSConnection(self._host, timeout=60)
+            else:
+                connection = http.client.HTTPConnection(self._host, timeout=60)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+
+def fetch_issues(client:GitHubClient, repository:str, workers:int, since:str=None) -> Iterator[dict]:
+    """
+    Yields the issues of a repository ('owner/name') in the order of their
+    creation, as records of the data file.
+    """
+    params = {'state': 'all', 'sort': 'created', 'direction': 'asc', 'per_page': _PER_PAGE}
+    if since:
+        params['since'] = since
+    url = f'{client.api_url}/repos/{repository}/issues?{urlencode(params)}'
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Pull requests are listed as issues as well
+        items = [item for item in client.get_pages(url, executor) if 'pull_request' not in item]
+        timelines = executor.map(lambda item: client.get_pages(_timeline_url(client, repository, item)), items)
+        for item, timeline in zip(items, timelines):
+            yield to_record(item, timeline)
+
+
+def to_record(item:dict, timeline:List[dict]) -> dict:
+    """
+    Converts an issue of the API and its timeline into a record of the data file.
+    """
+    return {
+        'url': item.get('html_url'),
+        'creator': _login(item.get('user')),
+        'labels': [label.get('name') for label in item.get('labels') or []],
+        'state': item.get('state'),
+        'assignees': [_login(assignee) for assignee in item.get('assignees') or []],
+        'title': item.get('title'),
+        'text': item.get('body'),
+        'number': item.get('number'),
+        'created_date': _date(item.get('created_at')),
+        'updated_date': _date(item.get('updated_at')),
+        'timeline_url': item.get('timeline_url'),
+        'events': [to_event(entry) for entry in timeline],
+    }
+
+
+def to_event(entry:dict) -> dict:
+    """
+    Converts an entry of an issue timeline into an event of the data file.
+    """
+    event = {
+        'event_type': entry.get('event'),
+        'author': _login(entry.get('actor') or entry.get('user')),
+        'event_date': _date(entry.get('created_at') or entry.get('submitted_at')
+                            or (entry.get('committer') or {}).get('date')),
+    }
+    if entry.get('label') is not None:
+        event['label'] = entry['label'].get('name')
+    if entry.get('event') == 'commented':
+        event['comment'] = entry.get('body')
+    return event
+
+
+def write_records(records:Iterable[dict], path:str) -> int:
+    """
+    Writes the records as a data file, replacing it once complete.
+    Returns the number of records.
+    """
+    tmp_path = f'{path}.tmp'
+    count = 0
+    with open(tmp_path, 'w') as fout:
+        fout.write('[')
+        for record in records:
+            if count:
+                fout.write(',\n')
+            fout.write(json.dumps(record))
+            count += 1
+        fout.write(']\n')
+    os.replace(tmp_path, path)
+    return count
+
+
+def _timeline_url(client:GitHubClient, repository:str, item:dict) -> str:
+    url = item.get('timeline_url') or f'{client.api_url}/repos/{repository}/issues/{item["number"]}/timeline'
+    return f'{url}?{urlencode({"per_page": _PER_PAGE})}'
+
+
+def _page_urls(last_url:str) -> List[str]:
+    """
+    The urls of the pages from the second to the last one.
+    """
+    parts = urlsplit(last_url)
+    query = dict(parse_qsl(parts.query))
+    urls = []
+    for page in range(2, int(query.get('page', 1)) + 1):
+        query['page'] = str(page)
+        urls.append(urlunsplit(parts._replace(query=urlencode(query))))
+    return urls
+
+
+def _login(user:Optional[dict]) -> Optional[str]:
+    return user.get('login') if user else None
+
+
+def _date(value:Optional[str]) -> Optional[str]:
+    # The API returns UTC dates as e.g. 2020-02-28T13:59:25Z, the data file has +00:00
+    if value and value.endswith('Z'):
+        return value[:-1] + '+00:00'
+    return value
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser('fetch.py')
+    ap.add_argument('repository', type=str,
+                    help='Repository to fetch the issues of, as owner/name')
+    ap.add_argument('--output', '-o', type=str, required=False,
+                    help='Data file to write (default: ENPM611_PROJECT_DATA_PATH)')
+    ap.add_argument('--since', type=str, required=False,
+                    help='Only fetch issues updated at or after this time (ISO 8601), e.g. for a delta file')
+    ap.add_argument('--workers', '-w', type=int, required=False,
+                    default=config.get_parameter('ENPM611_PROJECT_FETCH_WORKERS', 8),
+                    help='Number of concurrent requests (default: 8)')
+    ap.add_argument('--cache', type=str, required=False,
+                    help='Directory of the response cache (default: <output>.http)')
+    ap.add_argument('--api-url', type=str, required=False,
+                    default=config.get_parameter('ENPM611_PROJECT_GITHUB_API_URL', DEFAULT_API_URL),
+                    help=f'Base url of the API (default: {DEFAULT_API_URL})')
+    args = ap.parse_args()
+
+    output = args.output or config.get_parameter('ENPM611_PROJECT_DATA_PATH')
+    if not output:
+        ap.error('Specify the data file to write with --output')
+    client = GitHubClient(args.api_url, config.get_parameter('ENPM611_PROJECT_GITHUB_TOKEN'),
+                          HttpCache(args.cache or f'{output}.http'))
+    start = time.perf_counter()
+    try:
+        count = write_records(fetch_issues(client, args.repository, args.workers, args.since), output)
+    finally:
+        client.close()
+    print(f'Wrote {count} issues of {args.repository} to {output} in {time.perf_counter() - start:.1f}s '
+          f'({client.requests} requests, {client.not_modified} not modified).')
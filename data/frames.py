@@ -0,0 +1,146 @@
+"""
+Normalized pandas frames of the issues data.
+
+The frames are built from the columnar store without going through
+Python objects: dictionary-encoded columns become categoricals (sharing
+the categories of the store, so e.g. creators and event authors can be
+compared directly) and timestamps become datetime64 columns in UTC.
+
+- issues: number, state, creator, created_date, updated_date, title
+- events: issue, issue_number, event_type, author, event_date, label
+- issue_labels: issue, issue_number, label (one row per label of an issue)
+- issue_assignees: issue, issue_number, assignee
+- lifecycle: one row per issue with the columns of the lifecycle table
+  (see data/lifecycle.py) and an `<event type>_events` count per type
+
+The issues frame is indexed by the position of the issue in the data
+file; the `issue` column of the other frames refers to that position.
+Each frame is built on first access. The lifecycle table and the
+time-bucketed rollups (see data/rollups.py) are available in array form.
+"""
+
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterator
+
+import numpy as np
+import pandas as pd
+
+from data.columnar import ColumnarStore, StringDictionary
+from data.lifecycle import Lifecycle
+from data.rollups import Rollups
+
+
+def _categorical(codes:np.ndarray, dictionary:StringDictionary) -> pd.Categorical:
+    # Missing values are coded as -1, which from_codes maps to NaN
+    return pd.Categorical.from_codes(codes, categories=dictionary.values)
+
+
+def _dates(epochs:np.ndarray) -> pd.DatetimeIndex:
+    # The NAT sentinel of the store is the int64 representation of NaT
+    return pd.to_datetime(epochs.view('datetime64[us]'), utc=True)
+
+
+class Frames(Mapping):
+    """
+    Lazily built frames over a columnar store.
+    """
+
+    NAMES = ('issues', 'events', 'issue_labels', 'issue_assignees', 'lifecycle')
+
+    def __init__(self, store:ColumnarStore, get_lifecycle:Callable[[], Lifecycle]=None,
+                 get_rollups:Callable[[], Rollups]=None):
+        """
+        Constructor
+        """
+        self.store:ColumnarStore = store
+        self._get_lifecycle = get_lifecycle or (lambda: Lifecycle.from_store(store))
+        self._lifecycle:Lifecycle = None
+        self._get_rollups = get_rollups or (lambda: Rollups(store))
+        self._rollups:Rollups = None
+        self._frames:Dict[str, pd.DataFrame] = {}
+
+    @property
+    def lifecycle(self) -> Lifecycle:
+        """
+        The lifecycle table of the issues in array form.
+        """
+        if self._lifecycle is None:
+            self._lifecycle = self._get_lifecycle()
+        return self._lifecycle
+
+    @property
+    def rollups(self) -> Rollups:
+        """
+        The time-bucketed counts per label, state and event type.
+        """
+        if self._rollups is None:
+            self._rollups = self._get_rollups()
+        return self._rollups
+
+    def __getitem__(self, name:str) -> pd.DataFrame:
+        if name not in self.NAMES:
+            raise KeyError(name)
+        if name not in self._frames:
+            self._frames[name] = getattr(self, f'_build_{name}')()
+        return self._frames[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.NAMES)
+
+    def __len__(self):
+        return len(self.NAMES)
+
+    def _build_issues(self) -> pd.DataFrame:
+        store = self.store
+        return pd.DataFrame({
+            'number': store.issue_number,
+            'state': _categorical(store.issue_state, store.states),
+            'creator': _categorical(store.issue_creator, store.users),
+            'created_date': _dates(store.issue_created),
+            'updated_date': _dates(store.issue_updated),
+            'title': store.issue_title.values(),
+        })
+
+    def _build_events(self) -> pd.DataFrame:
+        store = self.store
+        return pd.DataFrame({
+            'issue': store.event_issue,
+            'issue_number': store.issue_number[store.event_issue],
+            'event_type': _categorical(store.event_type, store.event_types),
+            'author': _categorical(store.event_author, store.users),
+            'event_date': _dates(store.event_date),
+            'label': _categorical(store.event_label, store.labels),
+        })
+
+    def _build_issue_labels(self) -> pd.DataFrame:
+        store = self.store
+        issue = np.repeat(np.arange(store.num_issues), np.diff(store.issue_label_offsets))
+        return pd.DataFrame({
+            'issue': issue,
+            'issue_number': store.issue_number[issue],
+            'label': _categorical(store.issue_label_codes, store.labels),
+        })
+
+    def _build_lifecycle(self) -> pd.DataFrame:
+        lifecycle = self.lifecycle
+        columns = {
+            'first_assigned': _dates(lifecycle.first_assigned),
+            'last_assigned': _dates(lifecycle.last_assigned),
+            'first_closed': _dates(lifecycle.first_closed),
+            'last_closed': _dates(lifecycle.last_closed),
+            'reopen_count': lifecycle.reopen_count,
+            'first_outside_comment': _dates(lifecycle.first_outside_comment),
+            'first_outside_commenter': _categorical(lifecycle.first_outside_commenter, lifecycle.users),
+        }
+        for code, event_type in enumerate(lifecycle.event_types.values):
+            columns[f'{event_type}_events'] = lifecycle.event_counts[:, code]
+        return pd.DataFrame(columns)
+
+    def _build_issue_assignees(self) -> pd.DataFrame:
+        store = self.store
+        issue = np.repeat(np.arange(store.num_issues), np.diff(store.issue_assignee_offsets))
+        return pd.DataFrame({
+            'issue': issue,
+            'issue_number': store.issue_number[issue],
+            'assignee': _categorical(store.issue_assignee_codes, store.users),
+        })
@@ -0,0 +1,379 @@
+"""
+Inverted indexes over the loaded issues.
+
+Each index is built on first use with a single pass over the issues and
+maps a value (author, creator, label or event type) to the positions at
+which it occurs. Lookups then cost time proportional to the size of the
+result instead of a scan over the whole dataset. The creation dates of
+the issues and the dates of the events are indexed in sorted order, so
+that the issues or events of a time range are found by binary search.
+
+The number of rows a lookup yields can be counted without building its
+index: it is read from the index if that is built, and otherwise
+estimated from an evenly spaced sample of the issues.
+
+The indexes over a columnar store (StoreIndex) are built from its code
+and date arrays instead: every index is a stable argsort of a column,
+and a lookup is a binary search for the code or the dates. Their
+counts are exact, and no view of an issue or event is created until
+the rows of a lookup are resolved.
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from data.columnar import NULL, ColumnarStore, EventView, StringDictionary
+from data.dates import NAT, to_epoch
+from models.model import Event, Issue
+
+# Position of an event: (position of the issue, position of the event within the issue)
+EventPosition = Tuple[int, int]
+
+# Issues sampled to estimate the number of rows of a lookup
+SAMPLE_SIZE:int = 1000
+
+
+class IssueIndex:
+    """
+    Lazily built inverted indexes over a list of issues.
+    """
+
+    def __init__(self, issues:List[Issue]):
+        """
+        Constructor
+        """
+        self.issues:List[Issue] = issues
+        self._creators:Dict[str, List[int]] = None
+        self._labels:Dict[str, List[int]] = None
+        self._authors:Dict[str, List[EventPosition]] = None
+        self._event_types:Dict[str, List[EventPosition]] = None
+        # Sorted dates and the positions they belong to
+        self._created:Tuple[List[datetime], List[int]] = None
+        self._event_dates:Tuple[List[datetime], List[EventPosition]] = None
+        self._num_events:int = None
+        self._sample:List[Issue] = None
+
+    def issues_by_creator(self, creator:str) -> List[int]:
+        """
+        Positions of the issues created by the given user.
+        """
+        if self._creators is None:
+            self._creators = defaultdict(list)
+            for pos, issue in enumerate(self.issues):
+                self._creators[issue.creator].append(pos)
+        return self._creators.get(creator, [])
+
+    def issues_by_label(self, label:str) -> List[int]:
+        """
+        Positions of the issues that carry the given label. An issue is
+        listed once for every time the label occurs on it.
+        """
+        if self._labels is None:
+            self._labels = defaultdict(list)
+            for pos, issue in enumerate(self.issues):
+                for issue_label in issue.labels:
+                    self._labels[issue_label].append(pos)
+        return self._labels.get(label, [])
+
+    def events_by_author(self, author:str) -> List[EventPosition]:
+        """
+        Positions of the events authored by the given user.
+        """
+        if self._authors is None:
+            self._build_event_indexes()
+        return self._authors.get(author, [])
+
+    def events_by_type(self, event_type:str) -> List[EventPosition]:
+        """
+        Positions of the events of the given type (e.g. 'labeled').
+        """
+        if self._event_types is None:
+            self._build_event_indexes()
+        return self._event_types.get(event_type, [])
+
+    def issues_created_between(self, since:Optional[datetime], until:Optional[datetime]) -> List[int]:
+        """
+        Positions of the issues created at or after since and before until
+        (either may be None), in the order of their creation dates. Issues
+        without a creation date are not included.
+        """
+        if self._created is None:
+            self._created = _sorted_by_date((to_utc(issue.created_date), pos)
+                                            for pos, issue in enumerate(self.issues))
+        return _between(self._created, since, until)
+
+    def events_between(self, since:Optional[datetime], until:Optional[datetime]) -> List[EventPosition]:
+        """
+        Positions of the events that occurred at or after since and before
+        until (either may be None), in the order of their dates. Events
+        without a date are not included.
+        """
+        if self._event_dates is None:
+            self._event_dates = _sorted_by_date((to_utc(event.event_date), (issue_pos, event_pos))
+                                                for issue_pos, issue in enumerate(self.issues)
+                                                for event_pos, event in enumerate(issue.events))
+        return _between(self._event_dates, since, until)
+
+    def num_events(self) -> int:
+        """
+        The number of events of all issues.
+        """
+        if self._num_events is None:
+            self._num_events = sum(len(issue.events) for issue in self.issues)
+        return self._num_events
+
+    def count_issues_by_creator(self, creator:str) -> float:
+        if self._creators is not None:
+            return len(self._creators.get(creator, []))
+        return self._estimate(lambda issue: issue.creator == creator)
+
+    def count_issues_by_label(self, label:str) -> float:
+        if self._labels is not None:
+            return len(self._labels.get(label, []))
+        return self._estimate(lambda issue: issue.labels.count(label))
+
+    def count_events_by_author(self, author:str) -> float:
+        if self._authors is not None:
+            return len(self._authors.get(author, []))
+        return self._estimate(lambda issue: sum(1 for event in issue.events if event.author == author))
+
+    def count_events_by_type(self, event_type:str) -> float:
+        if self._event_types is not None:
+            return len(self._event_types.get(event_type, []))
+        return self._estimate(lambda issue: sum(1 for event in issue.events if event.event_type == event_type))
+
+    def count_issues_created_between(self, since:Optional[datetime], until:Optional[datetime]) -> float:
+        if self._created is not None:
+            return len(_between(self._created, since, until))
+        return self._estimate(lambda issue: in_range(issue.created_date, since, until))
+
+    def count_events_between(self, since:Optional[datetime], until:Optional[datetime]) -> float:
+        if self._event_dates is not None:
+            return len(_between(self._event_dates, since, until))
+        return self._estimate(lambda issue: sum(1 for event in issue.events
+                                                if in_range(event.event_date, since, until)))
+
+    def count_events(self) -> float:
+        if self._num_events is not None:
+            return self._num_events
+        return self._estimate(lambda issue: len(issue.events))
+
+    def _estimate(self, count:Callable[[Issue], int]) -> float:
+        """
+        Scales the sum of count over the sampled issues to all issues.
+        """
+        if self._sample is None:
+            step = max(1, -(-len(self.issues) // SAMPLE_SIZE))
+            self._sample = self.issues[::step]
+        if not self._sample:
+            return 0
+        return sum(count(issue) for issue in self._sample) * len(self.issues) / len(self._sample)
+
+    def build(self):
+        """
+        Builds all indexes now instead of on first use, e.g. before the
+        index is shared between threads.
+        """
+        self.issues_by_creator(None)
+        self.issues_by_label(None)
+        self.events_by_author(None)
+        self.issues_created_between(None, None)
+        self.events_between(None, None)
+        self.num_events()
+
+    def get_issues(self, positions:List[int]) -> Iterator[Issue]:
+        for pos in positions:
+            yield self.issues[pos]
+
+    def get_events(self, positions:List[EventPosition]) -> Iterator[Tuple[Issue, Event]]:
+        """
+        Resolves event positions into (issue, event) pairs.
+        """
+        for issue_pos, event_pos in positions:
+            issue = self.issues[issue_pos]
+            yield issue, issue.events[event_pos]
+
+    def _build_event_indexes(self):
+        # Both event indexes are built in the same pass over the events
+        self._authors = defaultdict(list)
+        self._event_types = defaultdict(list)
+        for issue_pos, issue in enumerate(self.issues):
+            for event_pos, event in enumerate(issue.events):
+                self._authors[event.author].append((issue_pos, event_pos))
+                self._event_types[event.event_type].append((issue_pos, event_pos))
+
+
+class StoreIndex(IssueIndex):
+    """
+    Lazily built indexes over the issues of a columnar store. The
+    positions of events are their rows in the events table.
+    """
+
+    def __init__(self, store:ColumnarStore):
+        """
+        Constructor
+        """
+        # The store yields a view per issue when iterated, as for a full scan
+        super().__init__(store)
+        self.store:ColumnarStore = store
+        # Name of the index -> (sorted keys, positions in the order of the keys)
+        self._sorted:Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def issues_by_creator(self, creator:str) -> np.ndarray:
+        return self._lookup('creator', self.store.users, creator)
+
+    def issues_by_label(self, label:str) -> np.ndarray:
+        return self._lookup('label', self.store.labels, label)
+
+    def events_by_author(self, author:str) -> np.ndarray:
+        return self._lookup('author', self.store.users, author)
+
+    def events_by_type(self, event_type:str) -> np.ndarray:
+        return self._lookup('event_type', self.store.event_types, event_type)
+
+    def issues_created_between(self, since:Optional[datetime], until:Optional[datetime]) -> np.ndarray:
+        keys, positions = self._index('created')
+        return positions[slice(*_epoch_range(keys, since, until))]
+
+    def events_between(self, since:Optional[datetime], until:Optional[datetime]) -> np.ndarray:
+        keys, positions = self._index('event_date')
+        return positions[slice(*_epoch_range(keys, since, until))]
+
+    def num_events(self) -> int:
+        return self.store.num_events
+
+    def count_issues_by_creator(self, creator:str) -> int:
+        return self._count('creator', self.store.users, creator)
+
+    def count_issues_by_label(self, label:str) -> int:
+        return self._count('label', self.store.labels, label)
+
+    def count_events_by_author(self, author:str) -> int:
+        return self._count('author', self.store.users, author)
+
+    def count_events_by_type(self, event_type:str) -> int:
+        return self._count('event_type', self.store.event_types, event_type)
+
+    def count_issues_created_between(self, since:Optional[datetime], until:Optional[datetime]) -> int:
+        return self._count_between('created', since, until)
+
+    def count_events_between(self, since:Optional[datetime], until:Optional[datetime]) -> int:
+        return self._count_between('event_date', since, until)
+
+    def count_events(self) -> int:
+        return self.store.num_events
+
+    def get_issues(self, positions:Iterable[int]) -> Iterator[Issue]:
+        for pos in positions:
+            yield self.store.issue(int(pos))
+
+    def get_events(self, positions:Iterable[int]) -> Iterator[Tuple[Issue, Event]]:
+        """
+        Resolves event rows into (issue, event) pairs.
+        """
+        store = self.store
+        issue, current = None, None
+        for row in positions:
+            issue_pos = int(store.event_issue[row])
+            # The events of an issue are consecutive rows and share its view
+            if issue_pos != current:
+                issue, current = store.issue(issue_pos), issue_pos
+            yield issue, EventView(store, int(row))
+
+    def _keys(self, name:str) -> np.ndarray:
+        store = self.store
+        return {'creator': store.issue_creator, 'label': store.issue_label_codes, 'author': store.event_author,
+                'event_type': store.event_type, 'created': store.issue_created, 'event_date': store.event_date}[name]
+
+    def _positions(self, name:str) -> np.ndarray:
+        store = self.store
+        if name == 'label':
+            # The issue of every label occurrence
+            return np.repeat(np.arange(store.num_issues), np.diff(store.issue_label_offsets))
+        return np.arange(store.num_issues if name in ('creator', 'created') else store.num_events)
+
+    def _index(self, name:str) -> Tuple[np.ndarray, np.ndarray]:
+        if name not in self._sorted:
+            keys = self._keys(name)
+            # A stable sort keeps the positions of equal keys in the order of the data
+            order = np.argsort(keys, kind='stable')
+            self._sorted[name] = (keys[order], self._positions(name)[order])
+        return self._sorted[name]
+
+    def _lookup(self, name:str, dictionary:StringDictionary, value:str) -> np.ndarray:
+        code = dictionary.code_of(value)
+        keys, positions = self._index(name)
+        if code == NULL and value is not None:
+            return positions[:0]
+        return positions[np.searchsorted(keys, code, 'left'):np.searchsorted(keys, code, 'right')]
+
+    def _count(self, name:str, dictionary:StringDictionary, value:str) -> int:
+        if name in self._sorted:
+            return len(self._lookup(name, dictionary, value))
+        code = dictionary.code_of(value)
+        if code == NULL and value is not None:
+            return 0
+        return int(np.count_nonzero(self._keys(name) == code))
+
+    def _count_between(self, name:str, since:Optional[datetime], until:Optional[datetime]) -> int:
+        if name in self._sorted:
+            start, end = _epoch_range(self._sorted[name][0], since, until)
+            return end - start
+        epochs = self._keys(name)
+        within = epochs != NAT
+        if since is not None:
+            within &= epochs >= to_epoch(since)
+        if until is not None:
+            within &= epochs < to_epoch(until)
+        return int(np.count_nonzero(within))
+
+
+def _epoch_range(epochs:np.ndarray, since:Optional[datetime], until:Optional[datetime]) -> Tuple[int, int]:
+    """
+    The range of the sorted epochs at or after since and before until,
+    leaving out the missing dates (NAT sorts first).
+    """
+    start = int(np.searchsorted(epochs, NAT, 'right'))
+    if since is not None:
+        start = max(start, int(np.searchsorted(epochs, to_epoch(since), 'left')))
+    end = len(epochs) if until is None else int(np.searchsorted(epochs, to_epoch(until), 'left'))
+    return start, max(start, end)
+
+
+def to_utc(value:Optional[datetime]) -> Optional[datetime]:
+    """
+    Makes a datetime comparable with those of the data: dates without a
+    time zone are taken to be in UTC.
+    """
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def in_range(date:Optional[datetime], since:Optional[datetime], until:Optional[datetime]) -> bool:
+    """
+    Whether a date lies at or after since and before until (either may be
+    None). Without a range, any date matches, even a missing one.
+    """
+    if since is None and until is None:
+        return True
+    date = to_utc(date)
+    if date is None:
+        return False
+    return (since is None or date >= since) and (until is None or date < until)
+
+
+def _sorted_by_date(entries:Iterator[Tuple[Optional[datetime], any]]) -> Tuple[List[datetime], List[any]]:
+    entries = sorted((entry for entry in entries if entry[0] is not None), key=lambda entry: entry[0])
+    return [date for date, _ in entries], [position for _, position in entries]
+
+
+def _between(index:Tuple[List[datetime], List[any]], since:Optional[datetime], until:Optional[datetime]) -> List[any]:
+    dates, positions = index
+    start = bisect_left(dates, since) if since is not None else 0
+    end = bisect_left(dates, until) if until is not None else len(dates)
+    return positions[start:end]
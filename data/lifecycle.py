@@ -0,0 +1,119 @@
+"""
+Per-issue lifecycle table.
+
+Facts about the life of every issue that several analyses need are
+derived once from the event columns of the columnar store, with
+vectorized numpy operations, instead of every analysis rescanning the
+events:
+
+- the dates of the first and last 'assigned' and 'closed' events
+- the number of 'reopened' events
+- the date and author of the first comment by someone other than the creator
+- the number of events of every type
+
+Dates are microseconds since the epoch (NAT if there is no such event),
+users are codes of the store's user dictionary. "First" and "last" refer
+to the order of the events in the data file.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+from data.columnar import NULL, ColumnarStore, StringDictionary
+from data.dates import NAT
+
+
+class Lifecycle:
+    """
+    Array-backed lifecycle table with one row per issue.
+    """
+
+    def __init__(self, event_types:StringDictionary, users:StringDictionary, **columns:np.ndarray):
+        """
+        Constructor
+        """
+        self.event_types:StringDictionary = event_types
+        self.users:StringDictionary = users
+        self.first_assigned:np.ndarray = columns['first_assigned']
+        self.last_assigned:np.ndarray = columns['last_assigned']
+        self.first_closed:np.ndarray = columns['first_closed']
+        self.last_closed:np.ndarray = columns['last_closed']
+        self.reopen_count:np.ndarray = columns['reopen_count']
+        self.first_outside_comment:np.ndarray = columns['first_outside_comment']
+        self.first_outside_commenter:np.ndarray = columns['first_outside_commenter']
+        # Number of events per issue (rows) and event type (columns, by code)
+        self.event_counts:np.ndarray = columns['event_counts']
+
+    @staticmethod
+    def from_store(store:ColumnarStore) -> 'Lifecycle':
+        num_issues = store.num_issues
+        event_issue = store.event_issue
+
+        def of_type(event_type:str) -> np.ndarray:
+            code = store.event_types.code_of(event_type)
+            if code == NULL:
+                return np.zeros(len(event_issue), dtype=np.bool_)
+            return store.event_type == code
+
+        first_assigned, last_assigned = _first_and_last(event_issue, of_type('assigned'), num_issues)
+        first_closed, last_closed = _first_and_last(event_issue, of_type('closed'), num_issues)
+        # Comments by someone other than the creator of the issue
+        outside = of_type('commented') & (store.event_author != NULL) \
+            & (store.event_author != store.issue_creator[event_issue])
+        first_comment, _ = _first_and_last(event_issue, outside, num_issues)
+
+        num_types = len(store.event_types)
+        typed = store.event_type != NULL
+        event_counts = np.bincount(event_issue[typed].astype(np.int64) * num_types + store.event_type[typed],
+                                   minlength=num_issues * num_types)
+
+        return Lifecycle(
+            store.event_types, store.users,
+            first_assigned=_take(store.event_date, first_assigned, NAT),
+            last_assigned=_take(store.event_date, last_assigned, NAT),
+            first_closed=_take(store.event_date, first_closed, NAT),
+            last_closed=_take(store.event_date, last_closed, NAT),
+            reopen_count=np.bincount(event_issue[of_type('reopened')], minlength=num_issues).astype(np.int32),
+            first_outside_comment=_take(store.event_date, first_comment, NAT),
+            first_outside_commenter=_take(store.event_author, first_comment, NULL).astype(np.int32),
+            event_counts=event_counts.reshape(num_issues, num_types).astype(np.int32),
+        )
+
+    def __len__(self):
+        return len(self.reopen_count)
+
+    def count(self, event_type:str) -> np.ndarray:
+        """
+        The number of events of a type for every issue.
+        """
+        code = self.event_types.code_of(event_type)
+        if code == NULL:
+            return np.zeros(len(self), dtype=np.int32)
+        return self.event_counts[:, code]
+
+
+def _first_and_last(event_issue:np.ndarray, mask:np.ndarray, num_issues:int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Positions of the first and last selected event of every issue, or -1.
+    The events of an issue are consecutive.
+    """
+    first = np.full(num_issues, -1, dtype=np.int64)
+    last = np.full(num_issues, -1, dtype=np.int64)
+    selected = np.flatnonzero(mask)
+    if len(selected):
+        issues = event_issue[selected]
+        starts = np.flatnonzero(np.r_[True, issues[1:] != issues[:-1]])
+        ends = np.r_[starts[1:] - 1, len(selected) - 1]
+        first[issues[starts]] = selected[starts]
+        last[issues[starts]] = selected[ends]
+    return first, last
+
+
+def _take(values:np.ndarray, positions:np.ndarray, missing:int) -> np.ndarray:
+    """
+    The values at the given event positions, or missing where the position is -1.
+    """
+    if not len(values):
+        return np.full(len(positions), missing, dtype=values.dtype)
+    return np.where(positions >= 0, values[positions.clip(0)], missing)
@@ -0,0 +1,200 @@
+"""
+Decodes the issues data file in parallel.
+
+The data file is split into byte ranges that each contain a run of
+complete records of the top-level JSON array. The record boundaries are
+found with a vectorized scan over the raw bytes: unescaped quotes
+delimit strings, and outside of strings the nesting depth is tracked
+through the brackets, so that the commas at depth 1 separate records.
+The ranges are then decoded in a process pool and the results are merged
+in their original order. Datasets made of several data files (one per
+repository) are decoded with one file per task instead.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+
+from data.columnar import ColumnarStore
+from data.dates import DECODER
+from models.model import Issue
+
+# Bytes scanned at a time when looking for record boundaries
+_SCAN_BLOCK_SIZE:int = 1 << 22
+
+# Number of shards per worker, so that uneven shards even out
+_SHARDS_PER_WORKER:int = 4
+
+_QUOTE, _BACKSLASH, _COMMA = ord('"'), ord('\\'), ord(',')
+_OPENING = np.array([ord('['), ord('{')], dtype=np.uint8)
+_CLOSING = np.array([ord(']'), ord('}')], dtype=np.uint8)
+
+
+def find_record_boundaries(path:str) -> np.ndarray:
+    """
+    Returns the byte offsets of the delimiters around the records of the
+    top-level array: the opening bracket, every comma between two records
+    and the closing bracket.
+    """
+    boundaries = []
+    in_string = False
+    depth = 0
+    # Global offset of the last byte that was not a backslash
+    last_plain = -1
+    base = 0
+    with open(path, 'rb') as fin:
+        while True:
+            block = fin.read(_SCAN_BLOCK_SIZE)
+            if not block:
+                break
+            data = np.frombuffer(block, dtype=np.uint8)
+
+            # A quote is escaped if preceded by an odd number of backslashes
+            plain = np.where(data != _BACKSLASH, np.arange(base, base + len(data)), -1)
+            last_plain_before = np.maximum.accumulate(np.concatenate(([last_plain], plain[:-1])))
+            quotes = np.flatnonzero(data == _QUOTE)
+            escaped = ((quotes + base - 1 - last_plain_before[quotes]) % 2) == 1
+            quotes = quotes[~escaped]
+            last_plain = max(last_plain, int(plain.max()))
+
+            # Structural characters are those outside of strings
+            structural = np.flatnonzero(np.isin(data, _OPENING) | np.isin(data, _CLOSING) | (data == _COMMA))
+            quotes_before = np.searchsorted(quotes, structural)
+            structural = structural[(quotes_before + in_string) % 2 == 0]
+            in_string = (len(quotes) + in_string) % 2 == 1
+
+            # Depth after each structural character
+            chars = data[structural]
+            delta = np.isin(chars, _OPENING).astype(np.int64) - np.isin(chars, _CLOSING).astype(np.int64)
+            depth_after = depth + np.cumsum(delta)
+            if len(depth_after):
+                depth = int(depth_after[-1])
+
+            is_boundary = ((chars == _COMMA) & (depth_after == 1)) \
+                | ((delta == 1) & (depth_after == 1)) \
+                | ((delta == -1) & (depth_after == 0))
+            boundaries.append(structural[is_boundary] + base)
+            base += len(data)
+
+    boundaries = np.concatenate(boundaries) if boundaries else np.zeros(0, dtype=np.int64)
+    if len(boundaries) < 2:
+        raise ValueError('Expected the data file to contain a JSON array')
+    return boundaries
+
+
+def plan_shards(path:str, num_shards:int) -> List[Tuple[int, int]]:
+    """
+    Splits the records of the data file into at most num_shards byte ranges
+    of roughly equal size. Each range holds complete, comma-separated records.
+    """
+    boundaries = find_record_boundaries(path)
+    start, end = int(boundaries[0]) + 1, int(boundaries[-1])
+    if len(boundaries) == 2:
+        # At most one record, which may also be an empty array
+        return [(start, end)]
+    targets = np.linspace(start, end, num_shards + 1)[1:-1]
+    splits = np.unique(boundaries[np.searchsorted(boundaries, targets).clip(1, len(boundaries) - 2)])
+    edges = [start - 1] + [int(split) for split in splits] + [end]
+    return [(edges[i] + 1, edges[i + 1]) for i in range(len(edges) - 1)]
+
+
+def _read_shard(path:str, start:int, end:int) -> List[dict]:
+    with open(path, 'rb') as fin:
+        fin.seek(start)
+        return json.loads(b'[' + fin.read(end - start) + b']')
+
+
+def _decode_issues(shard:Tuple[str, int, int]) -> Tuple[List[Issue], Tuple[int, int, int]]:
+    return _decode_issues_records(_read_shard(*shard))
+
+
+def _decode_issues_records(records:List[dict]) -> Tuple[List[Issue], Tuple[int, int, int]]:
+    DECODER.reset()
+    issues = [Issue(jobj) for jobj in records]
+    # Decode the events here rather than lazily in the parent process
+    for issue in issues:
+        issue.events
+    return issues, (DECODER.fast_count, DECODER.fallback_count, DECODER.failed_count)
+
+
+def _decode_store(shard:Tuple[str, int, int]) -> Tuple[ColumnarStore, Tuple[int, int, int]]:
+    DECODER.reset()
+    store = ColumnarStore.from_records(_read_shard(*shard))
+    return store, (DECODER.fast_count, DECODER.fallback_count, DECODER.failed_count)
+
+
+def _decode_file_issues(path:str) -> Tuple[List[Issue], Tuple[int, int, int]]:
+    with open(path, 'r') as fin:
+        return _decode_issues_records(json.load(fin))
+
+
+def _decode_file_store(path:str) -> Tuple[ColumnarStore, Tuple[int, int, int]]:
+    DECODER.reset()
+    with open(path, 'r') as fin:
+        store = ColumnarStore.from_records(json.load(fin))
+    return store, (DECODER.fast_count, DECODER.fallback_count, DECODER.failed_count)
+
+
+def _run_sharded(path:str, workers:int, decode) -> List[any]:
+    shards = [(path, start, end) for start, end in plan_shards(path, workers * _SHARDS_PER_WORKER)]
+    return _run_pool(shards, workers, decode)
+
+
+def _run_pool(tasks:List[any], workers:int, decode) -> List[any]:
+    results = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        # map() returns the results in the order of the tasks
+        for result, (fast, fallback, failed) in executor.map(decode, tasks):
+            DECODER.fast_count += fast
+            DECODER.fallback_count += fallback
+            DECODER.failed_count += failed
+            results.append(result)
+    return results
+
+
+def load_issues(path:str, workers:int) -> List[Issue]:
+    """
+    Decodes the data file into Issue objects using a pool of worker processes.
+    """
+    issues = []
+    for shard in _run_sharded(path, workers, _decode_issues):
+        issues.extend(shard)
+    return issues
+
+
+def load_store(path:str, workers:int) -> ColumnarStore:
+    """
+    Decodes the data file into a columnar store using a pool of worker processes.
+    """
+    return ColumnarStore.concat(_run_sharded(path, workers, _decode_store))
+
+
+def load_files_issues(paths:List[str], workers:int) -> List[List[Issue]]:
+    """
+    Decodes several data files into Issue objects, one file per worker
+    process at a time. Returns the issues of every file.
+    """
+    return _run_pool(paths, workers, _decode_file_issues)
+
+
+def load_files_stores(paths:List[str], workers:int) -> List[ColumnarStore]:
+    """
+    Decodes several data files into columnar stores, one file per worker
+    process at a time. Returns the store of every file.
+    """
+    return _run_pool(paths, workers, _decode_file_store)
+
+
+def resolve_workers(value:any) -> int:
+    """
+    Interprets the configured number of workers. 'auto' or 0 use one
+    worker per CPU.
+    """
+    if value in (None, ''):
+        return 1
+    if value == 'auto' or int(value) <= 0:
+        return os.cpu_count() or 1
+    return int(value)
@@ -0,0 +1,277 @@
+"""
+Event-sequence patterns over the issues data.
+
+A pattern is a sequence of steps separated by '->'. Every step selects
+events by type and optionally by label, and may constrain the time since
+the event matched by the previous step:
+
+    closed -> reopened within 7d
+    labeled:kind/bug -> assigned
+    labeled:"good first issue" -> closed after 1w
+    * -> commented within 2h
+
+'*' matches events of any type. Durations are a number followed by s, m,
+h, d or w. The events matched by consecutive steps need not be adjacent;
+other events of the issue may occur in between. A step may either be
+'within' or 'after' some time of the previous one, not both.
+
+A pattern is compiled against the dictionaries of a columnar store into
+type and label codes, and then runs as a state machine over the event
+columns of all issues in a single pass. Only events that some step can
+match are visited. For every issue, the first complete match is
+returned with the dates of the matched events. The events of an issue
+are expected in chronological order, as in the data file; events
+without a date may occur anywhere, but never satisfy a time constraint.
+
+    python -m data.patterns "closed -> reopened within 7d"
+"""
+
+import argparse
+import re
+import shlex
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from data.columnar import NULL, ColumnarStore
+from data.dates import NAT, from_epoch
+
+# Code of a step that matches any event type or label
+ANY:int = -2
+
+# Sentinel for a code that is not part of a dictionary, i.e. a step that never matches
+_NEVER:int = -3
+
+_MICROSECONDS = {'s': 10**6, 'm': 60 * 10**6, 'h': 3600 * 10**6, 'd': 86400 * 10**6, 'w': 7 * 86400 * 10**6}
+_DURATION = re.compile(r'^(\d+(?:\.\d+)?)([smhdw])$')
+
+
+class Step:
+    """
+    One step of a pattern: the type and label of the event to match and
+    the time allowed since the event matched by the previous step.
+    """
+
+    def __init__(self, event_type:str, label:Optional[str]=None,
+                 within:Optional[int]=None, after:Optional[int]=None):
+        """
+        Constructor
+        """
+        self.event_type:str = event_type
+        self.label:Optional[str] = label
+        # Maximum and minimum gap to the previous step in microseconds
+        self.within:Optional[int] = within
+        self.after:Optional[int] = after
+
+    def __str__(self):
+        text = self.event_type if self.label is None else f'{self.event_type}:{shlex.quote(self.label)}'
+        if self.within is not None:
+            text += f' within {_format_duration(self.within)}'
+        if self.after is not None:
+            text += f' after {_format_duration(self.after)}'
+        return text
+
+
+class Match:
+    """
+    An issue that matched a pattern, with the dates of the matched events.
+    """
+
+    __slots__ = ('issue_number', 'dates')
+
+    def __init__(self, issue_number:int, dates:List[Optional[datetime]]):
+        """
+        Constructor
+        """
+        self.issue_number:int = issue_number
+        # Date of the event matched by every step (None if the event has no date)
+        self.dates:List[Optional[datetime]] = dates
+
+    @property
+    def duration(self) -> Optional[timedelta]:
+        """
+        The time from the first to the last matched event.
+        """
+        if self.dates[0] is None or self.dates[-1] is None:
+            return None
+        return self.dates[-1] - self.dates[0]
+
+    def __repr__(self):
+        return f'Match({self.issue_number}, {self.dates})'
+
+
+class Pattern:
+    """
+    A parsed event-sequence pattern.
+    """
+
+    def __init__(self, steps:List[Step]):
+        """
+        Constructor
+        """
+        if not steps:
+            raise ValueError('A pattern needs at least one step')
+        if steps[0].within is not None or steps[0].after is not None:
+            raise ValueError('The first step of a pattern cannot have a time constraint')
+        self.steps:List[Step] = steps
+
+    @staticmethod
+    def parse(text:str) -> 'Pattern':
+        steps = []
+        for part in _split_steps(shlex.split(text)):
+            selector, constraints = part[0], part[1:]
+            event_type, _, label = selector.partition(':')
+            step = Step(event_type, label if label else None)
+            if len(constraints) % 2:
+                raise ValueError(f'Incomplete time constraint in step "{" ".join(part)}"')
+            for keyword, duration in zip(constraints[::2], constraints[1::2]):
+                if keyword not in ('within', 'after') or getattr(step, keyword) is not None:
+                    raise ValueError(f'Unexpected "{keyword}" in step "{" ".join(part)}"')
+                setattr(step, keyword, _parse_duration(duration))
+            if step.within is not None and step.after is not None:
+                raise ValueError(f'Step "{step}" cannot be both within and after a time')
+            steps.append(step)
+        return Pattern(steps)
+
+    def __str__(self):
+        return ' -> '.join(str(step) for step in self.steps)
+
+    def compile(self, store:ColumnarStore) -> Tuple[List[int], List[int]]:
+        """
+        The event type and label code of every step in the dictionaries
+        of the store (ANY for a wildcard).
+        """
+        type_codes, label_codes = [], []
+        for step in self.steps:
+            type_codes.append(ANY if step.event_type == '*' else _code(store.event_types, step.event_type))
+            label_codes.append(ANY if step.label is None else _code(store.labels, step.label))
+        return type_codes, label_codes
+
+    def search(self, store:ColumnarStore) -> List[Match]:
+        """
+        The issues with events matching the pattern, in the order of the
+        data file, with the first match of every issue.
+        """
+        type_codes, label_codes = self.compile(store)
+        if _NEVER in type_codes or _NEVER in label_codes:
+            return []
+
+        # Skip the events that no step can match
+        if ANY in type_codes:
+            relevant = np.arange(len(store.event_type))
+        else:
+            relevant = np.flatnonzero(np.isin(store.event_type, type_codes))
+        event_issue = store.event_issue[relevant].tolist()
+        event_type = store.event_type[relevant].tolist()
+        event_label = store.event_label[relevant].tolist()
+        event_date = store.event_date[relevant].tolist()
+
+        num_steps = len(self.steps)
+        within = [step.within for step in self.steps]
+        after = [step.after for step in self.steps]
+        # Whether to keep the latest rather than the earliest partial match
+        # of each state: a 'within' constraint on the next step favours
+        # late partial matches, anything else early ones. Partial matches
+        # with a date always replace those without.
+        keep_latest = [state < num_steps and within[state] is not None for state in range(num_steps + 1)]
+
+        matches = []
+        current_issue, matched = -1, False
+        partial = None
+        for issue, type_code, label_code, date in zip(event_issue, event_type, event_label, event_date):
+            if issue != current_issue:
+                current_issue, matched = issue, False
+                # partial[state]: dates of the events matched by the first `state` steps
+                partial = [()] + [None] * num_steps
+            elif matched:
+                continue
+            # In reverse so that one event advances a partial match by at most one step
+            for state in range(num_steps - 1, -1, -1):
+                dates = partial[state]
+                if dates is None:
+                    continue
+                if type_codes[state] != ANY and type_codes[state] != type_code:
+                    continue
+                if label_codes[state] != ANY and label_codes[state] != label_code:
+                    continue
+                if state and not _gap_allowed(dates[-1], date, within[state], after[state]):
+                    continue
+                known = partial[state + 1]
+                if known is None or _preferred(date, known[-1], keep_latest[state + 1]):
+                    partial[state + 1] = dates + (date,)
+            if partial[num_steps] is not None:
+                matched = True
+                dates = [None if date == NAT else from_epoch(date) for date in partial[num_steps]]
+                matches.append(Match(int(store.issue_number[issue]), dates))
+        return matches
+
+
+def _split_steps(tokens:List[str]) -> List[List[str]]:
+    steps = [[]]
+    for token in tokens:
+        if token == '->':
+            steps.append([])
+        else:
+            steps[-1].append(token)
+    if any(not step for step in steps):
+        raise ValueError('Empty step in pattern')
+    return steps
+
+
+def _parse_duration(text:str) -> int:
+    match = _DURATION.match(text)
+    if match is None:
+        raise ValueError(f'Invalid duration "{text}", expected e.g. 30m, 12h, 7d or 2w')
+    return int(float(match.group(1)) * _MICROSECONDS[match.group(2)])
+
+
+def _format_duration(microseconds:int) -> str:
+    for unit in ('w', 'd', 'h', 'm'):
+        if microseconds % _MICROSECONDS[unit] == 0:
+            return f'{microseconds // _MICROSECONDS[unit]}{unit}'
+    return f'{microseconds / _MICROSECONDS["s"]:g}s'
+
+
+def _code(dictionary, value:str) -> int:
+    code = dictionary.code_of(value)
+    return _NEVER if code == NULL else code
+
+
+def _gap_allowed(previous:int, date:int, within:Optional[int], after:Optional[int]) -> bool:
+    if within is None and after is None:
+        return True
+    if previous == NAT or date == NAT:
+        return False
+    gap = date - previous
+    if gap < 0:
+        return False
+    if within is not None and gap > within:
+        return False
+    return after is None or gap >= after
+
+
+def _preferred(date:int, known:int, keep_latest:bool) -> bool:
+    # A partial match without a date fails every time constraint of the next step
+    if date == NAT:
+        return False
+    return known == NAT or (keep_latest and date > known)
+
+
+if __name__ == '__main__':
+    from data.data_loader import DataLoader
+
+    ap = argparse.ArgumentParser('patterns.py')
+    ap.add_argument('pattern', type=str,
+                    help='Pattern to search for, e.g. "closed -> reopened within 7d"')
+    args = ap.parse_args()
+
+    try:
+        pattern = Pattern.parse(args.pattern)
+    except ValueError as error:
+        ap.error(str(error))
+    matches = pattern.search(DataLoader().get_store())
+    for match in matches:
+        dates = ', '.join(str(date) for date in match.dates)
+        print(f'#{match.issue_number}: {dates} (took {match.duration})')
+    print(f'{len(matches)} issues match "{pattern}".')
@@ -0,0 +1,241 @@
+"""
+Declarative queries over the issues and their events.
+
+    loader = DataLoader()
+    open_bugs = loader.query_issues(state='open', label='kind/bug')
+    assignments = loader.query_events(event_type='assigned', since='2024-01-01', label='kind/bug')
+    for issue, event in assignments:
+        ...
+    print(assignments.explain())
+
+Issues can be filtered by state, label, creator and creation date
+(since/until), events additionally by event type, author and date. The
+date ranges include since and exclude until; dates without a time zone
+are taken to be in UTC.
+
+A planner chooses the cheapest way to find the matching rows among
+- index lookups: issues by creator or label, events by author or type
+- time-range pruning: issues by creation date or events by date, found
+  by binary search in date-sorted indexes
+- a full scan over all issues (and events)
+by the number of candidate rows each one yields; the other filters are
+then applied to the candidates. The numbers of rows are estimated without
+building the indexes (see data/index.py), and only the index of the
+chosen plan is built. The indexes are those of the DataLoader and are
+only used if the issues are held in memory, as objects or in the
+columnar store. Otherwise the data file is streamed in a full scan.
+
+Results are evaluated lazily: the plan is chosen when a result is first
+iterated, and rows are yielded as they are found, in the order of the
+data file.
+"""
+
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from data.dates import parse_date
+from data.index import IssueIndex, in_range, to_utc
+from models.model import Event, Issue
+
+
+def _date(value:any) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return to_utc(value)
+    date = parse_date(str(value))
+    if date is None:
+        raise ValueError(f'Invalid date "{value}"')
+    return to_utc(date)
+
+
+class IssueFilter:
+    """
+    Conditions on the fields of an issue.
+    """
+
+    def __init__(self, state:str=None, label:str=None, creator:str=None, created_since:any=None,
+                 created_until:any=None):
+        """
+        Constructor
+        """
+        self.state:str = state
+        self.label:str = label
+        self.creator:str = creator
+        self.created_since:Optional[datetime] = _date(created_since)
+        self.created_until:Optional[datetime] = _date(created_until)
+
+    def matches(self, issue:Issue) -> bool:
+        return (self.state is None or issue.state == self.state) \
+            and (self.label is None or self.label in issue.labels) \
+            and (self.creator is None or issue.creator == self.creator) \
+            and in_range(issue.created_date, self.created_since, self.created_until)
+
+    def is_empty(self) -> bool:
+        return all(value is None for value in vars(self).values())
+
+
+class EventFilter:
+    """
+    Conditions on the fields of an event.
+    """
+
+    def __init__(self, event_type:str=None, author:str=None, since:any=None, until:any=None):
+        """
+        Constructor
+        """
+        self.event_type:str = event_type
+        self.author:str = author
+        self.since:Optional[datetime] = _date(since)
+        self.until:Optional[datetime] = _date(until)
+
+    def matches(self, event:Event) -> bool:
+        return (self.event_type is None or event.event_type == self.event_type) \
+            and (self.author is None or event.author == self.author) \
+            and in_range(event.event_date, self.since, self.until)
+
+
+class Plan:
+    """
+    An access path of a query: a description, the estimated number of
+    candidate rows and a function producing the candidates.
+    """
+
+    def __init__(self, description:str, rows:float, candidates:Callable[[], Iterator[any]]):
+        """
+        Constructor
+        """
+        self.description:str = description
+        self.rows:float = rows
+        self.candidates:Callable[[], Iterator[any]] = candidates
+
+    def __str__(self):
+        return f'{self.description} (~{self.rows:.0f} candidate rows)'
+
+
+class IssueQuery:
+    """
+    Lazily evaluated query for issues.
+    """
+
+    def __init__(self, loader:'DataLoader', issue_filter:IssueFilter):
+        """
+        Constructor
+        """
+        self.loader = loader
+        self.issue_filter:IssueFilter = issue_filter
+
+    def plans(self) -> List[Plan]:
+        """
+        The access paths the query can use.
+        """
+        if not self.loader.is_loaded():
+            return [Plan('full scan of the streamed data file', float('inf'), self.loader.iter_issues)]
+        index = self.loader.get_index()
+        issues = index.issues
+        plans = [Plan('full scan', len(issues), lambda: iter(issues))]
+        plans.extend(_issue_index_plans(index, self.issue_filter))
+        return plans
+
+    def plan(self) -> Plan:
+        return min(self.plans(), key=lambda plan: plan.rows)
+
+    def explain(self) -> str:
+        return str(self.plan())
+
+    def __iter__(self) -> Iterator[Issue]:
+        issue_filter = self.issue_filter
+        for issue in self.plan().candidates():
+            if issue_filter.matches(issue):
+                yield issue
+
+    def count(self) -> int:
+        return sum(1 for _ in self)
+
+
+class EventQuery:
+    """
+    Lazily evaluated query for events, yielding (issue, event) pairs.
+    """
+
+    def __init__(self, loader:'DataLoader', issue_filter:IssueFilter, event_filter:EventFilter):
+        """
+        Constructor
+        """
+        self.loader = loader
+        self.issue_filter:IssueFilter = issue_filter
+        self.event_filter:EventFilter = event_filter
+
+    def plans(self) -> List[Plan]:
+        """
+        The access paths the query can use.
+        """
+        if not self.loader.is_loaded():
+            return [Plan('full scan of the streamed data file', float('inf'),
+                         lambda: _events_of(self.loader.iter_issues()))]
+        index = self.loader.get_index()
+        issues = index.issues
+        num_events = index.count_events()
+        plans = [Plan('full scan', num_events, lambda: _events_of(issues))]
+
+        # Candidate issues found through their indexes contribute all their events
+        events_per_issue = num_events / max(len(issues), 1)
+        for plan in _issue_index_plans(index, self.issue_filter):
+            plans.append(Plan(f'{plan.description}, then their events', plan.rows * events_per_issue,
+                              lambda candidates=plan.candidates: _events_of(candidates())))
+
+        event_filter = self.event_filter
+        event_type, author = event_filter.event_type, event_filter.author
+        since, until = event_filter.since, event_filter.until
+        if event_type is not None:
+            plans.append(Plan(f'index lookup: events of type {event_type!r}', index.count_events_by_type(event_type),
+                              lambda: index.get_events(index.events_by_type(event_type))))
+        if author is not None:
+            plans.append(Plan(f'index lookup: events by author {author!r}', index.count_events_by_author(author),
+                              lambda: index.get_events(index.events_by_author(author))))
+        if since is not None or until is not None:
+            plans.append(Plan('time-range pruning: events by date', index.count_events_between(since, until),
+                              lambda: index.get_events(sorted(index.events_between(since, until)))))
+        return plans
+
+    def plan(self) -> Plan:
+        return min(self.plans(), key=lambda plan: plan.rows)
+
+    def explain(self) -> str:
+        return str(self.plan())
+
+    def __iter__(self) -> Iterator[Tuple[Issue, Event]]:
+        issue_filter, event_filter = self.issue_filter, self.event_filter
+        check_issue = not issue_filter.is_empty()
+        for issue, event in self.plan().candidates():
+            if event_filter.matches(event) and (not check_issue or issue_filter.matches(issue)):
+                yield issue, event
+
+    def count(self) -> int:
+        return sum(1 for _ in self)
+
+
+def _issue_index_plans(index:IssueIndex, issue_filter:IssueFilter) -> List[Plan]:
+    """
+    The access paths to the issues through the indexes. The candidates
+    are yielded in the order of the data file.
+    """
+    plans = []
+    creator, label = issue_filter.creator, issue_filter.label
+    since, until = issue_filter.created_since, issue_filter.created_until
+    if creator is not None:
+        plans.append(Plan(f'index lookup: issues by creator {creator!r}', index.count_issues_by_creator(creator),
+                          lambda: index.get_issues(index.issues_by_creator(creator))))
+    if label is not None:
+        # The index lists an issue once for every time it carries the label
+        plans.append(Plan(f'index lookup: issues by label {label!r}', index.count_issues_by_label(label),
+                          lambda: index.get_issues(sorted(set(index.issues_by_label(label))))))
+    if since is not None or until is not None:
+        plans.append(Plan('time-range pruning: issues by creation date',
+                          index.count_issues_created_between(since, until),
+                          lambda: index.get_issues(sorted(index.issues_created_between(since, until)))))
+    return plans
+
+
+def _events_of(issues:Iterator[Issue]) -> Iterator[Tuple[Issue, Event]]:
+    for issue in issues:
+        for event in issue.events:
+            yield issue, event
@@ -0,0 +1,73 @@
+"""
+Resolves the data files of the repositories to analyze.
+
+ENPM611_PROJECT_DATA_PATH is either the path of a single data file, a
+glob pattern such as data/*.json, or a list of paths and patterns. Every
+data file holds the issues of one repository, which is identified by the
+name of the file without its extension (data/poetry.json -> poetry). The
+issues of a repository form one partition of the dataset, and the
+--repo parameter restricts a run to a single repository.
+"""
+
+import glob
+import os
+from typing import Dict, List
+
+import config as config
+
+_GLOB_CHARACTERS = '*?['
+
+
+def resolve_data_paths(setting:any) -> List[str]:
+    """
+    The data files configured by a path, a glob pattern or a list of them,
+    with the matches of every pattern in sorted order.
+    """
+    if not setting:
+        return []
+    values = setting if isinstance(setting, list) else [setting]
+    paths = []
+    for value in values:
+        value = str(value)
+        if any(char in value for char in _GLOB_CHARACTERS):
+            paths.extend(sorted(glob.glob(value)))
+        else:
+            paths.append(value)
+    return paths
+
+
+def repository_id(path:str) -> str:
+    """
+    The id of the repository whose issues are in the data file.
+    """
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def repository_paths(paths:List[str]) -> Dict[str, str]:
+    """
+    The data files by repository id.
+    """
+    by_id = {}
+    for path in paths:
+        repository = repository_id(path)
+        if repository in by_id:
+            raise ValueError(f'The data files {by_id[repository]} and {path} are both for repository "{repository}"')
+        by_id[repository] = path
+    return by_id
+
+
+def configured_data_paths() -> List[str]:
+    """
+    The data files of ENPM611_PROJECT_DATA_PATH, or only that of the
+    repository selected with --repo.
+    """
+    paths = resolve_data_paths(config.get_parameter('ENPM611_PROJECT_DATA_PATH'))
+    repository = config.get_parameter('repo')
+    if repository is None:
+        return paths
+    # Ids that look like numbers are parsed as such by the config
+    repository = str(repository)
+    by_id = repository_paths(paths)
+    if repository not in by_id:
+        raise ValueError(f'Unknown repository "{repository}", expected one of: {", ".join(by_id)}')
+    return [by_id[repository]]
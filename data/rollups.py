@@ -0,0 +1,257 @@
+"""
+Time-bucketed rollups of the issues data.
+
+A rollup counts the rows of one dimension per key and time bucket:
+
+- label: the labels of the issues, by the creation date of the issue
+  (an issue counts once for every time it carries a label)
+- state: the states of the issues, by their creation date
+- event_type: the types of the events, by the date of the event
+
+at the granularity of a day, a week (starting on Monday) or a month, in
+UTC. The counts are derived once from the columns of the columnar store
+with vectorized numpy operations and kept as prefix sums over the
+buckets, so the count of a key within any range of buckets takes two
+lookups and the series of a key over a time window takes time
+proportional to the number of buckets, regardless of the number of
+issues. Rows without a date are not counted.
+
+Time windows are given in whole buckets: since selects the buckets from
+the one containing it, until those before the one containing it. Both
+may be datetimes or date strings; 'YYYY-MM' stands for the first day of
+the month.
+"""
+
+import re
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from data.columnar import NULL, ColumnarStore, StringDictionary
+from data.dates import NAT, parse_date
+
+GRANULARITIES = ('day', 'week', 'month')
+DIMENSIONS = ('label', 'state', 'event_type')
+
+_MICROSECONDS_PER_DAY = 86_400_000_000
+# 1970-01-01 was a Thursday, 3 days after the Monday starting its week
+_WEEK_OFFSET = 3
+_EPOCH = date(1970, 1, 1)
+_MONTH_PATTERN = re.compile(r'^\d{4}-\d{2}$')
+
+
+def _check_granularity(granularity:str):
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Unknown granularity "{granularity}", expected one of: {", ".join(GRANULARITIES)}')
+
+
+def bucket_of(value:datetime, granularity:str) -> int:
+    """
+    The number of the bucket (days, weeks or months since the epoch) a
+    date falls into. Dates without a time zone are taken to be in UTC.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    if granularity == 'month':
+        return (value.year - 1970) * 12 + value.month - 1
+    days = (value.date() - _EPOCH).days
+    if granularity == 'week':
+        return (days + _WEEK_OFFSET) // 7
+    return days
+
+
+def buckets_of(epochs:np.ndarray, granularity:str) -> np.ndarray:
+    """
+    The bucket numbers of timestamps in microseconds since the epoch.
+    """
+    days = epochs // _MICROSECONDS_PER_DAY
+    if granularity == 'month':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    if granularity == 'week':
+        return (days + _WEEK_OFFSET) // 7
+    return days
+
+
+def bucket_label(bucket:int, granularity:str) -> str:
+    """
+    Names a bucket: 'YYYY-MM' for a month, otherwise the date of its first
+    day ('YYYY-MM-DD').
+    """
+    if granularity == 'month':
+        return f'{1970 + bucket // 12:04d}-{bucket % 12 + 1:02d}'
+    if granularity == 'week':
+        return (_EPOCH + timedelta(days=bucket * 7 - _WEEK_OFFSET)).isoformat()
+    return (_EPOCH + timedelta(days=bucket)).isoformat()
+
+
+def bucket_window(since:any, until:any, granularity:str) -> Tuple[Optional[int], Optional[int]]:
+    """
+    The buckets of a time window, as the first bucket and the bucket after
+    the last one (None where the window is open).
+    """
+    _check_granularity(granularity)
+    return (None if since is None else bucket_of(_date(since), granularity),
+            None if until is None else bucket_of(_date(until), granularity))
+
+
+def _date(value:any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    text = str(value)
+    if _MONTH_PATTERN.match(text):
+        text += '-01'
+    parsed = parse_date(text)
+    if parsed is None:
+        raise ValueError(f'Invalid date "{value}"')
+    return parsed
+
+
+class Rollup:
+    """
+    Counts of the keys of one dimension per time bucket, as prefix sums.
+    """
+
+    def __init__(self, keys:StringDictionary, granularity:str, first_bucket:int,
+                 cumulative:np.ndarray, order:np.ndarray):
+        """
+        Constructor
+        """
+        self.keys:StringDictionary = keys
+        self.granularity:str = granularity
+        # Number of the first bucket; the buckets are consecutive from there
+        self.first_bucket:int = first_bucket
+        # cumulative[key, i] is the count of the key in the first i buckets
+        self.cumulative:np.ndarray = cumulative
+        # Codes of the keys that occur, in the order of their first occurrence
+        self.order:np.ndarray = order
+
+    @staticmethod
+    def build(keys:StringDictionary, codes:np.ndarray, epochs:np.ndarray, granularity:str) -> 'Rollup':
+        """
+        Counts the rows with the given key codes and timestamps.
+        """
+        _check_granularity(granularity)
+        valid = (epochs != NAT) & (codes != NULL)
+        codes = codes[valid].astype(np.int64)
+        buckets = buckets_of(epochs[valid], granularity)
+        num_keys = len(keys)
+        if len(buckets) == 0:
+            return Rollup(keys, granularity, 0, np.zeros((num_keys, 1), dtype=np.int64),
+                          np.zeros(0, dtype=np.int64))
+        first_bucket = int(buckets.min())
+        num_buckets = int(buckets.max()) - first_bucket + 1
+        counts = np.bincount(codes * num_buckets + (buckets - first_bucket),
+                             minlength=num_keys * num_buckets).reshape(num_keys, num_buckets)
+        cumulative = np.zeros((num_keys, num_buckets + 1), dtype=np.int64)
+        np.cumsum(counts, axis=1, out=cumulative[:, 1:])
+        occurring, first_rows = np.unique(codes, return_index=True)
+        return Rollup(keys, granularity, first_bucket, cumulative, occurring[np.argsort(first_rows)])
+
+    @property
+    def num_buckets(self) -> int:
+        return self.cumulative.shape[1] - 1
+
+    def window(self, since:any=None, until:any=None) -> Tuple[int, int]:
+        """
+        The positions of the first bucket of a time window and of the
+        bucket after its last one, clipped to the buckets of the rollup.
+        """
+        first, end = bucket_window(since, until, self.granularity)
+        start = 0 if first is None else first - self.first_bucket
+        stop = self.num_buckets if end is None else end - self.first_bucket
+        start = min(max(start, 0), self.num_buckets)
+        return start, max(start, min(stop, self.num_buckets))
+
+    def buckets(self, since:any=None, until:any=None) -> List[str]:
+        """
+        The names of the buckets of a time window.
+        """
+        start, stop = self.window(since, until)
+        return [bucket_label(self.first_bucket + pos, self.granularity) for pos in range(start, stop)]
+
+    def count(self, key:str, since:any=None, until:any=None) -> int:
+        """
+        The count of a key within a time window.
+        """
+        code = self.keys.code_of(key)
+        if code == NULL:
+            return 0
+        start, stop = self.window(since, until)
+        return int(self.cumulative[code, stop] - self.cumulative[code, start])
+
+    def totals(self, since:any=None, until:any=None) -> Dict[str, int]:
+        """
+        The counts of all keys within a time window, in the order of their
+        first occurrence.
+        """
+        start, stop = self.window(since, until)
+        totals = self.cumulative[self.order, stop] - self.cumulative[self.order, start]
+        return {self.keys.decode(int(code)): int(total) for code, total in zip(self.order, totals)}
+
+    def series(self, key:str, since:any=None, until:any=None) -> np.ndarray:
+        """
+        The counts of a key per bucket of a time window.
+        """
+        start, stop = self.window(since, until)
+        code = self.keys.code_of(key)
+        if code == NULL:
+            return np.zeros(stop - start, dtype=np.int64)
+        return np.diff(self.cumulative[code, start:stop + 1])
+
+    def table(self, since:any=None, until:any=None) -> Dict[str, Dict[str, int]]:
+        """
+        The counts per key and bucket within a time window, leaving out
+        the keys and buckets without any count. The keys are in the order
+        of their first occurrence in the whole data.
+        """
+        start, stop = self.window(since, until)
+        labels = np.array([bucket_label(self.first_bucket + pos, self.granularity) for pos in range(start, stop)],
+                          dtype=object)
+        counts = np.diff(self.cumulative[self.order, start:stop + 1], axis=1)
+        table = {}
+        for code, row in zip(self.order, counts):
+            nonzero = np.flatnonzero(row)
+            if len(nonzero):
+                table[self.keys.decode(int(code))] = dict(zip(labels[nonzero].tolist(), row[nonzero].tolist()))
+        return table
+
+
+class Rollups:
+    """
+    The rollups of a columnar store, built on first use per dimension and
+    granularity.
+    """
+
+    def __init__(self, store:ColumnarStore):
+        """
+        Constructor
+        """
+        self.store:ColumnarStore = store
+        self._rollups:Dict[Tuple[str, str], Rollup] = {}
+        # Held while a rollup is built, as the threads of the analysis server share the rollups
+        self._lock:threading.Lock = threading.Lock()
+
+    def get(self, dimension:str, granularity:str='month') -> Rollup:
+        key = (dimension, granularity)
+        rollup = self._rollups.get(key)
+        if rollup is None:
+            with self._lock:
+                rollup = self._rollups.get(key)
+                if rollup is None:
+                    rollup = self._rollups[key] = self._build(dimension, granularity)
+        return rollup
+
+    def _build(self, dimension:str, granularity:str) -> Rollup:
+        store = self.store
+        if dimension == 'label':
+            # The creation date of the issue of every label occurrence
+            issue_of_label = np.repeat(np.arange(store.num_issues), np.diff(store.issue_label_offsets))
+            return Rollup.build(store.labels, store.issue_label_codes, store.issue_created[issue_of_label],
+                                granularity)
+        if dimension == 'state':
+            return Rollup.build(store.states, store.issue_state, store.issue_created, granularity)
+        if dimension == 'event_type':
+            return Rollup.build(store.event_types, store.event_type, store.event_date, granularity)
+        raise ValueError(f'Unknown dimension "{dimension}", expected one of: {", ".join(DIMENSIONS)}')
@@ -0,0 +1,116 @@
+"""
+Incrementally decodes the issues data file.
+
+The data file is a single top-level JSON array. Instead of decoding it
+all at once with `json.load`, the elements of the array are decoded one
+by one from a bounded read buffer, so that only the current record has
+to be held in memory.
+"""
+
+import json
+from typing import Iterable, Iterator, List, TextIO
+
+# Number of characters read from the file at a time
+DEFAULT_CHUNK_SIZE:int = 1 << 16
+
+_WHITESPACE = ' \t\n\r'
+
+
+class _Reader:
+    """
+    Read buffer over a text file that is consumed from the front.
+    """
+
+    def __init__(self, fin:TextIO, chunk_size:int):
+        """
+        Constructor
+        """
+        self.fin:TextIO = fin
+        self.chunk_size:int = chunk_size
+        self.buffer:str = ''
+        self.pos:int = 0
+        self.eof:bool = False
+
+    def fill(self, min_size:int=0) -> bool:
+        """
+        Reads more data into the buffer. Returns False at the end of the file.
+        """
+        if self.eof:
+            return False
+        # Drop the consumed part of the buffer before growing it
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        chunk = self.fin.read(max(self.chunk_size, min_size))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer += chunk
+        return True
+
+    def peek(self) -> str:
+        """
+        Skips whitespace and returns the next character, or '' at the end.
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+
+def iter_records(fin:TextIO, chunk_size:int=DEFAULT_CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Yields the elements of the top-level JSON array in the file one at a time.
+    """
+    decoder = json.JSONDecoder()
+    reader = _Reader(fin, chunk_size)
+
+    if reader.peek() != '[':
+        raise ValueError('Expected the data file to contain a JSON array')
+    reader.pos += 1
+
+    first = True
+    while True:
+        char = reader.peek()
+        if char == ']':
+            return
+        if char == '':
+            raise ValueError('Unexpected end of the data file')
+        if not first:
+            if char != ',':
+                raise ValueError(f'Expected "," at offset {reader.pos} of the read buffer')
+            reader.pos += 1
+            reader.peek()
+        first = False
+
+        # Decode the next element, reading more data until it is complete
+        while True:
+            try:
+                value, end = decoder.raw_decode(reader.buffer, reader.pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(reader.buffer) or reader.eof:
+                    break
+            except json.JSONDecodeError:
+                if reader.eof:
+                    raise
+            # Grow the read size with the pending element to avoid re-decoding it too often
+            reader.fill(len(reader.buffer) - reader.pos)
+        reader.pos = end
+        yield value
+
+
+def iter_batches(items:Iterable[any], batch_size:int) -> Iterator[List[any]]:
+    """
+    Groups the items into lists of at most batch_size items.
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
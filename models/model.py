@@ -3,10 +3,21 @@ Implements a runtime data model that can be used to access
 the properties contained in the issues JSON.
 """
 
+import sys
 from typing import List, Dict, Set, Tuple
 from enum import Enum
 from datetime import datetime
-from dateutil import parser
+
+from data.dates import parse_date
+import profiling
+
+
+def _intern(value:str) -> str:
+    """
+    Interns low-cardinality strings (authors, labels, event types) so
+    that every occurrence shares a single string object.
+    """
+    return sys.intern(value) if isinstance(value, str) else value
 
 
 class State(str, Enum):
@@ -18,6 +29,8 @@ class State(str, Enum):
 
 
 class Event:
+
+    __slots__ = ('event_type', 'author', 'event_date', 'label', 'comment')
     
     def __init__(self, jobj:any):
         self.event_type:str = None
@@ -30,24 +43,25 @@ class Event:
             self.from_json(jobj)
     
     def from_json(self, jobj:any):
-        self.event_type = jobj.get('event_type')
-        self.author = jobj.get('author')
-        try:
-            self.event_date = parser.parse(jobj.get('event_date'))
-        except:
-            pass
-        self.label = jobj.get('label')
+        self.event_type = _intern(jobj.get('event_type'))
+        self.author = _intern(jobj.get('author'))
+        self.event_date = parse_date(jobj.get('event_date'))
+        self.label = _intern(jobj.get('label'))
         self.comment = jobj.get('comment')
         
         
 class Issue:
+
+    __slots__ = ('url', 'creator', 'labels', 'state', 'assignees', 'title', 'text',
+                 'number', 'created_date', 'updated_date', 'timeline_url',
+                 '_events', '_jevents')
     
     def __init__(self, jobj:any=None):
         self.url:str = None
         self.creator:str = None
-        self.labels:List[str] = []
+        self.labels:Tuple[str, ...] = ()
         self.state:State = None
-        self.assignees:List[str] = []
+        self.assignees:Tuple[str, ...] = ()
         self.title:str = None
         self.text:str = None
         self.number:int = -1
@@ -58,26 +72,39 @@ class Issue:
         
         if jobj is not None:
             self.from_json(jobj)
+
+    @property
+    def events(self) -> List[Event]:
+        """
+        The events of the issue. They are decoded from the raw JSON
+        on first access so that analyses that never look at events
+        do not pay for parsing them.
+        """
+        if self._jevents is not None:
+            with profiling.accumulate('decode_events'):
+                self._events = [Event(jevent) for jevent in self._jevents]
+            self._jevents = None
+        return self._events
+
+    @events.setter
+    def events(self, events:List[Event]):
+        self._events = events
+        self._jevents = None
     
     def from_json(self, jobj:any):
         self.url = jobj.get('url')
-        self.creator = jobj.get('creator')
-        self.labels = jobj.get('labels',[])
+        self.creator = _intern(jobj.get('creator'))
+        self.labels = tuple(_intern(label) for label in jobj.get('labels',[]))
         self.state = State[jobj.get('state')]
-        self.assignees = jobj.get('assignees',[])
+        self.assignees = tuple(_intern(assignee) for assignee in jobj.get('assignees',[]))
         self.title = jobj.get('title')
         self.text = jobj.get('text')
         try:
             self.number = int(jobj.get('number','-1'))
         except:
             pass
-        try:
-            self.created_date = parser.parse(jobj.get('created_date'))
-        except:
-            pass
-        try:
-            self.updated_date = parser.parse(jobj.get('updated_date'))
-        except:
-            pass
+        self.created_date = parse_date(jobj.get('created_date'))
+        self.updated_date = parse_date(jobj.get('updated_date'))
         self.timeline_url = jobj.get('timeline_url')
-        self.events = [Event(jevent) for jevent in jobj.get('events',[])]
\ No newline at end of file
+        # Keep the raw events until they are first accessed
+        self._jevents = jobj.get('events',[])
\ No newline at end of file
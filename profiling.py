@@ -0,0 +1,171 @@
+"""
+Records where the time of a run goes.
+
+When profiling is started (run.py --profile), the stages of a run
+(loading, decoding, the shared scan, each analysis's compute and render
+step) record their wall time, CPU time and the net number of memory
+blocks they allocated. Stages nest, so that e.g. the decoding of the
+data file shows up under the stage that triggered it. Work that happens
+in many small pieces (decoding one issue at a time, parsing a batch of
+dates) is accumulated per stage instead of being recorded individually.
+
+CPU times are those of the current process; the decoding done by worker
+processes (ENPM611_PROJECT_WORKERS) only shows up in the wall time.
+When profiling is not started, stages cost next to nothing.
+"""
+
+import cProfile
+import json
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, Iterator, List
+
+# Profiler of the current run, if profiling was started
+_PROFILER:'Profiler' = None
+
+_NULL_CONTEXT = nullcontext()
+
+
+class Profiler:
+    """
+    Collects the stage records of a run.
+    """
+
+    def __init__(self, use_cprofile:bool=False):
+        """
+        Constructor
+        """
+        self.records:List[Dict[str, any]] = []
+        self.totals:Dict[str, Dict[str, any]] = {}
+        self.stack:List[str] = []
+        self.started:float = time.perf_counter()
+        self.cprofile:cProfile.Profile = cProfile.Profile() if use_cprofile else None
+        if self.cprofile is not None:
+            self.cprofile.enable()
+
+    def path(self, name:str) -> str:
+        return '/'.join(self.stack + [name])
+
+    @contextmanager
+    def stage(self, name:str):
+        path = self.path(name)
+        self.stack.append(name)
+        wall, cpu, blocks = time.perf_counter(), time.process_time(), sys.getallocatedblocks()
+        try:
+            yield
+        finally:
+            self.stack.pop()
+            self.records.append({
+                'stage': path,
+                'start': wall - self.started,
+                'wall': time.perf_counter() - wall,
+                'cpu': time.process_time() - cpu,
+                'allocated_blocks': sys.getallocatedblocks() - blocks,
+            })
+
+    @contextmanager
+    def accumulate(self, name:str):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def add(self, name:str, wall:float, cpu:float):
+        total = self.totals.setdefault(self.path(name), {'count': 0, 'wall': 0.0, 'cpu': 0.0})
+        total['count'] += 1
+        total['wall'] += wall
+        total['cpu'] += cpu
+
+    def trace(self) -> Dict[str, any]:
+        """
+        The stage records and accumulated totals in the order they started.
+        """
+        return {
+            'stages': sorted(self.records, key=lambda record: record['start']),
+            'totals': [{'stage': path, **total} for path, total in self.totals.items()],
+        }
+
+    def summary(self) -> str:
+        lines = [f'{"stage":<60} {"wall":>9} {"cpu":>9} {"blocks":>10}']
+        for record in self.trace()['stages']:
+            lines.append(f'{record["stage"]:<60} {record["wall"]:8.3f}s {record["cpu"]:8.3f}s {record["allocated_blocks"]:>10}')
+        for path, total in self.totals.items():
+            stage = f'{path} (x{total["count"]})'
+            lines.append(f'{stage:<60} {total["wall"]:8.3f}s {total["cpu"]:8.3f}s')
+        return '\n'.join(lines)
+
+
+def start(use_cprofile:bool=False):
+    """
+    Starts profiling the run, optionally also with cProfile.
+    """
+    global _PROFILER
+    _PROFILER = Profiler(use_cprofile)
+
+
+def finish(trace_path:str, cprofile_path:str=None):
+    """
+    Stops profiling, prints a summary and writes the trace as JSON (and
+    the cProfile statistics, if enabled).
+    """
+    global _PROFILER
+    profiler, _PROFILER = _PROFILER, None
+    if profiler is None:
+        return
+    if profiler.cprofile is not None:
+        profiler.cprofile.disable()
+        if cprofile_path:
+            profiler.cprofile.dump_stats(cprofile_path)
+            print(f'Wrote cProfile statistics to {cprofile_path}.')
+    print(profiler.summary())
+    with open(trace_path, 'w') as fout:
+        json.dump(profiler.trace(), fout, indent=2)
+    print(f'Wrote profile to {trace_path}.')
+
+
+def is_enabled() -> bool:
+    return _PROFILER is not None
+
+
+def stage(name:str):
+    """
+    Context manager that records a stage of the run.
+    """
+    if _PROFILER is None:
+        return _NULL_CONTEXT
+    return _PROFILER.stage(name)
+
+
+def accumulate(name:str):
+    """
+    Context manager that adds the time of a small, repeated piece of work
+    to the total of the current stage.
+    """
+    if _PROFILER is None:
+        return _NULL_CONTEXT
+    return _PROFILER.accumulate(name)
+
+
+def timed(items:Iterable[any], name:str) -> Iterable[any]:
+    """
+    Accumulates the time spent producing the items of an iterator,
+    e.g. decoding records from a stream.
+    """
+    if _PROFILER is None:
+        return items
+    return _timed(items, name, _PROFILER)
+
+
+def _timed(items:Iterable[any], name:str, profiler:Profiler) -> Iterator[any]:
+    iterator = iter(items)
+    while True:
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            profiler.add(name, time.perf_counter() - wall, time.process_time() - cpu)
+        yield item
@@ -7,15 +7,11 @@ the command line to run the analyses.
 
 import argparse
 
-from analysis.reopened_issue_analysis import ReopenedIssueAnalysis
-from analysis.time_based_issue_analysis import TimeBasedIssueAnalysis
+# The analyses (and pandas, matplotlib, plotly) are only imported once the
+# features to run are known, see analysis/registry.py
+from analysis import registry
 import config as config
-from analysis.example_analysis import ExampleAnalysis
-from analysis.event_analysis import EventAnalysis
-from analysis.issue_analysis import IssueAnalysis
-from analysis.user_specific_issue_analysis import UserSpecificIssueAnalysis
-from analysis.label_trend_analysis import LabelTrendAnalysis
-from analysis.event_label_categories_analysis import EventLabelCategoriesAnalysis
+import profiling
 
 def parse_args():
     """
@@ -30,8 +26,9 @@ def parse_args():
     ap = argparse.ArgumentParser("run.py")
     
     # Required parameter specifying what analysis to run
-    ap.add_argument('--feature', '-f', type=int, required=True,
-                    help='Which of the three features to run')
+    ap.add_argument('--feature', '-f', type=str, nargs='+', required=True,
+                    help="Which features to run (one or more numbers or names, or 'all'): "
+                         + ', '.join(f'{feature} ({name})' for feature, (name, _) in registry.FEATURES.items()))
     
     # Optional parameter for analyses focusing on a specific user (i.e., contributor)
     ap.add_argument('--user', '-u', type=str, required=False,
@@ -41,7 +38,38 @@ def parse_args():
     ap.add_argument('--label', '-l', type=str, required=False,
                     help='Optional parameter for analyses focusing on a specific label')
     
-    return ap.parse_args()
+    # Optional parameters for the time buckets and window of the label trend
+    ap.add_argument('--granularity', '-g', type=str, choices=['day', 'week', 'month'], required=False,
+                    help='Optional time bucket of the label trend (default: month)')
+    ap.add_argument('--since', type=str, required=False,
+                    help='Optional start of the time window of the label trend (e.g. 2023-01 or 2023-01-15)')
+    ap.add_argument('--until', type=str, required=False,
+                    help='Optional end (exclusive) of the time window of the label trend')
+    
+    # Optional parameter to restrict the analyses to one of several repositories
+    ap.add_argument('--repo', '-r', type=str, required=False,
+                    help='Optional repository id (data file name) to restrict the analyses to')
+    
+    # Optional parameter to write the charts to files instead of showing them
+    ap.add_argument('--output-dir', '-o', type=str, required=False,
+                    help='Optional directory to write the charts to (headless mode)')
+    
+    # Optional parameter for the file format of the matplotlib charts
+    ap.add_argument('--format', type=str, choices=['png', 'svg'], required=False,
+                    help='Optional file format of the charts in headless mode (default: png)')
+    
+    # Optional parameter to record where the time of the run goes
+    ap.add_argument('--profile', type=str, nargs='?', const='profile.json', required=False,
+                    help='Optional path to write a per-stage timing trace to (default: profile.json)')
+    
+    # Optional parameter to additionally profile the run with cProfile
+    ap.add_argument('--cprofile', type=str, required=False,
+                    help='Optional path to write cProfile statistics to (requires --profile)')
+    
+    args = ap.parse_args()
+    if args.cprofile and not args.profile:
+        ap.error('--cprofile requires --profile')
+    return args
 
 
 
@@ -50,21 +78,22 @@ args = parse_args()
 # Add arguments to config so that they can be accessed in other parts of the application
 config.overwrite_from_args(args)
     
-# Run the feature specified in the --feature flag
-if args.feature == 0:
-    ExampleAnalysis().run()
-elif args.feature == 1:
-    IssueAnalysis().run()
-elif args.feature == 2:
-    TimeBasedIssueAnalysis().run()
-elif args.feature == 3:
-    ReopenedIssueAnalysis().run()   
-elif args.feature == 4:
-    UserSpecificIssueAnalysis().run()
-elif args.feature == 5:
-    LabelTrendAnalysis().run()
-elif args.feature == 6:
-    EventLabelCategoriesAnalysis().run()
-    
+# Run the features specified in the --feature flag in one shared pass
+features = registry.parse_features(args.feature)
+if features:
+    if args.profile:
+        profiling.start(use_cprofile=args.cprofile is not None)
+    with profiling.stage('import analysis.aggregator'):
+        from analysis.aggregator import run_analyses
+    analyses = [registry.load(feature)() for feature in features]
+    # Serve the analyses that support it from the maintained aggregates, if configured
+    aggregates = None
+    aggregates_path = config.get_parameter('ENPM611_PROJECT_AGGREGATES')
+    if aggregates_path:
+        from analysis.incremental import MaintainedAggregates
+        aggregates = MaintainedAggregates(aggregates_path)
+    run_analyses(analyses, aggregates)
+    if args.profile:
+        profiling.finish(args.profile, args.cprofile)
 else:
     print('Need to specify which feature to run with --feature flag.')
@@ -0,0 +1,88 @@
+"""
+Tests that the accumulators that filter by user, label or event type
+receive the same issues and events from the queries of the DataLoader as
+from a scan, with the issues held as objects or in the columnar store.
+
+    python -m pytest tests
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from typing import Dict, List
+
+import config
+from analysis import registry
+from analysis.aggregator import feed, scan
+from data import data_loader
+from data.data_loader import DataLoader
+from models.model import Issue
+
+USERS = ['alice', 'bob', 'carol', None]
+LABELS = ['kind/bug', 'kind/feature', 'status/triage']
+EVENT_TYPES = ['labeled', 'commented', 'closed', 'reopened', 'assigned']
+
+# Storage settings under which the issues are held in memory
+MODES:Dict[str, Dict[str, any]] = {
+    'objects': {},
+    'columnar': {'ENPM611_PROJECT_STORAGE': 'columnar'},
+}
+
+
+def records() -> List[dict]:
+    result = []
+    for number in range(1, 81):
+        created = f'2023-{1 + number % 6:02d}-{1 + number % 3:02d}T00:00:00+00:00'
+        events = [{'event_type': EVENT_TYPES[(number + pos) % 5], 'author': USERS[(number * pos) % 4],
+                   'label': LABELS[pos % 3], 'event_date': f'2023-{7 + (number + pos) % 5:02d}-01T00:00:00+00:00'}
+                  for pos in range(number % 6)]
+        result.append({'url': f'https://github.com/owner/repo/issues/{number}', 'creator': USERS[number % 4],
+                       # Some issues carry a label twice
+                       'labels': [LABELS[pos % 3] for pos in range(number % 4)]
+                       + (['kind/bug'] if number % 9 == 0 else []),
+                       'state': 'open', 'assignees': ['bob'] if number % 2 else [], 'title': '', 'text': '',
+                       'number': number, 'created_date': created, 'updated_date': created, 'events': events})
+    return result
+
+
+class FeedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.records = records()
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.data_path = os.path.join(self.data_dir.name, 'issues.json')
+        with open(self.data_path, 'w') as fout:
+            json.dump(self.records, fout)
+
+    def tearDown(self):
+        data_loader.reset()
+        self.data_dir.cleanup()
+
+    def accumulators(self) -> list:
+        accumulators = []
+        for feature in registry.FEATURES:
+            accumulators.extend(registry.load(feature)().accumulators().values())
+        self.assertTrue(any(acc.issue_filter is not None for acc in accumulators))
+        self.assertTrue(any(acc.event_filter is not None for acc in accumulators))
+        return accumulators
+
+    def test_queries_equal_scan(self):
+        for user, label in (('alice', 'kind/bug'), ('bob', 'status/triage'), ('nobody', 'unknown')):
+            with config.parameters(ENPM611_PROJECT_DATA_PATH=self.data_path, user=user, label=label):
+                expected = self.accumulators()
+                scan([Issue(jobj) for jobj in self.records], expected)
+                for mode, settings in MODES.items():
+                    data_loader.reset()
+                    with config.parameters(**settings):
+                        loader = DataLoader()
+                        loader.get_index()
+                        self.assertTrue(loader.is_loaded())
+                        fed = self.accumulators()
+                        feed(loader, fed)
+                    for acc, expected_acc in zip(fed, expected):
+                        self.assertEqual(acc.result(), expected_acc.result(), f'{type(acc).__name__}, {mode}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+"""
+Tests of data/fetch.py against a local stand-in for the GitHub API.
+
+    python -m pytest tests
+"""
+
+import email.message
+import hashlib
+import json
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from data.fetch import GitHubClient, HttpCache, RateLimiter, _RATE_LIMIT_DELAY, fetch_issues
+
+REPOSITORY = 'owner/repo'
+NUM_ISSUES = 250
+
+
+def issue(n:int, host:str) -> dict:
+    item = {
+        'html_url': f'https://github.com/{REPOSITORY}/issues/{n}',
+        'number': n,
+        'title': f'Issue {n}',
+        'body': 'text',
+        'user': {'login': f'user{n % 7}'},
+        'labels': [{'name': 'kind/bug'}] if n % 3 == 0 else [],
+        'state': 'closed' if n % 2 else 'open',
+        'assignees': [],
+        'created_at': f'2023-01-{1 + n % 28:02d}T10:00:00Z',
+        'updated_at': '2023-03-01T00:00:00Z',
+        'timeline_url': f'http://{host}/repos/{REPOSITORY}/issues/{n}/timeline',
+    }
+    if n % 10 == 0:
+        # Pull requests are listed as issues as well
+        item['pull_request'] = {}
+    return item
+
+
+def timeline(n:int) -> List[dict]:
+    entries = [{'event': 'labeled', 'actor': {'login': 'user1'}, 'created_at': '2023-02-01T00:00:00Z',
+                'label': {'name': 'kind/bug'}},
+               {'event': 'commented', 'user': {'login': 'user2'}, 'created_at': '2023-02-02T00:00:00Z',
+                'body': 'comment'}]
+    entries += [{'event': 'closed', 'actor': {'login': 'user3'}, 'created_at': '2023-02-03T00:00:00Z'}] * (n % 5)
+    return entries
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Answers the issue list and the timelines of REPOSITORY with pagination,
+    ETags and the failures queued in the server.
+    """
+    protocol_version = 'HTTP/1.1'
+    # The headers and the body are written separately
+    disable_nagle_algorithm = True
+    server:'StandInServer'
+
+    def log_message(self, format:str, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = dict(parse_qsl(parts.query))
+        host = self.headers['Host']
+        with self.server.lock:
+            self.server.requests += 1
+            failure = self.server.failures.pop(0) if self.server.failures else None
+        if failure == 'drop':
+            self.close_connection = True
+            return
+        if failure is not None:
+            status, headers = failure
+            self._send(status, b'{"message": "rate limited"}', headers)
+            return
+
+        if parts.path == f'/repos/{REPOSITORY}/issues':
+            items = [issue(n, host) for n in range(1, NUM_ISSUES + 1)]
+        elif parts.path.endswith('/timeline'):
+            items = timeline(int(parts.path.split('/')[-2]))
+        else:
+            self._send(404, b'{}')
+            return
+        per_page, page = int(query.get('per_page', 30)), int(query.get('page', 1))
+        last = max(1, -(-len(items) // per_page))
+        body = json.dumps(items[(page - 1) * per_page:page * per_page]).encode()
+        etag = '"' + hashlib.sha256(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            with self.server.lock:
+                self.server.not_modified += 1
+            self._send(304, b'', {'ETag': etag})
+            return
+        headers = {'ETag': etag, 'Content-Type': 'application/json', 'X-RateLimit-Remaining': '100'}
+        if page < last:
+            base = f'http://{host}{parts.path}'
+            headers['Link'] = (f'<{base}?{urlencode(dict(query, page=page + 1))}>; rel="next", '
+                               f'<{base}?{urlencode(dict(query, page=last))}>; rel="last"')
+        self._send(200, body, headers)
+
+    def _send(self, status:int, body:bytes, headers:Dict[str, str]={}):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.requests:int = 0
+        self.not_modified:int = 0
+        # Failures to answer the next requests with: 'drop' or (status, headers)
+        self.failures:List[any] = []
+
+
+class FetchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.api_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.cache_dir.cleanup()
+
+    def fetch(self, workers:int=4) -> Tuple[List[dict], GitHubClient]:
+        client = GitHubClient(self.api_url, cache=HttpCache(self.cache_dir.name))
+        try:
+            return list(fetch_issues(client, REPOSITORY, workers)), client
+        finally:
+            client.close()
+
+    def test_pagination(self):
+        for workers in (1, 4):
+            records, _ = self.fetch(workers)
+            numbers = [n for n in range(1, NUM_ISSUES + 1) if n % 10]
+            self.assertEqual([record['number'] for record in records], numbers)
+            self.assertEqual([len(record['events']) for record in records], [2 + n % 5 for n in numbers])
+            self.assertEqual(records[0]['created_date'], '2023-01-02T10:00:00+00:00')
+            self.assertEqual(records[0]['events'][1], {'event_type': 'commented', 'author': 'user2',
+                                                       'event_date': '2023-02-02T00:00:00+00:00',
+                                                       'comment': 'comment'})
+
+    def test_retry_after(self):
+        self.server.failures = [(429, {'Retry-After': '1'})]
+        start = time.perf_counter()
+        records, client = self.fetch()
+        self.assertGreaterEqual(time.perf_counter() - start, 1)
+        self.assertEqual(len(records), NUM_ISSUES * 9 // 10)
+        self.assertEqual(client.requests, self.server.requests)
+
+    def test_dropped_connection(self):
+        self.server.failures = ['drop']
+        records, _ = self.fetch()
+        self.assertEqual(len(records), NUM_ISSUES * 9 // 10)
+
+    def test_not_modified(self):
+        records, client = self.fetch()
+        self.assertEqual(client.not_modified, 0)
+        refetched, client = self.fetch()
+        self.assertEqual(refetched, records)
+        self.assertEqual(client.not_modified, client.requests)
+        self.assertEqual(self.server.not_modified, client.requests)
+
+    def test_rate_limit_without_reset(self):
+        headers = email.message.Message()
+        headers['X-RateLimit-Remaining'] = '0'
+        limiter = RateLimiter()
+        before = time.time()
+        self.assertTrue(limiter.update(403, headers))
+        self.assertGreaterEqual(limiter._resume_at, before + _RATE_LIMIT_DELAY)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Tests that the aggregates maintained over a data file and a delta equal
+those of the merged data file, and that the analyses are only served
+from them while they match the data file in use.
+
+    python -m pytest tests
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from typing import List
+
+import config
+from analysis.aggregator import compute_analyses
+from analysis.event_label_categories_analysis import EventLabelCategoriesAnalysis
+from analysis.incremental import MaintainedAggregates, ingest_file
+from analysis.label_trend_analysis import LabelTrendAnalysis
+from analysis.reopened_issue_analysis import ReopenedIssueAnalysis
+from data import data_loader
+
+LABELS = ['kind/bug', 'kind/feature', 'area/cli', 'area/docs', 'status/triage', 'status/done']
+
+
+def record(number:int, labels:List[str], reopened:bool=False, month:int=1) -> dict:
+    events = [{'event_type': 'labeled', 'author': 'user1', 'label': label,
+               'event_date': f'2023-{month:02d}-02T00:00:00+00:00'} for label in labels]
+    events.append({'event_type': 'closed', 'author': 'user2',
+                   'event_date': f'2023-{month:02d}-0{3 + number % 5}T00:00:00+00:00'})
+    if reopened:
+        events.append({'event_type': 'reopened', 'author': 'user2',
+                       'event_date': f'2023-{month:02d}-20T00:00:00+00:00'})
+    return {'url': f'https://github.com/owner/repo/issues/{number}', 'creator': 'user1', 'labels': labels,
+            'state': 'open' if reopened else 'closed', 'assignees': [], 'title': f'Issue {number}', 'text': '',
+            'number': number, 'created_date': f'2023-{month:02d}-01T00:00:00+00:00',
+            'updated_date': f'2023-{month:02d}-01T00:00:00+00:00', 'events': events}
+
+
+class IncrementalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.base = [record(number, [LABELS[(number + pos) % 6] for pos in range(number % 3)],
+                            reopened=number % 4 == 0, month=1 + number % 3) for number in range(1, 31)]
+        # Labels that drop out of the aggregates and come back, new labels, new issues
+        self.delta = [record(1, []), record(2, ['area/docs', 'kind/new'], reopened=True, month=2),
+                      record(7, ['kind/bug', 'status/triage'], month=5), record(31, ['kind/new', 'area/cli']),
+                      record(32, ['status/done'], reopened=True, month=4)]
+        updated = {jobj['number']: jobj for jobj in self.delta}
+        self.merged = [updated.pop(jobj['number'], jobj) for jobj in self.base] + list(updated.values())
+        self.data_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        data_loader.reset()
+        self.data_dir.cleanup()
+
+    def path(self, name:str) -> str:
+        return os.path.join(self.data_dir.name, name)
+
+    def write(self, name:str, records:List[dict]) -> str:
+        with open(self.path(name), 'w') as fout:
+            json.dump(records, fout)
+        return self.path(name)
+
+    def aggregates(self, name:str) -> MaintainedAggregates:
+        aggregates = MaintainedAggregates(self.path(name))
+        self.addCleanup(aggregates.close)
+        return aggregates
+
+    def test_delta_equals_merged(self):
+        incremental = self.aggregates('incremental.db')
+        ingest_file(incremental, self.write('base.json', self.base))
+        self.assertEqual(ingest_file(incremental, self.write('delta.json', self.delta)), (2, 3))
+        merged = self.aggregates('merged.db')
+        ingest_file(merged, self.write('merged.json', self.merged))
+
+        for label_prefix in ('', 'kind/', 'status/'):
+            self.assertEqual(list(incremental.label_event_counts(label_prefix).items()),
+                             list(merged.label_event_counts(label_prefix).items()))
+        self.assertEqual(json.dumps(incremental.label_trend()), json.dumps(merged.label_trend()))
+        self.assertEqual(incremental.reopened(), merged.reopened())
+        self.assertEqual(incremental.close_time_stats(), merged.close_time_stats())
+        self.assertEqual(list(incremental.records()), self.merged)
+
+    def test_served_while_matching(self):
+        analyses = [LabelTrendAnalysis, EventLabelCategoriesAnalysis, ReopenedIssueAnalysis]
+        aggregates = self.aggregates('issues.db')
+        base_path = self.write('base.json', self.base)
+        ingest_file(aggregates, base_path)
+        aggregates.set_source(base_path)
+        self.assertTrue(aggregates.matches([base_path]))
+        # After the delta, the database holds the merged issues, but not the file they were written to
+        ingest_file(aggregates, self.write('delta.json', self.delta))
+        merged_path = self.write('merged.json', self.merged)
+        self.assertFalse(aggregates.matches([base_path]))
+        self.assertFalse(aggregates.matches([merged_path]))
+        aggregates.export(self.path('exported.json'))
+        self.assertTrue(aggregates.matches([self.path('exported.json')]))
+        self.assertFalse(aggregates.matches([merged_path, self.path('exported.json')]))
+
+        with config.parameters(label='kind'):
+            for data_path, logs in ((merged_path, self.assertLogs), (self.path('exported.json'), self.assertNoLogs)):
+                data_loader.reset()
+                with config.parameters(ENPM611_PROJECT_DATA_PATH=data_path):
+                    # A warning if the aggregates are ignored
+                    with logs('analysis.aggregator', 'WARNING'):
+                        served = compute_analyses([analysis() for analysis in analyses], aggregates=aggregates)
+                    data_loader.reset()
+                    scanned = compute_analyses([analysis() for analysis in analyses])
+                self.assertTrue(served[0]['top_label_trend'].equals(scanned[0]['top_label_trend']))
+                self.assertTrue(served[1]['label_event_table'].equals(scanned[1]['label_event_table']))
+                self.assertEqual(served[2], scanned[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
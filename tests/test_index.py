@@ -0,0 +1,95 @@
+"""
+Tests that the indexes over a columnar store find the same issues and
+events as those over the issue objects.
+
+    python -m pytest tests
+"""
+
+import unittest
+from datetime import datetime, timezone
+
+from data.columnar import ColumnarStore
+from data.index import IssueIndex, StoreIndex
+from models.model import Issue
+
+USERS = ['alice', 'bob', 'carol', None]
+LABELS = ['kind/bug', 'kind/feature', 'area/cli']
+EVENT_TYPES = ['labeled', 'commented', 'closed', 'reopened']
+
+
+def records() -> list:
+    result = []
+    for number in range(1, 61):
+        # Some dates are missing, others repeat
+        created = None if number % 11 == 0 else f'2023-{1 + number % 6:02d}-{1 + number % 3:02d}T00:00:00+00:00'
+        events = [{'event_type': EVENT_TYPES[(number + pos) % 4], 'author': USERS[(number * pos) % 4],
+                   'event_date': None if (number + pos) % 7 == 0
+                   else f'2023-{1 + (number + pos) % 9:02d}-01T00:00:00+00:00'}
+                  for pos in range(number % 5)]
+        result.append({'url': f'https://github.com/owner/repo/issues/{number}', 'creator': USERS[number % 4],
+                       # Some issues carry a label twice
+                       'labels': [LABELS[pos % 3] for pos in range(number % 4)]
+                       + (['kind/bug'] if number % 9 == 0 else []),
+                       'state': 'open', 'assignees': [], 'title': '', 'text': '', 'number': number,
+                       'created_date': created, 'updated_date': created, 'events': events})
+    return result
+
+
+class StoreIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        data = records()
+        self.objects = IssueIndex([Issue(jobj) for jobj in data])
+        self.store = StoreIndex(ColumnarStore.from_records(data))
+
+    def issues(self, index, positions) -> list:
+        return [issue.number for issue in index.get_issues(positions)]
+
+    def events(self, index, positions) -> list:
+        return [(issue.number, event.event_type, event.author, event.event_date)
+                for issue, event in index.get_events(positions)]
+
+    def test_lookups(self):
+        for index in (self.objects, self.store):
+            # The counts are exact (estimated from a sample larger than the data) before and after the build
+            for _ in range(2):
+                for user in USERS + ['nobody']:
+                    self.assertEqual(index.count_issues_by_creator(user), len(self.objects.issues_by_creator(user)))
+                    self.assertEqual(index.count_events_by_author(user), len(self.objects.events_by_author(user)))
+                for label in LABELS + ['unknown']:
+                    self.assertEqual(index.count_issues_by_label(label), len(self.objects.issues_by_label(label)))
+                for event_type in EVENT_TYPES + ['unknown']:
+                    self.assertEqual(index.count_events_by_type(event_type),
+                                     len(self.objects.events_by_type(event_type)))
+                index.build()
+
+        for user in USERS + ['nobody']:
+            self.assertEqual(self.issues(self.store, self.store.issues_by_creator(user)),
+                             self.issues(self.objects, self.objects.issues_by_creator(user)))
+            self.assertEqual(self.events(self.store, self.store.events_by_author(user)),
+                             self.events(self.objects, self.objects.events_by_author(user)))
+        for label in LABELS + ['unknown']:
+            self.assertEqual(self.issues(self.store, self.store.issues_by_label(label)),
+                             self.issues(self.objects, self.objects.issues_by_label(label)))
+        for event_type in EVENT_TYPES + ['unknown']:
+            self.assertEqual(self.events(self.store, self.store.events_by_type(event_type)),
+                             self.events(self.objects, self.objects.events_by_type(event_type)))
+        self.assertEqual(self.store.num_events(), self.objects.num_events())
+
+    def test_date_ranges(self):
+        dates = [None, datetime(2023, 2, 1, tzinfo=timezone.utc), datetime(2023, 3, 2, tzinfo=timezone.utc),
+                 datetime(2023, 5, 1, tzinfo=timezone.utc)]
+        for since in dates:
+            for until in dates:
+                self.assertEqual(self.store.count_issues_created_between(since, until),
+                                 len(self.objects.issues_created_between(since, until)))
+                self.assertEqual(self.store.count_events_between(since, until),
+                                 len(self.objects.events_between(since, until)))
+                self.assertEqual(self.issues(self.store, self.store.issues_created_between(since, until)),
+                                 self.issues(self.objects, self.objects.issues_created_between(since, until)))
+                self.assertEqual(self.events(self.store, self.store.events_between(since, until)),
+                                 self.events(self.objects, self.objects.events_between(since, until)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Tests that the label trend analysis yields the same results whether the
+issues are scanned one at a time, in chunks or read off the rollups of the
+columnar store.
+
+    python -m pytest tests
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from typing import Dict, List
+
+import config
+from analysis.aggregator import compute_analyses
+from analysis.label_trend_analysis import LabelTrendAnalysis
+from data import data_loader
+
+# Storage settings of the modes that compute the label trend
+MODES:Dict[str, Dict[str, any]] = {
+    'objects': {},
+    'columnar': {'ENPM611_PROJECT_STORAGE': 'columnar'},
+    'chunked': {'ENPM611_PROJECT_CHUNK_SIZE': 2},
+}
+
+
+def record(number:int, created_date:str, labels:List[str]) -> dict:
+    return {'url': f'https://github.com/owner/repo/issues/{number}', 'creator': 'user', 'labels': labels,
+            'state': 'open', 'assignees': [], 'title': f'Issue {number}', 'text': '', 'number': number,
+            'created_date': created_date, 'updated_date': created_date, 'events': []}
+
+
+class LabelTrendModesTest(unittest.TestCase):
+
+    def setUp(self):
+        # Before the window, 'f' occurs before 'e'; within it, 'e' occurs first
+        # and both tie for the fifth place, which goes to 'e' by its name
+        labels = [('2022-06-01', ['f', 'e']), ('2022-07-01', ['f'])]
+        labels += [('2023-02-01', ['a', 'b', 'c', 'd', 'e']), ('2023-03-15', ['a', 'b', 'c', 'd', 'f'])] * 2
+        labels += [('2023-05-20', ['a', 'b', 'c', 'd']), ('2023-08-01', ['f', 'f'])]
+        records = [record(number, f'{date}T12:00:00+00:00', issue_labels)
+                   for number, (date, issue_labels) in enumerate(labels, start=1)]
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.data_path = os.path.join(self.data_dir.name, 'issues.json')
+        with open(self.data_path, 'w') as fout:
+            json.dump(records, fout)
+
+    def tearDown(self):
+        data_loader.reset()
+        self.data_dir.cleanup()
+
+    def compute(self, **parameters) -> Dict[str, dict]:
+        results = {}
+        for mode, settings in MODES.items():
+            data_loader.reset()
+            with config.parameters(ENPM611_PROJECT_DATA_PATH=self.data_path, **settings, **parameters):
+                results[mode] = compute_analyses([LabelTrendAnalysis()])[0]
+        return results
+
+    def assert_modes_agree(self, results:Dict[str, dict]):
+        expected = results['objects']
+        for mode, result in results.items():
+            self.assertEqual(result['label_trend'], expected['label_trend'], mode)
+            self.assertTrue(result['top_label_trend'].equals(expected['top_label_trend']), mode)
+
+    def test_windowed_trend(self):
+        for granularity in ('day', 'week', 'month'):
+            results = self.compute(granularity=granularity, since='2023-01', until='2023-07')
+            self.assert_modes_agree(results)
+            self.assertEqual(list(results['objects']['top_label_trend'].columns), ['a', 'b', 'c', 'd', 'e'])
+
+    def test_whole_trend(self):
+        results = self.compute(granularity='month')
+        self.assert_modes_agree(results)
+        self.assertEqual(list(results['objects']['top_label_trend'].columns), ['f', 'a', 'b', 'c', 'd'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Tests that the data file is split into shards at the record boundaries
+and decodes in parallel to the same issues as json.load, also with
+strings that hold escaped quotes, brackets, commas and multibyte text.
+
+    python -m pytest tests
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from typing import List
+from unittest import mock
+
+from data import parallel
+from models.model import Issue
+
+# Strings that look like structure or end of string to a naive scanner
+TRICKY_TEXTS:List[str] = [
+    'plain',
+    'a "quoted" word',
+    'ends with a backslash \\',
+    'two backslashes \\\\" then a quote',
+    'brackets ] } [ { and commas , , inside',
+    '"], {"title": "not a record"}, [',
+    'multibyte: héllo wörld — ✓ 🐛 日本語',
+    '\\"\\\\\\"',
+    '',
+]
+
+
+def record(number:int, text:str) -> dict:
+    return {'url': f'https://github.com/owner/repo/issues/{number}', 'creator': f'user{number % 3}',
+            'labels': ['kind/bug', f'area/{text[:5]}'], 'state': 'open', 'assignees': [],
+            'title': text, 'text': text[::-1], 'number': number,
+            'created_date': '2023-01-01T00:00:00+00:00', 'updated_date': '2023-01-02T00:00:00+00:00',
+            'events': [{'event_type': 'commented', 'author': 'user1', 'comment': text,
+                        'event_date': '2023-01-03T00:00:00+00:00'}]}
+
+
+class ParallelLoadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.records = [record(number, text) for number in range(1, 6) for text in TRICKY_TEXTS]
+        self.data_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    def write(self, name:str, records:List[dict], **options) -> str:
+        path = os.path.join(self.data_dir.name, name)
+        with open(path, 'w', encoding='utf-8') as fout:
+            json.dump(records, fout, **options)
+        return path
+
+    def read_shards(self, path:str, num_shards:int) -> List[dict]:
+        records = []
+        for start, end in parallel.plan_shards(path, num_shards):
+            records.extend(parallel._read_shard(path, start, end))
+        return records
+
+    def test_shards_hold_the_records(self):
+        paths = [self.write('compact.json', self.records, ensure_ascii=False, separators=(',', ':')),
+                 self.write('ascii.json', self.records),
+                 self.write('indented.json', self.records, ensure_ascii=False, indent=2)]
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as fin:
+                expected = json.load(fin)
+            for num_shards in (1, 2, 5, len(self.records), 3 * len(self.records)):
+                self.assertEqual(self.read_shards(path, num_shards), expected,
+                                 f'{os.path.basename(path)}, {num_shards} shards')
+
+    def test_small_blocks(self):
+        # Small blocks put escapes and quotes across the edges of the scanned blocks
+        path = self.write('issues.json', self.records[:len(TRICKY_TEXTS)], ensure_ascii=False)
+        boundaries = parallel.find_record_boundaries(path).tolist()
+        for block_size in (1, 2, 3, 7, 64):
+            with mock.patch.object(parallel, '_SCAN_BLOCK_SIZE', block_size):
+                self.assertEqual(parallel.find_record_boundaries(path).tolist(), boundaries,
+                                 f'blocks of {block_size}')
+
+    def test_boundaries(self):
+        path = self.write('issues.json', self.records, ensure_ascii=False)
+        with open(path, 'rb') as fin:
+            data = fin.read()
+        boundaries = parallel.find_record_boundaries(path)
+        self.assertEqual(len(boundaries), len(self.records) + 1)
+        self.assertEqual(data[boundaries[0]:boundaries[0] + 1], b'[')
+        self.assertEqual(data[boundaries[-1]:boundaries[-1] + 1], b']')
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            json.loads(data[start + 1:end])
+
+    def test_empty_and_single(self):
+        self.assertEqual(self.read_shards(self.write('empty.json', []), 4), [])
+        self.assertEqual(self.read_shards(self.write('single.json', self.records[:1]), 4), self.records[:1])
+        with self.assertRaises(ValueError):
+            parallel.find_record_boundaries(self.write('string.json', 'not an array'))
+
+    def test_load_issues(self):
+        path = self.write('issues.json', self.records, ensure_ascii=False)
+        expected = [Issue(jobj) for jobj in self.records]
+        issues = parallel.load_issues(path, 2)
+        self.assertEqual([(issue.number, issue.title, issue.text, issue.labels) for issue in issues],
+                         [(issue.number, issue.title, issue.text, issue.labels) for issue in expected])
+        self.assertEqual([[event.comment for event in issue.events] for issue in issues],
+                         [[event.comment for event in issue.events] for issue in expected])
+        store = parallel.load_store(path, 2)
+        self.assertEqual([(issue.number, issue.title, issue.text) for issue in store],
+                         [(issue.number, issue.title, issue.text) for issue in expected])
+
+
+if __name__ == '__main__':
+    unittest.main()
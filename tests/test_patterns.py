@@ -0,0 +1,148 @@
+"""
+Tests that the state machine of data/patterns.py finds the same matches
+as trying every sequence of events of every issue, on issues whose events
+are in chronological order except for some without a date.
+
+    python -m pytest tests
+"""
+
+import itertools
+import random
+import unittest
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from data.columnar import ColumnarStore
+from data.patterns import Pattern
+
+EVENT_TYPES = ['labeled', 'closed', 'reopened', 'assigned', 'commented']
+LABELS = ['kind/bug', 'good first issue']
+
+PATTERNS = [
+    'closed -> reopened',
+    'closed -> reopened within 7d',
+    'closed -> reopened after 2d',
+    'labeled:kind/bug -> assigned',
+    'labeled:"good first issue" -> closed after 1w',
+    '* -> commented within 12h',
+    'commented -> * -> closed',
+    'labeled -> closed within 3d -> reopened after 1d',
+    'assigned -> labeled:kind/bug after 1h -> closed within 2d',
+    'commented -> commented within 1d -> commented within 1d',
+    'reopened',
+    # Codes that are not part of the dictionaries
+    'unknown -> closed',
+    'labeled:unknown',
+    'closed:kind/bug',
+]
+
+
+def records(seed:int=611) -> List[dict]:
+    rng = random.Random(seed)
+    result = []
+    for number in range(1, 301):
+        date = datetime(2023, 1, 1, tzinfo=timezone.utc) + timedelta(hours=rng.randrange(1000))
+        events = []
+        for _ in range(rng.randrange(9)):
+            event_type = rng.choice(EVENT_TYPES)
+            date += timedelta(minutes=rng.randrange(5 * 24 * 60))
+            event = {'event_type': event_type, 'author': 'user',
+                     # Some events have no date, which fails every time constraint
+                     'event_date': None if rng.random() < 0.15 else date.isoformat()}
+            if event_type == 'labeled':
+                event['label'] = rng.choice(LABELS)
+            events.append(event)
+        result.append({'url': f'https://github.com/owner/repo/issues/{number}', 'creator': 'user', 'labels': [],
+                       'state': 'open', 'assignees': [], 'title': '', 'text': '', 'number': number,
+                       'created_date': None, 'updated_date': None, 'events': events})
+    return result
+
+
+def step_matches(step, event:dict) -> bool:
+    return (step.event_type == '*' or step.event_type == event['event_type']) \
+        and (step.label is None or step.label == event.get('label'))
+
+
+def gap_allowed(step, previous:Optional[datetime], date:Optional[datetime]) -> bool:
+    if step.within is None and step.after is None:
+        return True
+    if previous is None or date is None or date < previous:
+        return False
+    gap = date - previous
+    if step.within is not None and gap > timedelta(microseconds=step.within):
+        return False
+    return step.after is None or gap >= timedelta(microseconds=step.after)
+
+
+def brute_force(pattern:Pattern, record:dict) -> Optional[Tuple[int, set]]:
+    """
+    The position of the event at which the first match of the issue
+    completes, and the dates of every match that completes there.
+    """
+    events = record['events']
+    dates = [None if event['event_date'] is None else datetime.fromisoformat(event['event_date'])
+             for event in events]
+    steps = pattern.steps
+    for end in range(len(events)):
+        found = set()
+        for chain in itertools.combinations(range(end), len(steps) - 1):
+            chain += (end,)
+            if all(step_matches(step, events[pos]) for step, pos in zip(steps, chain)) \
+                    and all(gap_allowed(step, dates[previous], dates[pos])
+                            for step, previous, pos in zip(steps[1:], chain, chain[1:])):
+                found.add(tuple(dates[pos] for pos in chain))
+        if found:
+            return end, found
+    return None
+
+
+class PatternTest(unittest.TestCase):
+
+    def setUp(self):
+        self.records = records()
+        self.store = ColumnarStore.from_records(self.records)
+
+    def test_search(self):
+        for text in PATTERNS:
+            pattern = Pattern.parse(text)
+            matches = {match.issue_number: match for match in pattern.search(self.store)}
+            expected = {record['number']: brute_force(pattern, record) for record in self.records}
+            expected = {number: found for number, found in expected.items() if found is not None}
+            self.assertEqual(list(matches), list(expected), text)
+            for number, (_, found) in expected.items():
+                # The dates of one of the matches that complete first
+                self.assertIn(tuple(matches[number].dates), found, f'{text}, issue {number}')
+        self.assertTrue(any(Pattern.parse(text).search(self.store) for text in PATTERNS))
+
+    def test_missing_dates(self):
+        def issue(events:List[Tuple[str, Optional[str]]]) -> dict:
+            return {'url': 'https://github.com/owner/repo/issues/1', 'number': 1, 'labels': [], 'events': [
+                {'event_type': event_type, 'event_date': date and f'2023-01-{date}T00:00:00+00:00'}
+                for event_type, date in events]}
+
+        day = lambda number: datetime(2023, 1, number, tzinfo=timezone.utc)
+        cases = [
+            # A partial match without a date gives way to one with a date
+            ('closed -> reopened after 1d', [('closed', None), ('closed', '01'), ('reopened', '05')], [day(1), day(5)]),
+            ('closed -> reopened within 7d', [('closed', '01'), ('closed', None), ('reopened', '05')], [day(1), day(5)]),
+            ('closed -> reopened within 7d', [('closed', '01'), ('reopened', None)], None),
+            ('closed -> reopened', [('closed', None), ('reopened', None)], [None, None]),
+        ]
+        for text, events, dates in cases:
+            matches = Pattern.parse(text).search(ColumnarStore.from_records([issue(events)]))
+            self.assertEqual([match.dates for match in matches], [] if dates is None else [dates], text)
+
+    def test_parse(self):
+        pattern = Pattern.parse('labeled:"good first issue" -> closed after 2w -> reopened within 90m')
+        self.assertEqual([(step.event_type, step.label) for step in pattern.steps],
+                         [('labeled', 'good first issue'), ('closed', None), ('reopened', None)])
+        self.assertEqual(str(Pattern.parse(str(pattern))), str(pattern))
+        for text in ['', 'closed ->', '-> closed', 'closed -> -> reopened', 'closed within 1d -> reopened',
+                     'closed -> reopened within', 'closed -> reopened within 7x', 'closed -> reopened soon 1d',
+                     'closed -> reopened within 1d within 2d', 'closed -> reopened within 1d after 1h']:
+            with self.assertRaises(ValueError, msg=text):
+                Pattern.parse(text)
+
+
+if __name__ == '__main__':
+    unittest.main()